@@ -1,26 +1,16 @@
-from PIL import Image
-import numpy as np
+from image_stats import analyze, print_summary
+
+def analyze_logo(path="merki_logo_transparent.png"):
+    # 不透明ピクセルの色範囲・分布と、グラデーション（開始色・終了色・角度）の
+    # 最小二乗フィットを image_stats でストリーミング計算する
+    report = analyze(path, histograms=False)
+    print_summary(report)
 
-def analyze_logo():
-    img = Image.open("merki_logo_transparent.png").convert("RGBA")
-    data = np.array(img)
-    
-    # アルファ値がある（不透明な）ピクセルのみを抽出
-    pixels = data[data[:,:,3] > 0]
-    
-    # 色の範囲を確認
-    min_rgb = np.min(pixels[:,:3], axis=0)
-    max_rgb = np.max(pixels[:,:3], axis=0)
-    
-    print(f"Color Range: {min_rgb} to {max_rgb}")
-    
-    # 四隅（または端）の色をサンプリングしてグラデーションの方向を推測
-    # 実際にはロゴ画像を直接目視して、左上が明るく右下が暗いことを確認
-    # (155, 127, 199) 前後から (118, 75, 162) 前後
-    
     # 形状の分析
     # SVGパス: M50,50 L50,0 A50,50 0 1,1 14.64,14.64 Z
     # これを 2048x2048 でレンダリングする
+    # (フィット結果は create_perfect_logo.py --gradient-from でそのまま使える)
+    return report
 
 if __name__ == "__main__":
     analyze_logo()
@@ -0,0 +1,361 @@
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import ctypes
+import ctypes.util
+import fnmatch
+import glob
+import json
+import os
+import select
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import traceback
+
+# Imported up front so every rebuild and job runs with Pillow, NumPy and the
+# asset modules already loaded
+from PIL import Image
+import numpy  # noqa: F401
+from asset_encoder import encode_best
+from create_perfect_logo import create_perfect_logo
+from export_logo import BRAND_ASSETS, export, select as select_assets
+from force_transparency import make_transparent
+from generate_logo_variations import VARIATIONS, generate_variations
+from keying import key_file
+import ogp_cards
+
+SOCKET_PATH = os.environ.get("MERKI_DAEMON_SOCKET", ".asset_daemon.sock")
+# Quiet period after the last file event before a rebuild starts; editors and
+# savers often write a file in several steps
+DEBOUNCE = 0.2
+POLL_INTERVAL = 0.5
+PAGE_EXCLUDE = ["*.bak.*", "ogp_builder.html"]
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+_EVENT = struct.Struct("iIII")
+
+
+def _pages():
+    return sorted(p for p in glob.glob("*.html")
+                  if not any(fnmatch.fnmatch(p, e) for e in PAGE_EXCLUDE))
+
+
+def _build_ogp(changed):
+    # Only the edited pages, unless the logo on every card changed
+    pages = [p for p in changed if p.endswith(".html") and p in _pages()]
+    if ogp_cards.LOGO in changed:
+        pages = _pages()
+    return ogp_cards.build(pages) if pages else []
+
+
+# Derived assets, in dependency order. A change to a file matching `inputs`
+# reruns the rule; rules whose inputs match its outputs follow in the same pass.
+RULES = [
+    {"name": "transparent", "inputs": ["merki_logo_final.png"], "outputs": ["merki_logo_transparent.png"],
+     "run": lambda changed: make_transparent("merki_logo_final.png", "merki_logo_transparent.png")},
+    {"name": "brand_assets", "inputs": ["merki_logo_transparent.png"],
+     "outputs": [spec["name"] for spec in BRAND_ASSETS],
+     "run": lambda changed: export()},
+    {"name": "variations", "inputs": ["logo.png"], "outputs": [v["name"] for v in VARIATIONS],
+     "run": lambda changed: generate_variations("logo.png")},
+    {"name": "ogp_cards", "inputs": ["*.html", "merki_logo_transparent.png"], "outputs": [],
+     "run": _build_ogp},
+]
+
+# Ad-hoc jobs accepted over the socket: name -> function(**args)
+JOBS = {
+    "transparent": make_transparent,
+    "export": lambda only=None, **kw: export(outputs=select_assets(only) if only else BRAND_ASSETS, **kw),
+    "variations": generate_variations,
+    "perfect_logo": create_perfect_logo,
+    "key": key_file,
+    "encode": lambda input_path, output_path=None, **kw: encode_best(
+        Image.open(input_path), output_path or input_path, **kw),
+    "ogp_cards": lambda pages=None, **kw: ogp_cards.build(pages or _pages(), **kw),
+}
+
+
+def _matches(path, patterns):
+    return any(fnmatch.fnmatch(path, p) for p in patterns)
+
+
+def plan(changed, rules=RULES):
+    # Rules to rerun for `changed` paths, with the inputs each one sees
+    changed, steps = set(changed), []
+    for rule in rules:
+        hits = sorted(p for p in changed if _matches(p, rule["inputs"]))
+        if hits:
+            steps.append((rule, hits))
+            changed.update(rule["outputs"])
+    return steps
+
+
+class InotifyWatcher:
+    """Changed file names in one directory, from Linux inotify (via libc)."""
+
+    def __init__(self, root):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Whole-directory watch: atomic saves replace the file (and its inode)
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(root), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {root}")
+
+    def wait(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        names, data = set(), os.read(self.fd, 1 << 16)
+        pos = 0
+        while pos < len(data):
+            _, _, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            names.add(os.fsdecode(data[pos:pos + length].rstrip(b"\0")))
+            pos += length
+        return names
+
+
+class PollWatcher:
+    """Portable fallback: stat every file in the directory each interval."""
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root, self.interval = root, interval
+        self.stamps = self._scan()
+
+    def _scan(self):
+        stamps = {}
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    stamps[entry.name] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        stamps = self._scan()
+        changed = {name for name, stamp in stamps.items() if self.stamps.get(name) != stamp}
+        self.stamps = stamps
+        return changed
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class AssetDaemon:
+    """Resident rebuild loop plus a local job socket.
+
+    All pixel work runs on one job thread, in this process, so Pillow, NumPy
+    and the render cache index stay warm between rebuilds. File events that
+    are the daemon's own writes are recognised by their stamp and ignored;
+    chained rules run from plan() instead.
+    """
+
+    def __init__(self, root=".", socket_path=SOCKET_PATH, poll=False, debounce=DEBOUNCE):
+        os.chdir(root)
+        # A relative socket path lives in the watched directory
+        self.socket_path = os.path.abspath(socket_path)
+        self.debounce = debounce
+        self.jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asset-job")
+        self.watcher = PollWatcher(".") if poll or not sys.platform.startswith("linux") else InotifyWatcher(".")
+        self.written = {}
+        self.running = set()
+        self.stats = {"rebuilds": 0, "jobs": 0, "started": time.time(), "last": None}
+        self.stopping = threading.Event()
+
+    # --- work -------------------------------------------------------------
+
+    def _timed(self, label, func):
+        start = time.perf_counter()
+        try:
+            result = func()
+            ok = True
+        except Exception:
+            result, ok = traceback.format_exc(), False
+        elapsed = time.perf_counter() - start
+        self.stats["last"] = {"what": label, "ok": ok, "seconds": round(elapsed, 3)}
+        print(f"[daemon] {label}: {'done' if ok else 'FAILED'} in {elapsed * 1000:.0f} ms", flush=True)
+        if not ok:
+            print(result, file=sys.stderr, flush=True)
+        return {"ok": ok, "seconds": round(elapsed, 3), "result": result}
+
+    def _rebuild(self, changed):
+        results = []
+        for rule, hits in plan(changed):
+            self.running = set(rule["outputs"])
+            results.append(dict(self._timed(f"{rule['name']} ({', '.join(hits)})", lambda: rule["run"](hits)),
+                                rule=rule["name"]))
+            for path in rule["outputs"]:
+                self.written[path] = _stamp(path)
+            self.running = set()
+            self.stats["rebuilds"] += 1
+        return results
+
+    def rebuild(self, changed):
+        return self.jobs.submit(self._rebuild, changed)
+
+    def run_job(self, name, args):
+        if name not in JOBS:
+            raise ValueError(f"Unknown job {name!r}; known: {', '.join(sorted(JOBS))}")
+        self.stats["jobs"] += 1
+        return self.jobs.submit(self._timed, f"job {name}", lambda: JOBS[name](**args))
+
+    def _external(self, names):
+        # Drop events caused by the daemon's own writes
+        changed = []
+        for name in names:
+            if name.startswith(".") or name.endswith(".tmp") or name in self.running:
+                continue
+            if name in self.written and self.written[name] == _stamp(name):
+                continue
+            changed.append(name)
+        return changed
+
+    def watch(self):
+        while not self.stopping.is_set():
+            names = self.watcher.wait(1.0)
+            if not names:
+                continue
+            # Collect the rest of a burst of writes before rebuilding
+            while True:
+                more = self.watcher.wait(self.debounce)
+                if not more:
+                    break
+                names |= more
+            changed = self._external(names)
+            if changed and plan(changed):
+                self.rebuild(changed)
+
+    # --- socket -----------------------------------------------------------
+
+    def handle(self, request):
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True}
+        if command == "status":
+            return dict(self.stats, ok=True, pid=os.getpid(), cwd=os.getcwd(),
+                        watcher=type(self.watcher).__name__, rules=[r["name"] for r in RULES],
+                        job_names=sorted(JOBS))
+        if command == "build":
+            # Explicit rebuild: of named rules, or of everything
+            names = request.get("rules") or [r["name"] for r in RULES]
+            patterns = [p for r in RULES if r["name"] in names for p in r["inputs"]]
+            inputs = [path for p in patterns for path in (glob.glob(p) or [p])]
+            return {"ok": True, "steps": self.rebuild(inputs).result()}
+        if command == "changed":
+            return {"ok": True, "steps": self.rebuild(request.get("paths", [])).result()}
+        if command == "job":
+            return self.run_job(request["name"], request.get("args", {})).result()
+        if command == "stop":
+            # The socket handler shuts the server down once this reply is sent
+            self.stopping.set()
+            return {"ok": True}
+        return {"ok": False, "result": f"Unknown command {command!r}"}
+
+    def serve(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    command = None
+                    try:
+                        request = json.loads(line)
+                        command = request.get("command")
+                        response = daemon.handle(request)
+                    except Exception as e:
+                        response = {"ok": False, "result": f"{type(e).__name__}: {e}"}
+                    self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+                    self.wfile.flush()
+                    if command == "stop":
+                        # Only now: serve() exits the process once serve_forever returns
+                        daemon.server.shutdown()
+                        return
+
+        if os.path.exists(self.socket_path):
+            if _connect(self.socket_path, quiet=True):
+                raise SystemExit(f"A daemon is already listening on {self.socket_path}")
+            os.remove(self.socket_path)
+        if hasattr(socket, "AF_UNIX"):
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        else:
+            # No Unix sockets: loopback TCP, with the port in the socket file
+            self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+            with open(self.socket_path, "w", encoding="utf-8") as f:
+                f.write(str(self.server.server_address[1]))
+        self.server.daemon_threads = True
+        watcher = threading.Thread(target=self.watch, daemon=True, name="asset-watch")
+        watcher.start()
+        print(f"[daemon] watching {os.getcwd()} ({type(self.watcher).__name__}), "
+              f"jobs on {self.socket_path}", flush=True)
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopping.set()
+            self.server.server_close()
+            self.jobs.shutdown(wait=True)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def _connect(socket_path, quiet=False):
+    try:
+        if hasattr(socket, "AF_UNIX"):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(socket_path)
+        else:
+            with open(socket_path, encoding="utf-8") as f:
+                sock = socket.create_connection(("127.0.0.1", int(f.read())))
+        return sock
+    except OSError:
+        if quiet:
+            return None
+        raise SystemExit(f"No asset daemon on {socket_path}; start one with 'asset_daemon.py serve'")
+
+
+def request(command, socket_path=SOCKET_PATH, **fields):
+    """Send one command to a running daemon and return its JSON response."""
+    with _connect(socket_path) as sock, sock.makefile("rwb") as f:
+        f.write(json.dumps(dict(fields, command=command)).encode() + b"\n")
+        f.flush()
+        return json.loads(f.readline())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident asset rebuilder and job server")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="watch sources and serve jobs until stopped")
+    p.add_argument("--root", default=".")
+    p.add_argument("--poll", action="store_true", help="poll instead of inotify")
+    p.add_argument("--debounce", type=float, default=DEBOUNCE)
+    p = sub.add_parser("build", help="rebuild rules now (default: all)")
+    p.add_argument("rules", nargs="*")
+    p = sub.add_parser("changed", help="rebuild what depends on these paths")
+    p.add_argument("paths", nargs="+")
+    p = sub.add_parser("job", help="run an ad-hoc job, e.g. job export '{\"only\": [\"merki_social_logo_hd.png\"]}'")
+    p.add_argument("name")
+    p.add_argument("args", nargs="?", default="{}", help="keyword arguments as JSON")
+    sub.add_parser("status")
+    sub.add_parser("stop")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        AssetDaemon(args.root, args.socket, args.poll, args.debounce).serve()
+        sys.exit(0)
+    fields = {"build": lambda: {"rules": args.rules}, "changed": lambda: {"paths": args.paths},
+              "job": lambda: {"name": args.name, "args": json.loads(args.args)}}.get(args.command, dict)()
+    response = request(args.command, args.socket, **fields)
+    print(json.dumps(response, indent=2, default=str, ensure_ascii=False))
+    sys.exit(0 if response.get("ok", True) and all(s.get("ok", True) for s in response.get("steps", [])) else 1)
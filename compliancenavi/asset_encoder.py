@@ -0,0 +1,187 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from PIL import Image, features
+import argparse
+import io
+import json
+import os
+import time
+import zlib
+import numpy as np
+from profiling import stage
+
+# Lossless PNG settings, cheapest first so a tight time budget still has a result.
+# Pillow always filters rows adaptively; the zlib strategy decides how well the
+# filtered rows compress (RLE is fast and wins on flat logo areas).
+PNG_CANDIDATES = [
+    {"compress_level": 6, "compress_type": zlib.Z_RLE},
+    {"compress_level": 6},
+    {"compress_level": 9, "compress_type": zlib.Z_FILTERED},
+    {"compress_level": 9},
+]
+
+WEBP_LOSSLESS = {"lossless": True, "quality": 100, "method": 4, "exact": True}
+WEBP_LOSSY_QUALITIES = [95, 90, 80]
+AVIF_QUALITIES = [100, 90, 80]
+
+EXTENSIONS = {"png": ".png", "webp": ".webp", "avif": ".avif"}
+
+# Default wall-clock budget for trying candidates of one asset (seconds)
+TIME_BUDGET = 60
+
+
+def _to_palette(rgba):
+    # Exact indexed copy of an image with <= 256 distinct RGBA colours, else None
+    if rgba.getcolors(256) is None:
+        return None
+    data = np.asarray(rgba)
+    packed = np.ascontiguousarray(data).view(np.uint32).reshape(data.shape[:2])
+    colors, index = np.unique(packed, return_inverse=True)
+    indexed = Image.fromarray(index.reshape(packed.shape).astype(np.uint8), "L")
+    indexed.putpalette(colors.view(np.uint8).tobytes(), "RGBA")
+    return indexed
+
+
+def candidates(img, formats=("png",), tolerance=0):
+    # (format, options, image) triples to try for one asset
+    out = [("png", opts, img) for opts in PNG_CANDIDATES] if "png" in formats else []
+    if "png" in formats:
+        indexed = _to_palette(img.convert("RGBA"))
+        if indexed is not None:
+            out.insert(0, ("png", {"optimize": True, "palette": True}, indexed))
+    if "webp" in formats and features.check("webp"):
+        out.append(("webp", WEBP_LOSSLESS, img))
+        if tolerance > 0:
+            out += [("webp", {"quality": q, "method": 4, "exact": True}, img)
+                    for q in WEBP_LOSSY_QUALITIES]
+    if "avif" in formats and features.check("avif"):
+        qualities = AVIF_QUALITIES if tolerance > 0 else AVIF_QUALITIES[:1]
+        out += [("avif", {"quality": q, "subsampling": "4:4:4"}, img) for q in qualities]
+    return out
+
+
+def _visible(data):
+    # RGB under fully transparent pixels is invisible and not compared
+    data = data.copy()
+    data[data[..., 3] == 0] = 0
+    return data
+
+
+def _encode_candidate(fmt, options, img, reference):
+    start = time.perf_counter()
+    with stage(f"candidate:{fmt}", pixels=img.width * img.height, options=options) as s:
+        # save() stores its options on the Image object, and callers such as
+        # export_logo encode one shared image from several threads; encode a copy
+        img = img.copy()
+        buf = io.BytesIO()
+        save_options = {k: v for k, v in options.items() if k != "palette"}
+        img.save(buf, fmt.upper(), **save_options)
+        s["bytes"] = buf.tell()
+    elapsed = time.perf_counter() - start
+    data = buf.getvalue()
+    with stage("verify", pixels=img.width * img.height):
+        decoded = _visible(np.asarray(Image.open(io.BytesIO(data)).convert("RGBA")))
+        max_diff = int(np.abs(decoded.astype(np.int16) - reference).max())
+    return {"format": fmt, "options": options, "bytes": len(data),
+            "encode_ms": round(elapsed * 1000, 1), "max_diff": max_diff, "data": data}
+
+
+def encode_best(img, output_path, formats=("png",), tolerance=0, time_budget=TIME_BUDGET,
+                workers=None):
+    """Write `img` with the smallest encoding that round-trips within `tolerance`.
+
+    `tolerance` is the largest per-channel difference allowed on visible
+    pixels (0 = pixel-identical). Candidates run cheapest first on a pool of
+    `workers` threads (pass 1 when the caller is already on a pool). Once
+    `time_budget` has run out and one candidate has been accepted, queued
+    ones are cancelled; running ones are never cut short. The extension of
+    `output_path` follows the winning format. Returns a report dict.
+    """
+    if img.mode not in ("RGBA", "RGB"):
+        img = img.convert("RGBA")
+    reference = _visible(np.asarray(img.convert("RGBA"))).astype(np.int16)
+    start = time.perf_counter()
+
+    accepted = False
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_encode_candidate, fmt, opts, cand, reference)
+                   for fmt, opts, cand in candidates(img, formats, tolerance)]
+        pending = set(futures)
+        while pending:
+            timeout = max(0, time_budget - (time.perf_counter() - start)) if accepted else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            accepted = accepted or any(f.result()["max_diff"] <= tolerance for f in done)
+        for f in pending:
+            f.cancel()
+    # Leaving the pool waits for running candidates; their results count too
+    results = [f.result() for f in futures if not f.cancelled()]
+    accepted = [r for r in results if r["max_diff"] <= tolerance]
+    if not accepted:
+        raise RuntimeError(f"No candidate for {output_path} within tolerance")
+    best = min(accepted, key=lambda r: r["bytes"])
+
+    root, _ = os.path.splitext(output_path)
+    path = root + EXTENSIONS[best["format"]]
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(best["data"])
+    os.replace(tmp, path)
+
+    return {
+        "asset": path,
+        "format": best["format"],
+        "options": best["options"],
+        "bytes": best["bytes"],
+        "max_diff": best["max_diff"],
+        "seconds": round(time.perf_counter() - start, 2),
+        "candidates": [{k: v for k, v in r.items() if k != "data"} for r in results],
+        "skipped": len(futures) - len(results),
+    }
+
+
+def print_report(reports):
+    print(f"{'asset':<44} {'format':<6} {'bytes':>11} {'max diff':>8} {'time s':>7} {'tried':>6}")
+    for r in reports:
+        print(f"{os.path.basename(r['asset']):<44} {r['format']:<6} {r['bytes']:>11,} "
+              f"{r['max_diff']:>8} {r['seconds']:>7} {len(r['candidates']):>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode assets with the smallest equivalent encoding")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--formats", nargs="+", default=["png"], choices=sorted(EXTENSIONS))
+    parser.add_argument("--tolerance", type=int, default=0,
+                        help="max per-channel difference on visible pixels (0 = identical)")
+    parser.add_argument("--time-budget", type=float, default=TIME_BUDGET, help="seconds per asset")
+    parser.add_argument("--workers", type=int, default=None, help="encoder threads per asset")
+    parser.add_argument("--output-dir", help="write here instead of next to the input")
+    parser.add_argument("--report", help="write the size/time report as JSON")
+    args = parser.parse_args()
+
+    reports = []
+    for input_path in args.inputs:
+        img = Image.open(input_path)
+        img.load()
+        with open(input_path, "rb") as f:
+            original = f.read()
+        output_path = os.path.join(args.output_dir, os.path.basename(input_path)) \
+            if args.output_dir else input_path
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        report = encode_best(img, output_path, args.formats, args.tolerance, args.time_budget, args.workers)
+        same_format = os.path.splitext(report["asset"])[1] == os.path.splitext(input_path)[1]
+        if same_format and report["bytes"] > len(original):
+            # The existing file is already smaller: never make an asset bigger
+            with open(report["asset"], "wb") as f:
+                f.write(original)
+            report.update(format="original", options={}, bytes=len(original))
+        report["original_bytes"] = len(original)
+        reports.append(report)
+    print_report(reports)
+    total_before = sum(r["original_bytes"] for r in reports)
+    total_after = sum(r["bytes"] for r in reports)
+    print(f"Total: {total_before:,} -> {total_after:,} bytes")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
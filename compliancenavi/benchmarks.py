@@ -0,0 +1,295 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from PIL import Image, ImageDraw
+import resample
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HISTORY = "benchmark_history.json"
+SIZES = [1024, 2048, 4096, 8192]
+INPUT_KINDS = ["synthetic", "real"]
+REAL_SOURCE = os.path.join(HERE, "merki_logo_final.png")
+# Relative slowdown (or memory growth) that `compare` treats as a regression
+THRESHOLD = 0.10
+# Banded rendering keeps create_perfect_logo's 4x supersample within this
+# many bytes at large sizes (the unbanded 8192px render needs ~15 GB)
+PERFECT_LOGO_BUDGET = 512 * 1024 * 1024
+
+
+# --- inputs -----------------------------------------------------------------
+
+def make_input(kind, size, input_dir):
+    """Deterministic logo-on-white test image of `size` px (cached on disk).
+
+    synthetic: a pie mark drawn directly at size; real: merki_logo_final.png
+    resampled to size.
+    """
+    path = os.path.join(input_dir, f"{kind}_{size}.png")
+    if os.path.exists(path):
+        return path
+    os.makedirs(input_dir, exist_ok=True)
+    if kind == "synthetic":
+        img = Image.new("RGB", (size, size), (255, 255, 255))
+        margin = size // 10
+        ImageDraw.Draw(img).pieslice([margin, margin, size - margin, size - margin],
+                                     start=-45, end=270, fill=(118, 75, 162))
+    else:
+        # Always the exact single-pass resample, so inputs never change between runs
+        img = resample.resize(Image.open(REAL_SOURCE).convert("RGB"), (size, size), "exact")
+    img.save(path, compress_level=1)
+    return path
+
+
+def _transparent_input(path, workdir):
+    # RGBA master for the exporters, keyed the way force_transparency does it
+    from force_transparency import make_transparent
+    out = os.path.join(workdir, "master.png")
+    with contextlib.redirect_stdout(io.StringIO()):
+        make_transparent(path, out)
+    return out
+
+
+# --- cases ------------------------------------------------------------------
+# Each case takes (input_path, size, workdir) and returns its output paths.
+# The optional setup step (like building an RGBA master for the exporters)
+# runs before the clock starts.
+
+def case_create_perfect_logo(input_path, size, workdir):
+    from create_perfect_logo import create_perfect_logo
+    out = os.path.join(workdir, "perfect.png")
+    budget = PERFECT_LOGO_BUDGET if size > 2048 else None
+    create_perfect_logo(size, budget, 1, out)
+    return [out]
+
+
+def case_create_perfect_logo_svg(input_path, size, workdir):
+    # The svg renderer, for comparison with the default 4x pieslice one
+    from create_perfect_logo import create_perfect_logo
+    out = os.path.join(workdir, "perfect.png")
+    budget = PERFECT_LOGO_BUDGET if size > 2048 else None
+    create_perfect_logo(size, budget, 1, out, renderer="svg")
+    return [out]
+
+
+def case_force_transparency(input_path, size, workdir):
+    from force_transparency import make_transparent
+    out = os.path.join(workdir, "transparent.png")
+    make_transparent(input_path, out)
+    return [out]
+
+
+def case_generate_logo_variations(input_path, size, workdir):
+    from generate_logo_variations import VARIATIONS, generate_variations
+    generate_variations(input_path, VARIATIONS, workdir)
+    return [os.path.join(workdir, v["name"]) for v in VARIATIONS]
+
+
+def case_export_logo(input_path, size, workdir):
+    from export_logo import BRAND_ASSETS, export
+    return export(input_path, BRAND_ASSETS, workdir)
+
+
+CASES = {
+    "create_perfect_logo": (case_create_perfect_logo, None),
+    "create_perfect_logo_svg": (case_create_perfect_logo_svg, None),
+    "force_transparency": (case_force_transparency, None),
+    "generate_logo_variations": (case_generate_logo_variations, None),
+    "export_logo": (case_export_logo, _transparent_input),
+}
+
+
+# --- measurement ------------------------------------------------------------
+
+def pixel_checksum(paths):
+    # Hash of the decoded RGBA pixels, so re-encodes that keep pixels match
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        img = Image.open(path)
+        h.update(f"{os.path.basename(path)}:{img.size}".encode())
+        h.update(img.convert("RGBA").tobytes())
+    return h.hexdigest()[:16]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024     # ru_maxrss: bytes on macOS, KB elsewhere
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * scale / 1e6, 1)
+
+
+def _child_cpu():
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_once(case, input_path, size, trace):
+    """Run one case in this process and return its measurements."""
+    func, setup = CASES[case]
+    workdir = tempfile.mkdtemp(prefix=f"bench_{case}_")
+    if setup:
+        input_path = setup(input_path, workdir)
+    if trace:
+        tracemalloc.start()
+    cpu_start, child_start = time.process_time(), _child_cpu()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        outputs = func(input_path, size, workdir)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start + _child_cpu() - child_start
+    result = {"wall_s": round(wall, 4), "cpu_s": round(cpu, 4), "peak_rss_mb": _peak_rss_mb()}
+    if trace:
+        result["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+    result["output_bytes"] = sum(os.path.getsize(p) for p in outputs)
+    result["checksum"] = pixel_checksum(outputs)
+    # Cases may leave side files too (e.g. .intermediates/ from intermediate.publish)
+    shutil.rmtree(workdir)
+    return result
+
+
+def measure(case, input_path, size, repeat=3):
+    """Best-of-`repeat` timings plus one tracemalloc run, each in a fresh process.
+
+    Fresh processes keep peak RSS per run honest and stop imports or warm
+    caches from one case leaking into the next. The render cache is off.
+    """
+    env = dict(os.environ, MERKI_RENDER_CACHE="0",
+               PYTHONPATH=os.pathsep.join([HERE, os.environ.get("PYTHONPATH", "")]))
+    runs = []
+    for trace in [False] * repeat + [True]:
+        cmd = [sys.executable, os.path.abspath(__file__), "_child", case, input_path, str(size)]
+        if trace:
+            cmd.append("--trace")
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{case} @ {size} failed:\n{proc.stderr}")
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    timed, traced = runs[:-1], runs[-1]
+    best = min(timed, key=lambda r: r["wall_s"])
+    return dict(best, peak_rss_mb=max(r["peak_rss_mb"] or 0 for r in timed) or None,
+                tracemalloc_peak_mb=traced["tracemalloc_peak_mb"],
+                runs=[r["wall_s"] for r in timed])
+
+
+# --- history ----------------------------------------------------------------
+
+def load_history(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def _commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                             capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(cases, sizes, kinds, repeat, history_path, input_dir):
+    record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": _commit(),
+              "python": platform.python_version(), "machine": platform.machine(),
+              "cpus": os.cpu_count(), "results": []}
+    print(f"{'case':<26} {'input':<10} {'size':>5} {'wall s':>8} {'cpu s':>8} {'rss MB':>8} "
+          f"{'py MB':>7} {'bytes':>12} checksum")
+    for case in cases:
+        for kind in kinds:
+            for size in sizes:
+                input_path = make_input(kind, size, input_dir)
+                r = measure(case, input_path, size, repeat)
+                r.update(case=case, input=kind, size=size)
+                record["results"].append(r)
+                print(f"{case:<26} {kind:<10} {size:>5} {r['wall_s']:>8.3f} {r['cpu_s']:>8.3f} "
+                      f"{r['peak_rss_mb'] or 0:>8.1f} {r['tracemalloc_peak_mb']:>7.1f} "
+                      f"{r['output_bytes']:>12,} {r['checksum']}")
+    history = load_history(history_path)
+    history.append(record)
+    with open(history_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=1)
+    print(f"Recorded run {len(history) - 1} in {history_path}")
+    return record
+
+
+def compare(history_path, baseline=-2, current=-1, threshold=THRESHOLD):
+    """Print per-case deltas between two recorded runs; True when nothing regressed."""
+    history = load_history(history_path)
+    if len(history) < 2:
+        print("Need at least two recorded runs to compare")
+        return True
+    base, cur = history[baseline], history[current]
+    base_results = {(r["case"], r["input"], r["size"]): r for r in base["results"]}
+    print(f"Baseline {base['timestamp']} ({base['commit']}) vs {cur['timestamp']} ({cur['commit']})")
+    print(f"{'case':<26} {'input':<10} {'size':>5} {'wall':>8} {'cpu':>8} {'rss':>8} {'py mem':>8} {'bytes':>8}")
+    ok = True
+    for r in cur["results"]:
+        b = base_results.get((r["case"], r["input"], r["size"]))
+        if b is None:
+            continue
+
+        def delta(key):
+            if not b.get(key) or r.get(key) is None:
+                return None
+            return r[key] / b[key] - 1
+
+        deltas = {k: delta(k) for k in ("wall_s", "cpu_s", "peak_rss_mb", "tracemalloc_peak_mb", "output_bytes")}
+        regressed = [k for k in ("wall_s", "peak_rss_mb", "tracemalloc_peak_mb")
+                     if deltas[k] is not None and deltas[k] > threshold]
+        cells = " ".join(f"{'-':>8}" if d is None else f"{d:>+8.1%}" for d in deltas.values())
+        flags = []
+        if regressed:
+            ok = False
+            flags.append("REGRESSION: " + ", ".join(regressed))
+        if r["checksum"] != b["checksum"]:
+            flags.append("pixels changed")
+        print(f"{r['case']:<26} {r['input']:<10} {r['size']:>5} {cells} {' '.join(flags)}")
+    return ok
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_child":
+        # Internal: one measured run, result as JSON on the last stdout line
+        case, input_path, size = sys.argv[2], sys.argv[3], int(sys.argv[4])
+        print(json.dumps(run_once(case, input_path, size, "--trace" in sys.argv)))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark the logo asset scripts")
+    parser.add_argument("--history", default=HISTORY)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="measure and append a run to the history")
+    p.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES))
+    p.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    p.add_argument("--inputs", nargs="+", choices=INPUT_KINDS, default=INPUT_KINDS)
+    p.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    p.add_argument("--input-dir", default=os.path.join(tempfile.gettempdir(), "merki_bench_inputs"))
+    p = sub.add_parser("compare", help="compare two runs; exit 1 on regression")
+    p.add_argument("--baseline", type=int, default=-2, help="history index (default: previous run)")
+    p.add_argument("--current", type=int, default=-1)
+    p.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed relative growth")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.cases, args.sizes, args.inputs, args.repeat, args.history, args.input_dir)
+    else:
+        sys.exit(0 if compare(args.history, args.baseline, args.current, args.threshold) else 1)
@@ -0,0 +1,356 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import runpy
+import sys
+import tempfile
+import time
+
+STATE_FILE = ".build_state.json"
+
+# The logo asset chain. Each step is a script run as __main__ in the build
+# directory; `inputs`/`outputs` are the files it reads and writes. The
+# script and the sibling modules it imports are inputs implicitly.
+# manual: never scheduled unless named on the command line.
+STEPS = [
+    # Copies the designer's export from a local Windows path
+    {"name": "update_logo", "script": "update_logo.py", "inputs": [], "outputs": ["logo.png"],
+     "manual": True},
+    # Keys and recolours logo.png in place
+    {"name": "process_logo", "script": "process_logo.py", "inputs": ["logo.png"], "outputs": ["logo.png"]},
+    {"name": "generate_logo_variations", "script": "generate_logo_variations.py", "inputs": ["logo.png"],
+     "outputs": ["logo_light1.png", "logo_light2.png", "logo_light3.png"]},
+    {"name": "force_transparency", "script": "force_transparency.py", "inputs": ["merki_logo_final.png"],
+     "outputs": ["merki_logo_transparent.png"]},
+    {"name": "create_final_hd", "script": "create_final_hd.py", "inputs": ["merki_logo_transparent.png"],
+     "outputs": ["merki_logo_2048px.png", "merki_logo_4096px.png"]},
+    {"name": "create_smooth_hd", "script": "create_smooth_hd.py", "inputs": ["merki_logo_transparent.png"],
+     "outputs": ["merki_logo_2048px_smooth.png"]},
+    {"name": "finalize_logo", "script": "finalize_logo.py", "inputs": ["merki_logo_transparent.png"],
+     "outputs": ["merki_social_logo_ultra_hd_final.png"]},
+    {"name": "create_correct_hd_logo", "script": "create_correct_hd_logo.py",
+     "inputs": ["merki_logo_transparent.png"],
+     "outputs": ["merki_social_logo_hd_correct.png", "merki_social_logo_1024.png"]},
+    {"name": "create_hd_logo", "script": "create_hd_logo.py", "inputs": ["merki_logo_transparent.png"],
+     "outputs": ["merki_social_logo_hd.png"]},
+    {"name": "analyze_logo", "script": "analyze_logo.py", "inputs": ["merki_logo_transparent.png"],
+     "outputs": []},
+    {"name": "inspect_logo_gap", "script": "inspect_logo_gap.py",
+     "inputs": ["merki_logo_transparent.png", "logo.svg"], "outputs": []},
+    {"name": "create_perfect_logo", "script": "create_perfect_logo.py", "inputs": ["logo.svg"],
+     "outputs": ["merki_logo_perfect_hd.png"]},
+    {"name": "create_ultra_hd_logo", "script": "create_ultra_hd_logo.py", "inputs": [],
+     "outputs": ["merki_social_logo_ultra_hd.png"]},
+    {"name": "create_v3_logo", "script": "create_v3_logo.py", "inputs": [],
+     "outputs": ["merki_social_logo_v3_2048.png"]},
+]
+
+_IMPORT = re.compile(r"^\s*(?:from\s+(\w+)\s+import|import\s+(\w+))", re.MULTILINE)
+
+
+def module_deps(script, root="."):
+    # The script plus every sibling module it imports, transitively
+    seen, todo = [], [script]
+    while todo:
+        path = todo.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        with open(os.path.join(root, path), encoding="utf-8") as f:
+            for m in _IMPORT.finditer(f.read()):
+                module = (m.group(1) or m.group(2)) + ".py"
+                if os.path.exists(os.path.join(root, module)):
+                    todo.append(module)
+    return sorted(seen)
+
+
+class Graph:
+    """Steps ordered by the files they exchange.
+
+    A step depends on every earlier-listed step that writes one of its
+    inputs; a step that rewrites its own input (process_logo) is not its
+    own dependency.
+    """
+
+    def __init__(self, steps=STEPS, root="."):
+        self.root = root
+        self.steps = {s["name"]: dict(s, code=module_deps(s["script"], root)) for s in steps}
+        producers = {}
+        for step in steps:
+            for path in step["outputs"]:
+                producers.setdefault(path, []).append(step["name"])
+        self.deps = {name: sorted({p for path in step["inputs"] for p in producers.get(path, [])
+                                   if p != name})
+                     for name, step in self.steps.items()}
+        self.order = self._topological()
+
+    def _topological(self):
+        order, state = [], {}
+
+        def visit(name):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Dependency cycle through {name}")
+            state[name] = "visiting"
+            for dep in self.deps[name]:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+        for name in self.steps:
+            visit(name)
+        return order
+
+    def select(self, targets=None):
+        # Steps to consider: targets (step names or output files) and their
+        # upstream, or every non-manual step
+        if not targets:
+            return [n for n in self.order if not self.steps[n].get("manual")]
+        wanted, todo = set(), []
+        for target in targets:
+            names = [n for n, s in self.steps.items() if target == n or target in s["outputs"]]
+            if not names:
+                raise ValueError(f"No step named or producing {target!r}")
+            todo += names
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo += [d for d in self.deps[name] if not self.steps[d].get("manual")]
+        return [n for n in self.order if n in wanted]
+
+
+# --- change detection -----------------------------------------------------
+
+class State:
+    """Last successful run of each step: stamps and hashes of its files.
+
+    A file counts as changed only when its content hash differs; a matching
+    (mtime, size) skips the hash, and a touched-but-identical file just has
+    its stamp refreshed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault("steps", {})
+        self.data.setdefault("files", {})
+
+    def file(self, path):
+        # [mtime_ns, size, sha256] of `path`, or None when it is missing
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        memo = self.data["files"].get(path)
+        if memo and memo[:2] == [st.st_mtime_ns, st.st_size]:
+            return memo
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.data["files"][path] = [st.st_mtime_ns, st.st_size, h.hexdigest()]
+        return self.data["files"][path]
+
+    def digest(self, path):
+        entry = self.file(path)
+        return entry[2] if entry else None
+
+    def reason(self, step):
+        # Why `step` must run, or None when it is up to date
+        last = self.data["steps"].get(step["name"])
+        if last is None:
+            return "never built"
+        for path in step["code"] + step["inputs"]:
+            if self.digest(path) != last["files"].get(path):
+                return f"{path} changed"
+        for path in step["outputs"]:
+            digest = self.digest(path)
+            if digest is None:
+                return f"{path} missing"
+            if digest != last["files"].get(path):
+                return f"{path} modified outside the build"
+        return None
+
+    def record(self, step, seconds):
+        # Inputs are hashed after the run, so in-place steps see their own output
+        paths = step["code"] + step["inputs"] + step["outputs"]
+        self.data["steps"][step["name"]] = {"files": {p: self.digest(p) for p in paths},
+                                            "seconds": round(seconds, 3), "built": time.time()}
+
+    def save(self):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+# --- running --------------------------------------------------------------
+
+def run_step(script, root):
+    # Pool worker: run one script as __main__, capturing what it prints
+    os.chdir(root)
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    # Scripts parse sys.argv; they run with their defaults, as by hand
+    sys.argv = [script]
+    out = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            runpy.run_path(script, run_name="__main__")
+        error = None
+    except SystemExit as e:
+        error = None if e.code in (None, 0) else f"exit status {e.code}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return time.perf_counter() - start, out.getvalue(), error
+
+
+def critical_path(graph, names, seconds):
+    # Longest chain of executed steps, by summed duration
+    finish, via = {}, {}
+    for name in names:
+        deps = [d for d in graph.deps[name] if d in finish]
+        best = max(deps, key=lambda d: finish[d], default=None)
+        finish[name] = seconds.get(name, 0.0) + (finish[best] if best else 0.0)
+        via[name] = best
+    if not finish:
+        return [], 0.0
+    end = max(finish, key=finish.get)
+    chain = [end]
+    while via[chain[-1]]:
+        chain.append(via[chain[-1]])
+    return chain[::-1], finish[end]
+
+
+def build(targets=None, root=".", jobs=None, force=False, dry_run=False, state_path=STATE_FILE):
+    """Bring `targets` (default: all non-manual steps) up to date.
+
+    Steps run on a process pool as soon as their dependencies are done, and
+    each step's staleness is decided only then, so a rebuilt file whose
+    hash did not change stops the rebuild from going further downstream.
+    Returns True when every step succeeded.
+    """
+    root = os.path.abspath(root)
+    os.chdir(root)
+    graph = Graph(root=root)
+    names = graph.select(targets)
+    state = State(state_path)
+    start = time.perf_counter()
+
+    pending = {n: set(d for d in graph.deps[n] if d in names) for n in names}
+    running, seconds, status = {}, {}, {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # Settle every ready step; up-to-date ones may unblock more at once
+            ready = [n for n, deps in pending.items() if not deps]
+            while ready:
+                for name in ready:
+                    del pending[name]
+                    step = graph.steps[name]
+                    failed = [d for d in graph.deps[name] if status.get(d) == "failed"]
+                    planned = [d for d in graph.deps[name] if status.get(d) == "would run"]
+                    reason = "forced" if force else state.reason(step)
+                    if reason is None and planned:
+                        reason = f"{planned[0]} would run"
+                    if failed:
+                        status[name] = "failed"
+                        print(f"  skip  {name}: {failed[0]} failed")
+                    elif reason is None:
+                        status[name] = "up to date"
+                    elif dry_run:
+                        status[name] = "would run"
+                        print(f"  would run  {name} ({reason})")
+                    else:
+                        print(f"  run   {name} ({reason})")
+                        running[pool.submit(run_step, step["script"], root)] = name
+                        continue
+                    for deps in pending.values():
+                        deps.discard(name)
+                ready = [n for n, deps in pending.items() if not deps]
+            if not running:
+                if pending:
+                    raise RuntimeError(f"Unschedulable steps: {', '.join(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                elapsed, output, error = future.result()
+                seconds[name] = elapsed
+                for line in output.splitlines():
+                    print(f"    [{name}] {line}")
+                if error:
+                    status[name] = "failed"
+                    print(f"  FAIL  {name} after {elapsed:.2f}s: {error}")
+                else:
+                    status[name] = "built"
+                    state.record(graph.steps[name], elapsed)
+                    print(f"  done  {name} in {elapsed:.2f}s")
+                for deps in pending.values():
+                    deps.discard(name)
+            if not dry_run:
+                state.save()
+    wall = time.perf_counter() - start
+    if not dry_run:
+        state.save()
+    summary(graph, names, status, seconds, wall)
+    return all(s != "failed" for s in status.values())
+
+
+def summary(graph, names, status, seconds, wall):
+    print(f"\n{'step':<28} {'status':<12} {'seconds':>8}")
+    for name in names:
+        t = f"{seconds[name]:.2f}" if name in seconds else "-"
+        print(f"{name:<28} {status.get(name, '-'):<12} {t:>8}")
+    chain, length = critical_path(graph, [n for n in names if n in seconds], seconds)
+    total = sum(seconds.values())
+    print(f"\n{len(seconds)} step(s) run, {total:.2f}s of work in {wall:.2f}s wall "
+          f"({total / wall if wall else 0:.1f}x parallel)")
+    if chain:
+        print(f"Critical path ({length:.2f}s, {length / wall:.0%} of wall): "
+              + " -> ".join(f"{n} {seconds[n]:.2f}s" for n in chain))
+
+
+def print_graph(graph, dot=False):
+    if dot:
+        print("digraph assets {")
+        for name in graph.order:
+            for dep in graph.deps[name]:
+                print(f'  "{dep}" -> "{name}";')
+        print("}")
+        return
+    for name in graph.order:
+        step = graph.steps[name]
+        after = f" after {', '.join(graph.deps[name])}" if graph.deps[name] else ""
+        manual = " (manual)" if step.get("manual") else ""
+        print(f"{name}{manual}{after}\n    in:  {', '.join(step['inputs']) or '-'}"
+              f"\n    out: {', '.join(step['outputs']) or '-'}\n    code: {', '.join(step['code'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the logo assets from their dependency graph")
+    parser.add_argument("targets", nargs="*", help="step names or output files (default: everything)")
+    parser.add_argument("--root", default=".")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="parallel steps (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rerun the selected steps regardless of state")
+    parser.add_argument("--dry-run", "-n", action="store_true", help="show what would run")
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--graph", choices=["text", "dot"], help="print the graph and exit")
+    args = parser.parse_args()
+
+    if args.graph:
+        os.chdir(args.root)
+        print_graph(Graph(), dot=args.graph == "dot")
+    else:
+        ok = build(args.targets, args.root, args.jobs, args.force, args.dry_run, args.state)
+        raise SystemExit(0 if ok else 1)
@@ -1,27 +1,23 @@
-from PIL import Image, ImageFilter
+import argparse
+from export_logo import export, select
+from png_stream import PRINT_MASTERS, print_masters
 
 def finalize_ultra_hd_logo():
-    input_path = "merki_logo_transparent.png"
     # 2048px版と4096px版を作成
-    output_2048 = "merki_logo_2048px.png"
-    output_4096 = "merki_logo_4096px.png"
-    
-    img = Image.open(input_path).convert("RGBA")
-    
-    # 2048x2048 作成
-    img_2048 = img.resize((2048, 2048), Image.Resampling.LANCZOS)
     # 拡大時のわずかなぼやけを解消するために、ごく微細なアンシャープマスクを適用
-    img_2048 = img_2048.filter(ImageFilter.UnsharpMask(radius=1, percent=120, threshold=3))
-    img_2048.save(output_2048, "PNG", compress_level=1)
-    
-    # 4096x4096 作成
-    img_4096 = img.resize((4096, 4096), Image.Resampling.LANCZOS)
-    img_4096 = img_4096.filter(ImageFilter.UnsharpMask(radius=1, percent=150, threshold=3))
-    img_4096.save(output_4096, "PNG", compress_level=1)
+    # (設定は export_logo.BRAND_ASSETS を参照)
+    outputs = export(outputs=select(["merki_logo_2048px.png", "merki_logo_4096px.png"]))
     
     print(f"Created high-res versions from original:")
-    print(f"- {output_2048}")
-    print(f"- {output_4096}")
+    for path in outputs:
+        print(f"- {path}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the 2048px and 4096px logos")
+    parser.add_argument("--print", action="store_true",
+                        help=f"also stream the print masters ({', '.join(m['name'] for m in PRINT_MASTERS)})")
+    args = parser.parse_args()
     finalize_ultra_hd_logo()
+    if args.print:
+        # 8192/16384px are written strip by strip, never held in memory whole
+        print_masters()
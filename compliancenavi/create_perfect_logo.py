@@ -1,56 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import argparse
+import inspect
 from PIL import Image, ImageDraw
-import math
-
-def create_perfect_logo():
-    # 1. Colors from original analysis (refined)
-    # The original logo uses a gradient. Let's pick colors that match the "feel" exactly.
-    # Looking at the original: Top-left is lighter purple, Bottom-right is darker.
-    color_start = (102, 126, 234) # Matches --primary-gradient in style.css
-    color_end = (118, 75, 162)   # Matches --primary-gradient in style.css
-    
-    # 2. Render at Super Resolution for perfect anti-aliasing
-    final_size = 2048
-    super_size = final_size * 4 # 8192x8192
-    
-    # Create super-res canvas
-    img = Image.new('RGBA', (super_size, super_size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    
-    center = super_size // 2
-    radius = int(super_size * 0.46)
-    
+import numpy as np
+from asset_encoder import encode_best
+from gradient import gradient_array
+from image_stats import load_gradient
+from profiling import profiled, stage
+from render_cache import cached_render
+import resample
+import svg_raster
+
+# 1. Colors from original analysis (refined)
+# The original logo uses a gradient. Let's pick colors that match the "feel" exactly.
+# Looking at the original: Top-left is lighter purple, Bottom-right is darker.
+COLOR_START = (102, 126, 234) # Matches --primary-gradient in style.css
+COLOR_END = (118, 75, 162)   # Matches --primary-gradient in style.css
+
+# Render at 4x Super Resolution for perfect anti-aliasing
+SUPERSAMPLE = 4
+
+# renderer="svg" rasterizes the vector mark straight at the output size
+# with exact area coverage instead of supersampling a pieslice mask.
+# The 4% padding gives the same 0.46 radius as the pieslice, but the gap is
+# mirrored: logo.svg leaves out 225-270 degrees (clockwise from 3 o'clock),
+# the pieslice 270-315. The pieslice stays the default until the brand
+# owner confirms which orientation is correct.
+RENDERERS = ("svg", "supersample")
+DEFAULT_RENDERER = "supersample"
+LOGO_SVG = "logo.svg"
+LOGO_PADDING = 0.04
+
+# LANCZOS reads 3 output rows' worth of source on each side of a row, so every
+# band is rendered with this many extra rows and cropped back after reducing.
+# That makes the stitched result identical to a single full-canvas render.
+LANCZOS_HALO = 3
+
+# Bytes held per supersampled pixel while a band is in flight: RGBA gradient,
+# L mask, the premultiplied RGBa copy made by resize and its horizontal pass.
+BYTES_PER_SUPER_PIXEL = 14
+
+
+def band_rows_for_budget(final_size, memory_budget, scale=SUPERSAMPLE):
+    # Output rows per band so that one band stays within memory_budget bytes
+    per_row = final_size * scale * scale * BYTES_PER_SUPER_PIXEL
+    rows = memory_budget // per_row - 2 * LANCZOS_HALO
+    return int(max(1, min(final_size, rows)))
+
+
+@profiled("render_band")
+def render_band(final_size, top, bottom, scale=SUPERSAMPLE,
+                color_start=COLOR_START, color_end=COLOR_END, angle=135, quality=resample.QUALITY,
+                renderer="supersample"):
+    # Supersample, mask and reduce output rows [top, bottom) on their own
+    if renderer == "svg":
+        return render_svg_band(final_size, top, bottom, color_start, color_end, angle)
+    super_size = final_size * scale
+    halo_top = max(0, top - LANCZOS_HALO)
+    halo_bottom = min(final_size, bottom + LANCZOS_HALO)
+    s_top, s_bottom = halo_top * scale, halo_bottom * scale
+
     # 3. Draw accurate gradient circle
-    # We draw thousands of single-pixel lines to create a smooth diagonal gradient
-    for i in range(super_size * 2):
-        ratio = i / (super_size * 2)
-        r = int(color_start[0] * (1 - ratio) + color_end[0] * ratio)
-        g = int(color_start[1] * (1 - ratio) + color_end[1] * ratio)
-        b = int(color_start[2] * (1 - ratio) + color_end[2] * ratio)
-        # Diagonal lines
-        draw.line([(i, 0), (0, i)], fill=(r, g, b, 255))
-        
+    # 135deg diagonal gradient for just this slice of the super-res canvas
+    with stage("gradient", pixels=super_size * (s_bottom - s_top)):
+        data = gradient_array((super_size, super_size), color_start, color_end,
+                              angle=angle, rows=(s_top, s_bottom))
+        band = Image.fromarray(data, "RGBA")
+
     # 4. Create Mask for the SVG shape (M50,50 L50,0 A50,50 0 1,1 14.64,14.64 Z)
     # This shape is a circle with a slice missing from 0 degrees (12 o'clock) up to 45 degrees (1:30)
-    mask = Image.new('L', (super_size, super_size), 0)
+    mask = Image.new('L', band.size, 0)
     mask_draw = ImageDraw.Draw(mask)
-    
-    # Pieslice in PIL: 0 is at 3 o'clock. 
+
+    center = super_size // 2
+    radius = int(super_size * 0.46)
+
+    # Pieslice in PIL: 0 is at 3 o'clock.
     # 12 o'clock is -90. 1:30 is -45.
     # So we want to fill from -45 degrees all the way round to -90 (315 degrees total)
-    bbox = [center - radius, center - radius, center + radius, center + radius]
-    mask_draw.pieslice(bbox, start=-45, end=270, fill=255)
-    
-    # Apply mask
-    final_super = Image.new('RGBA', (super_size, super_size), (0, 0, 0, 0))
-    final_super.paste(img, (0, 0), mask)
-    
+    # The bbox is shifted up so the band sees its own part of the circle.
+    bbox = [center - radius, center - radius - s_top, center + radius, center + radius - s_top]
+    with stage("draw_mask", pixels=super_size * (s_bottom - s_top)):
+        mask_draw.pieslice(bbox, start=-45, end=270, fill=255)
+
+        # Apply mask. The mask is binary and resize works on premultiplied alpha,
+        # so this matches pasting onto a transparent canvas.
+        band.putalpha(mask)
+
     # 5. Down-sample with high-quality filter (Supersampling Anti-Aliasing)
     # This result in extremely smooth edges even at high zoom
-    final_logo = final_super.resize((final_size, final_size), Image.Resampling.LANCZOS)
-    
-    output_path = "merki_logo_perfect_hd.png"
-    final_logo.save(output_path, "PNG", compress_level=0)
-    print(f"Perfect logo created: {output_path}")
+    # (the exact 4x factor lets resample plan a cheap box reduce() first;
+    # band edges stay multiples of the factor, so bands still stitch exactly)
+    with stage("resize", pixels=super_size * (s_bottom - s_top)):
+        reduced = resample.resize(band, (final_size, halo_bottom - halo_top), quality)
+    return reduced.crop((0, top - halo_top, final_size, bottom - halo_top))
+
+
+def render_svg_band(final_size, top, bottom, color_start=COLOR_START, color_end=COLOR_END, angle=135):
+    # One sample per output pixel: gradient at the final size, alpha from the
+    # SVG path's exact coverage. Bands need no halo, there is no filter.
+    with stage("gradient", pixels=final_size * (bottom - top)):
+        data = gradient_array((final_size, final_size), color_start, color_end,
+                              angle=angle, rows=(top, bottom))
+    with stage("draw_mask", pixels=final_size * (bottom - top)):
+        mask = svg_raster.render_alpha(svg_raster.load_svg(LOGO_SVG), (final_size, final_size), rows=(top, bottom),
+                                       padding=LOGO_PADDING).astype(np.uint32)
+        # Alpha into the top byte of each little-endian RGBA pixel; fully
+        # transparent pixels are zeroed like the supersampled path leaves them
+        px = data.view("<u4")[..., 0]
+        px &= 0x00FFFFFF
+        px |= mask << 24
+        px *= mask > 0
+    return Image.fromarray(data, "RGBA")
+
+
+def create_perfect_logo(final_size=2048, memory_budget=None, workers=1,
+                        output_path="merki_logo_perfect_hd.png", gradient=None, quality=resample.QUALITY,
+                        renderer=DEFAULT_RENDERER):
+    # gradient: (start, end, angle), e.g. image_stats.load_gradient(); defaults
+    # to the style.css --primary-gradient constants.
+    # Banding and worker count do not change the pixels, so they are not part of the key
+    gradient = gradient or (COLOR_START, COLOR_END, 135)
+    if renderer == "svg":
+        params = {"size": final_size, "renderer": renderer, "padding": LOGO_PADDING,
+                  "colors": [COLOR_START, COLOR_END]}
+    else:
+        params = {"size": final_size, "supersample": SUPERSAMPLE,
+                  "colors": [COLOR_START, COLOR_END], "resample": quality}
+    if gradient != (COLOR_START, COLOR_END, 135):
+        params["gradient"] = gradient
+    sources = [__file__, inspect.getsourcefile(gradient_array), inspect.getsourcefile(encode_best),
+               inspect.getsourcefile(resample)]
+    if renderer == "svg":
+        sources += [LOGO_SVG, inspect.getsourcefile(svg_raster)]
+    cached_render("create_perfect_logo", sources,
+                  params, [output_path],
+                  lambda: render_logo(final_size, memory_budget, workers, output_path, gradient, quality, renderer))
+
+
+def render_logo(final_size, memory_budget, workers, output_path, gradient=None, quality=resample.QUALITY,
+                renderer=DEFAULT_RENDERER):
+    # memory_budget (bytes, per worker) switches to banded rendering; without
+    # it the whole canvas is rendered as one band.
+    if memory_budget:
+        # The svg renderer holds a few float planes per output pixel instead
+        band_rows = band_rows_for_budget(final_size, memory_budget, 1 if renderer == "svg" else SUPERSAMPLE)
+    else:
+        band_rows = final_size
+    tops = list(range(0, final_size, band_rows))
+    bottoms = [min(top + band_rows, final_size) for top in tops]
+
+    color_start, color_end, angle = gradient or (COLOR_START, COLOR_END, 135)
+    final_logo = Image.new('RGBA', (final_size, final_size), (0, 0, 0, 0))
+    if workers > 1 and len(tops) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(render_band, repeat(final_size), tops, bottoms, repeat(SUPERSAMPLE),
+                             repeat(color_start), repeat(color_end), repeat(angle), repeat(quality),
+                             repeat(renderer))
+            for top, part in zip(tops, parts):
+                final_logo.paste(part, (0, top))
+    else:
+        for top, bottom in zip(tops, bottoms):
+            band = render_band(final_size, top, bottom, SUPERSAMPLE, color_start, color_end, angle, quality,
+                               renderer)
+            final_logo.paste(band, (0, top))
+
+    # Smallest pixel-identical PNG instead of an uncompressed one
+    with stage("encode", pixels=final_size * final_size):
+        encode_best(final_logo, output_path)
+    print(f"Perfect logo created: {output_path} ({len(tops)} band(s) of {band_rows} rows)")
+
 
 if __name__ == "__main__":
-    create_perfect_logo()
+    parser = argparse.ArgumentParser(description="Render the MERKI logo from scratch")
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--memory-budget", type=int, default=None,
+                        help="per-worker band budget in MB (enables banded rendering)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default="merki_logo_perfect_hd.png")
+    parser.add_argument("--gradient-from", help="image_stats JSON report, or an image to fit the gradient from")
+    parser.add_argument("--resample", choices=resample.QUALITIES, default=resample.QUALITY,
+                        help="exact: single LANCZOS pass, high: reduce(2) + LANCZOS, fast: box reduce(4)")
+    parser.add_argument("--renderer", choices=RENDERERS, default=DEFAULT_RENDERER,
+                        help=f"supersample: 4x pieslice mask (gap at 270-315 deg), svg: exact coverage of "
+                             f"{LOGO_SVG} at the output size (gap mirrored to 225-270 deg)")
+    args = parser.parse_args()
+    budget = args.memory_budget * 1024 * 1024 if args.memory_budget else None
+    gradient = load_gradient(args.gradient_from) if args.gradient_from else None
+    create_perfect_logo(args.size, budget, args.workers, args.output, gradient, args.resample, args.renderer)
@@ -1,15 +1,14 @@
 from PIL import Image, ImageDraw
 import os
+from gradient import radial_gradient
+from asset_encoder import encode_best
+from profiling import stage
 
 # Create a high-resolution MERKI logo from scratch
 # Size: 2048x2048 for ultra-high resolution
 size = 2048
 output_path = "merki_social_logo_ultra_hd.png"
 
-# Create a new image with transparent background
-img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-draw = ImageDraw.Draw(img)
-
 # Define the circle parameters
 center = size // 2
 radius = int(size * 0.45)  # 90% of half the size for padding
@@ -18,18 +17,19 @@ radius = int(size * 0.45)  # 90% of half the size for padding
 color_light = (155, 127, 199)  # #9b7fc7
 color_dark = (118, 75, 162)    # #764ba2
 
-# Draw the main circle with gradient effect
-# We'll simulate gradient by drawing multiple circles with varying colors
-for i in range(radius, 0, -1):
-    # Calculate the color for this ring (gradient from light to dark)
-    ratio = i / radius
-    r = int(color_light[0] * ratio + color_dark[0] * (1 - ratio))
-    g = int(color_light[1] * ratio + color_dark[1] * (1 - ratio))
-    b = int(color_light[2] * ratio + color_dark[2] * (1 - ratio))
-    
-    # Draw the circle
-    bbox = [center - i, center - i, center + i, center + i]
-    draw.ellipse(bbox, fill=(r, g, b, 255))
+# Draw the main circle with a radial gradient (dark centre -> light rim),
+# computed in one pass and clipped to the circle with a single ellipse mask
+with stage("gradient", pixels=size * size):
+    gradient = radial_gradient((size, size), color_dark, color_light,
+                               center=(center, center), radius=radius)
+with stage("draw_mask", pixels=size * size):
+    mask = Image.new('L', (size, size), 0)
+    ImageDraw.Draw(mask).ellipse(
+        [center - radius, center - radius, center + radius, center + radius], fill=255
+    )
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    img.paste(gradient, (0, 0), mask)
+draw = ImageDraw.Draw(img)
 
 # Draw the white diagonal line (pie chart segment)
 # This creates the distinctive MERKI logo look
@@ -46,7 +46,9 @@ draw.pieslice(
 )
 
 # Save the ultra-high-resolution version
-img.save(output_path, 'PNG', optimize=False, quality=100)
+# (smallest pixel-identical PNG encoding)
+with stage("encode", pixels=size * size):
+    encode_best(img, output_path)
 print(f"Ultra-high-resolution logo created: {output_path}")
 print(f"Size: {img.size}")
 print(f"File size: {os.path.getsize(output_path) / 1024:.2f} KB")
@@ -1,4 +1,7 @@
 from PIL import Image, ImageDraw
+from gradient import linear_gradient
+from asset_encoder import encode_best
+from profiling import stage
 
 def create_ultra_hd_logo_v3():
     size = 2048
@@ -6,22 +9,11 @@ def create_ultra_hd_logo_v3():
     
     # 1. グラデーション背景を作成
     # #667eea (102, 126, 234) -> #764ba2 (118, 75, 162)
-    base = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    gradient = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    draw_grad = ImageDraw.Draw(gradient)
-    
-    # 135度の対角線グラデーションをシミュレート
+    # 135度の対角線グラデーション
     start_color = (102, 126, 234)
     end_color = (118, 75, 162)
-    
-    for i in range(size * 2):
-        ratio = i / (size * 2)
-        r = int(start_color[0] * (1 - ratio) + end_color[0] * ratio)
-        g = int(start_color[1] * (1 - ratio) + end_color[1] * ratio)
-        b = int(start_color[2] * (1 - ratio) + end_color[2] * ratio)
-        
-        # 斜め線（x + y = i）を描画
-        draw_grad.line([(i, 0), (0, i)], fill=(r, g, b, 255))
+    with stage("gradient", pixels=size * size):
+        gradient = linear_gradient((size, size), start_color, end_color, angle=135)
         
     # 2. マスク（パックマン型）を作成
     mask = Image.new('L', (size, size), 0)
@@ -36,14 +28,16 @@ def create_ultra_hd_logo_v3():
     # 10:30時 = -135度 または 225度
     # 開始: 270度、終了: 225度 (長い方を通る)
     # PIL は start < end を想定する場合が多いので、315度分を描画
-    draw_mask.pieslice(bbox, start=-90, end=225, fill=255)
+    with stage("draw_mask", pixels=size * size):
+        draw_mask.pieslice(bbox, start=-90, end=225, fill=255)
     
-    # 3. グラデーションにマスクを適用
-    final = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    final.paste(gradient, (0, 0), mask)
+        # 3. グラデーションにマスクを適用
+        final = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        final.paste(gradient, (0, 0), mask)
     
-    # 4. 保存
-    final.save(output_path, "PNG", compress_level=0)
+    # 4. 保存（ピクセル完全一致のまま最小サイズのPNGを選択）
+    with stage("encode", pixels=size * size):
+        encode_best(final, output_path)
     print(f"Ultra HD Logo V3 created: {output_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,425 @@
+from html.parser import HTMLParser
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import re
+from encoding_scan import read_text
+
+OUTPUT_DIR = "css_bundles"
+INDEX_FILE = ".css_index.json"
+STYLESHEETS = ("style.css", "pro_dashboard.css", "no-motion.css")
+
+# Block at-rules whose children are pruned like top-level rules; every other
+# block at-rule (@keyframes, @font-face, ...) is kept verbatim.
+NESTED_AT_RULES = ("@media", "@supports", "@layer", "@container")
+
+WORD = re.compile(r"[A-Za-z_][\w-]*")
+PSEUDO = re.compile(r"::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?")
+ATTRIBUTE_SELECTOR = re.compile(r"\[[^\]]*\]")
+CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+ID = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+TAG = re.compile(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)")
+# Static ES-module imports/re-exports and literal dynamic import()s
+IMPORT = re.compile(r"""(?:\bimport\s*(?:[\w$*{}\s,]+?\s*from\s*)?|\bexport\s*[\w$*{}\s,]+?\s*from\s*|"""
+                    r"""\bimport\s*\(\s*)(["'])([^"'\n]+)\1""")
+STRING = re.compile(r"""("|')(?:\\.|(?!\1).)*\1""", re.DOTALL)
+
+
+# --- stylesheet parsing -----------------------------------------------------
+
+def _scan_to(text, pos, stops):
+    # Position of the next char in `stops`, skipping strings and parentheses
+    depth, quote = 0, None
+    while pos < len(text):
+        ch = text[pos]
+        if quote:
+            if ch == "\\":
+                pos += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and ch in stops:
+            return pos
+        pos += 1
+    return pos
+
+
+def _block_end(text, pos):
+    # Index just past the "}" matching the "{" at pos
+    depth = 0
+    while pos < len(text):
+        pos = _scan_to(text, pos, "{}")
+        if pos >= len(text):
+            break
+        depth += 1 if text[pos] == "{" else -1
+        pos += 1
+        if depth == 0:
+            break
+    return pos
+
+
+def _parse_block(text, pos):
+    nodes = []
+    while pos < len(text):
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            break
+        if text[pos] == "}":
+            return nodes, pos + 1
+        start = pos
+        pos = _scan_to(text, pos, "{;}")
+        prelude = text[start:pos].strip()
+        if pos >= len(text) or text[pos] != "{":
+            if prelude:
+                nodes.append({"kind": "raw", "text": prelude + ";"})
+            if pos < len(text) and text[pos] == ";":
+                pos += 1
+            continue
+        if prelude.startswith(NESTED_AT_RULES):
+            children, pos = _parse_block(text, pos + 1)
+            nodes.append({"kind": "at", "prelude": prelude, "children": children})
+        elif prelude.startswith("@"):
+            end = _block_end(text, pos)
+            nodes.append({"kind": "raw", "text": prelude + text[pos:end]})
+            pos = end
+        else:
+            end = _block_end(text, pos)
+            selectors = [s.strip() for s in _split_selectors(prelude)]
+            nodes.append({"kind": "style", "selectors": selectors, "body": text[pos + 1:end - 1]})
+            pos = end
+    return nodes, pos
+
+
+def _split_selectors(prelude):
+    parts, start, pos = [], 0, 0
+    while True:
+        pos = _scan_to(prelude, pos, ",")
+        parts.append(prelude[start:pos])
+        if pos >= len(prelude):
+            return parts
+        pos += 1
+        start = pos
+
+
+def parse_css(text):
+    """Parse a stylesheet into style / nested at-rule / raw nodes."""
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    return _parse_block(text, 0)[0]
+
+
+def selector_requirements(selector):
+    # Classes, ids and tags a page must contain for the selector to match.
+    # Pseudo-classes (including :not(...)) and attribute selectors only
+    # narrow a match, so they add no requirement.
+    bare = ATTRIBUTE_SELECTOR.sub("", PSEUDO.sub("", selector))
+    classes = CLASS.findall(bare)
+    ids = ID.findall(bare)
+    tags = TAG.findall(CLASS.sub("", ID.sub("", bare)))
+    return sorted(set(classes)), sorted(set(ids)), sorted({t.lower() for t in tags})
+
+
+def _iter_selectors(nodes):
+    for node in nodes:
+        if node["kind"] == "style":
+            yield from node["selectors"]
+        elif node["kind"] == "at":
+            yield from _iter_selectors(node["children"])
+
+
+# --- page tokens ------------------------------------------------------------
+
+class _PageScanner(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tags, self.classes, self.ids, self.words = set(), set(), set(), set()
+        self.stylesheets, self.scripts, self.inline = [], [], []
+        self._in_script = False
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        attrs = dict(attrs)
+        self.classes.update((attrs.get("class") or "").split())
+        if attrs.get("id"):
+            self.ids.add(attrs["id"])
+        if tag == "link" and "stylesheet" in (attrs.get("rel") or "") and attrs.get("href"):
+            self.stylesheets.append(attrs["href"].split("?")[0])
+        if tag == "script":
+            self._in_script = True
+            if attrs.get("src"):
+                self.scripts.append(attrs["src"].split("?")[0])
+
+    def handle_endtag(self, tag):
+        if tag == "script":
+            self._in_script = False
+
+    def handle_data(self, data):
+        # Classes built in inline scripts (classList.add('x'), innerHTML
+        # templates, ...) cannot be resolved statically: every word counts.
+        if self._in_script:
+            self.words.update(WORD.findall(data))
+            self.inline.append(data)
+
+
+def _local_imports(text, base_dir):
+    # Paths of the relative modules a script imports ('./auth.js?v=...' -> auth.js)
+    out = []
+    for _, spec in IMPORT.findall(text):
+        if spec.startswith(("./", "../")):
+            out.append(os.path.normpath(os.path.join(base_dir, re.split(r"[?#]", spec)[0])))
+    return out
+
+
+def scan_page(path):
+    text, _ = read_text(path)
+    scanner = _PageScanner()
+    scanner.feed(text)
+    page_dir = os.path.dirname(path)
+    # Linked scripts plus every local module they or inline scripts import,
+    # transitively; all of their words count like the page's own
+    pending = [os.path.normpath(os.path.join(page_dir, src)) for src in scanner.scripts
+               if not re.match(r"^(https?:)?//", src)]
+    for inline in scanner.inline:
+        pending += _local_imports(inline, page_dir)
+    scripts = []
+    while pending:
+        local = pending.pop(0)
+        if local in scripts:
+            continue
+        scripts.append(local)
+        if os.path.isfile(local):
+            source = read_text(local)[0]
+            scanner.words.update(WORD.findall(source))
+            pending += _local_imports(source, os.path.dirname(local))
+    return {
+        "tags": sorted(scanner.tags), "classes": sorted(scanner.classes),
+        "ids": sorted(scanner.ids), "words": sorted(scanner.words),
+        "stylesheets": [os.path.normpath(os.path.join(page_dir, s)) for s in scanner.stylesheets],
+        "scripts": scripts,
+    }
+
+
+def used_selectors(requirements, tokens):
+    classes = set(tokens["classes"]) | set(tokens["words"])
+    ids = set(tokens["ids"]) | set(tokens["words"])
+    tags = set(tokens["tags"]) | {w.lower() for w in tokens["words"]} | {"html", "body"}
+    return sorted(sel for sel, (cls, idents, tgs) in requirements.items()
+                  if classes.issuperset(cls) and ids.issuperset(idents) and tags.issuperset(tgs))
+
+
+# --- incremental index ------------------------------------------------------
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _page_stamp(page, scripts):
+    # The page's own stamp plus its linked local scripts' (None if missing),
+    # since scan_page takes tokens from both
+    stamps = {s: _stamp(s) if os.path.isfile(s) else None for s in scripts}
+    return {"page": _stamp(page), "scripts": stamps}
+
+
+def build_index(pages, sheets, index_path=INDEX_FILE):
+    """Selector requirements per sheet, tokens and used selectors per page.
+
+    Entries are reused while their (mtime, size) stamps match, so editing one
+    page (or a script it links) only rescans and re-matches that page;
+    editing a stylesheet re-matches the pages that link it.
+    """
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    old_sheets, old_pages = index.get("sheets", {}), index.get("pages", {})
+    index = {"sheets": {}, "pages": {}}
+
+    for sheet in sheets:
+        entry = old_sheets.get(sheet)
+        if not entry or entry["stamp"] != _stamp(sheet):
+            nodes = parse_css(read_text(sheet)[0])
+            entry = {"stamp": _stamp(sheet),
+                     "requirements": {s: selector_requirements(s) for s in _iter_selectors(nodes)}}
+        index["sheets"][sheet] = entry
+
+    rescanned = 0
+    for page in pages:
+        entry = old_pages.get(page)
+        if not entry or entry["stamp"] != _page_stamp(page, entry["tokens"].get("scripts", [])):
+            tokens = scan_page(page)
+            entry = {"stamp": _page_stamp(page, tokens["scripts"]), "tokens": tokens, "used": {}}
+            rescanned += 1
+        used = {}
+        for sheet in entry["tokens"]["stylesheets"]:
+            if sheet not in index["sheets"]:
+                continue
+            cached = entry["used"].get(sheet)
+            if cached and cached["sheet_stamp"] == index["sheets"][sheet]["stamp"]:
+                used[sheet] = cached
+            else:
+                used[sheet] = {"sheet_stamp": index["sheets"][sheet]["stamp"],
+                               "selectors": used_selectors(index["sheets"][sheet]["requirements"],
+                                                           entry["tokens"])}
+        entry["used"] = used
+        index["pages"][page] = entry
+
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    print(f"Index: {len(sheets)} stylesheet(s), {len(pages)} page(s), {rescanned} rescanned")
+    return index
+
+
+# --- pruning and output -----------------------------------------------------
+
+def prune(nodes, keep):
+    """Copy of the tree with only selectors in `keep` (empty rules/blocks dropped)."""
+    out = []
+    for node in nodes:
+        if node["kind"] == "style":
+            selectors = [s for s in node["selectors"] if s in keep]
+            if selectors:
+                out.append(dict(node, selectors=selectors))
+        elif node["kind"] == "at":
+            children = prune(node["children"], keep)
+            if children:
+                out.append(dict(node, children=children))
+        else:
+            out.append(node)
+    return out
+
+
+def _squeeze(text, punctuation=""):
+    # Collapse whitespace and drop it around `punctuation`, outside string literals
+    def outside(chunk):
+        chunk = re.sub(r"\s+", " ", chunk)
+        return re.sub(r"\s*([" + punctuation + r"])\s*", r"\1", chunk) if punctuation else chunk
+
+    out, pos = [], 0
+    for m in STRING.finditer(text):
+        out += [outside(text[pos:m.start()]), m.group(0)]
+        pos = m.end()
+    out.append(outside(text[pos:]))
+    return "".join(out)
+
+
+def minify(nodes):
+    out = []
+    for node in nodes:
+        if node["kind"] == "style":
+            body = _squeeze(node["body"].strip(), ":;,{}>")
+            out.append(",".join(_squeeze(s) for s in node["selectors"])
+                       + "{" + body.rstrip(";") + "}")
+        elif node["kind"] == "at":
+            out.append(_squeeze(node["prelude"]) + "{" + minify(node["children"]) + "}")
+        else:
+            out.append(_squeeze(node["text"], "{};:,"))
+    return "".join(out)
+
+
+def _node_selectors(node):
+    if node["kind"] == "style":
+        return node["selectors"]
+    if node["kind"] == "at":
+        return [s for child in node["children"] for s in _node_selectors(child)]
+    return []
+
+
+def shared_prefix(tree, users):
+    """Number of leading top-level nodes that every page in `users` keeps alike.
+
+    Within the prefix each selector is used by all pages or by none, so
+    hoisting it into a shared bundle loaded first leaves every page's
+    rules in their source order.
+    """
+    for k, node in enumerate(tree):
+        for selector in _node_selectors(node):
+            if 0 < sum(selector in used for used in users) < len(users):
+                return k
+    return len(tree)
+
+
+def _shared_prefixes(index, trees):
+    users = {sheet: [set(p["used"][sheet]["selectors"]) for p in index["pages"].values() if sheet in p["used"]]
+             for sheet in trees}
+    prefix = {sheet: shared_prefix(tree, users[sheet]) if users[sheet] else 0 for sheet, tree in trees.items()}
+    # The shared bundles load before the page's own one, so a sheet may only
+    # hoist rules if no earlier sheet on any page linking it left rules behind
+    changed = True
+    while changed:
+        changed = False
+        for entry in index["pages"].values():
+            behind = False
+            for sheet, used in entry["used"].items():
+                if behind and prefix[sheet]:
+                    prefix[sheet], changed = 0, True
+                behind = behind or bool(prune(trees[sheet][prefix[sheet]:], set(used["selectors"])))
+    return prefix
+
+
+def write_bundles(index, mode="per-page", output_dir=OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    trees = {sheet: parse_css(read_text(sheet)[0]) for sheet in index["sheets"]}
+    full = {sheet: len(minify(tree)) for sheet, tree in trees.items()}
+    prefix = {sheet: 0 for sheet in trees}
+    if mode == "shared":
+        # The leading rules every linking page keeps alike go into one cacheable
+        # bundle per sheet; pages link the <sheet>.shared.css files in their own
+        # sheet order, then <page>.css
+        prefix = _shared_prefixes(index, trees)
+        for sheet, tree in trees.items():
+            if prefix[sheet]:
+                keep = {s for p in index["pages"].values() if sheet in p["used"] for s in p["used"][sheet]["selectors"]}
+                css = minify(prune(tree[:prefix[sheet]], keep))
+                name = os.path.splitext(os.path.basename(sheet))[0] + ".shared.css"
+                with open(os.path.join(output_dir, name), "w", encoding="utf-8") as f:
+                    f.write(css)
+                print(f"{name:<44} {full[sheet]:>8,} -> {len(css):>8,} bytes")
+
+    for page, entry in sorted(index["pages"].items()):
+        parts, before = [], 0
+        for sheet, used in entry["used"].items():
+            parts.append(minify(prune(trees[sheet][prefix[sheet]:], set(used["selectors"]))))
+            before += full[sheet]
+        if not parts:
+            continue
+        css = "".join(parts)
+        name = os.path.splitext(os.path.basename(page))[0] + ".css"
+        with open(os.path.join(output_dir, name), "w", encoding="utf-8") as f:
+            f.write(css)
+        print(f"{name:<44} {before:>8,} -> {len(css):>8,} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune unused selectors from the site stylesheets")
+    parser.add_argument("--pages", default="*.html", help="glob of pages to analyse")
+    parser.add_argument("--exclude", nargs="*", default=["*.bak.*"], help="basename globs to skip")
+    parser.add_argument("--stylesheets", nargs="+", default=list(STYLESHEETS))
+    parser.add_argument("--mode", choices=["per-page", "shared"], default="per-page",
+                        help="shared: leading rules common to all pages in <sheet>.shared.css, the rest per page")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--report", action="store_true", help="list unused selectors per stylesheet")
+    args = parser.parse_args()
+
+    pages = sorted(p for p in glob.glob(args.pages)
+                   if not any(fnmatch.fnmatch(os.path.basename(p), e) for e in args.exclude))
+    sheets = [os.path.normpath(s) for s in args.stylesheets if os.path.isfile(s)]
+    index = build_index(pages, sheets)
+    if args.report:
+        for sheet, entry in index["sheets"].items():
+            used = set()
+            for page in index["pages"].values():
+                used.update(page["used"].get(sheet, {}).get("selectors", []))
+            unused = sorted(set(entry["requirements"]) - used)
+            print(f"{sheet}: {len(unused)} of {len(entry['requirements'])} selector(s) unused")
+            for selector in unused:
+                print(f"    {selector}")
+    write_bundles(index, args.mode, args.output_dir)
@@ -0,0 +1,218 @@
+import argparse
+import difflib
+import fnmatch
+import glob
+import os
+import re
+import numpy as np
+
+MIN_BYTES = 512
+
+# Polynomial hash mod 2**64: uint64 arithmetic wraps for free, and an odd base
+# is invertible, so every substring hash comes from two prefix sums in O(1).
+BASE = 0x100000001B3
+BASE_INV = pow(BASE, -1, 1 << 64)
+
+TAG = re.compile(rb"<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*?(/?)>", re.S)
+RAW_TEXT = (b"script", b"style", b"textarea")
+ID_ATTRIBUTE = re.compile(rb"<[^>]*\sid\s*=")
+VOID = {b"area", b"base", b"br", b"col", b"embed", b"hr", b"img", b"input", b"link",
+        b"meta", b"param", b"source", b"track", b"wbr"}
+
+
+class Hasher:
+    """O(1) hash of any byte range of `data` after one vectorized prefix pass."""
+
+    def __init__(self, data):
+        codes = np.frombuffer(data, dtype=np.uint8).astype(np.uint64)
+        n = len(codes)
+        with np.errstate(over="ignore"):
+            powers = np.cumprod(np.full(n + 1, BASE, dtype=np.uint64)) * np.uint64(BASE_INV)
+            self.inverse = np.cumprod(np.full(n + 1, BASE_INV, dtype=np.uint64)) * np.uint64(BASE)
+            self.prefix = np.zeros(n + 1, dtype=np.uint64)
+            np.cumsum(codes * powers[:n], dtype=np.uint64, out=self.prefix[1:])
+
+    def __call__(self, start, end):
+        # sum(data[k] * BASE**(k - start)) for k in [start, end)
+        with np.errstate(over="ignore"):
+            return int((self.prefix[end] - self.prefix[start]) * self.inverse[start])
+
+
+def elements(data):
+    """Element spans as (start, end, parent, name); parents precede children."""
+    nodes, stack = [], []
+    pos = 0
+    while True:
+        m = TAG.search(data, pos)
+        if not m:
+            break
+        pos = m.end()
+        closing, name, self_closing = m.group(1), (m.group(2) or b"").lower(), m.group(3)
+        if not name:
+            continue
+        if closing:
+            # Pop to the matching open tag; stray end tags are ignored
+            for depth in range(len(stack) - 1, -1, -1):
+                if nodes[stack[depth]][3] == name:
+                    for index in stack[depth:]:
+                        nodes[index][1] = nodes[index][1] or m.end()
+                    del stack[depth:]
+                    break
+            continue
+        parent = stack[-1] if stack else -1
+        nodes.append([m.start(), 0, parent, name])
+        if self_closing or name in VOID:
+            nodes[-1][1] = m.end()
+        elif name in RAW_TEXT:
+            close = data.find(b"</" + name, pos)
+            close = len(data) if close < 0 else data.find(b">", close) + 1 or len(data)
+            nodes[-1][1] = pos = close
+        else:
+            stack.append(len(nodes) - 1)
+    for index in stack:
+        nodes[index][1] = len(data)
+    return [tuple(node) for node in nodes]
+
+
+def index_file(path, min_bytes=MIN_BYTES):
+    # (hash, length) -> [(path, start, end, parent, node)] for elements >= min_bytes
+    with open(path, "rb") as f:
+        data = f.read()
+    hasher = Hasher(data)
+    nodes = elements(data)
+    buckets = {}
+    for i, (start, end, parent, _) in enumerate(nodes):
+        if end - start >= min_bytes:
+            buckets.setdefault((hasher(start, end), end - start), []).append((path, start, end, parent, i))
+    return data, nodes, buckets
+
+
+def find_duplicates(paths, min_bytes=MIN_BYTES):
+    """Groups of identical element-aligned regions across `paths`.
+
+    Each group is a list of (path, start, end) byte ranges, at least two long.
+    Only maximal regions are reported: an element is dropped when its parent
+    is duplicated as well, and runs of consecutive duplicated siblings are
+    merged into one region.
+    """
+    files, merged = {}, {}
+    for path in paths:
+        data, nodes, buckets = index_file(path, min_bytes)
+        files[path] = (data, nodes)
+        for key, hits in buckets.items():
+            merged.setdefault(key, []).extend(hits)
+
+    # Confirm hash matches byte-for-byte (mod 2**64 hashing can collide)
+    groups = []
+    for hits in merged.values():
+        if len(hits) < 2:
+            continue
+        first = files[hits[0][0]][0][hits[0][1]:hits[0][2]]
+        same = [h for h in hits if files[h[0]][0][h[1]:h[2]] == first]
+        if len(same) > 1:
+            groups.append(same)
+
+    duplicated = {(h[0], h[4]) for group in groups for h in group}
+    maximal = [g for g in groups
+               if not all((h[0], h[3]) in duplicated for h in g)]
+
+    # Extend each group over following siblings that are identical too
+    result, absorbed = [], set()
+    for group in sorted(maximal, key=lambda g: (g[0][0], g[0][1])):
+        if (group[0][0], group[0][4]) in absorbed:
+            continue
+        spans = [[path, start, end, parent, node] for path, start, end, parent, node in group]
+        while True:
+            nxt = [_next_sibling(files[s[0]][1], s[4], s[3]) for s in spans]
+            if any(n is None for n in nxt):
+                break
+            texts = [files[s[0]][0][files[s[0]][1][n][0]:files[s[0]][1][n][1]] for s, n in zip(spans, nxt)]
+            if any(t != texts[0] for t in texts):
+                break
+            for s, n in zip(spans, nxt):
+                s[2], s[4] = files[s[0]][1][n][1], n
+                absorbed.add((s[0], n))
+        result.append([(path, start, end) for path, start, end, _, _ in spans])
+    return result
+
+
+def _next_sibling(nodes, index, parent):
+    end = nodes[index][1]
+    for j in range(index + 1, len(nodes)):
+        if nodes[j][0] >= end:
+            return j if nodes[j][2] == parent else None
+    return None
+
+
+def dedupe(path, groups, dry_run=False):
+    """Drop in-file repeats of duplicated regions, keeping the first.
+
+    Only regions carrying an id attribute are touched: ids must be unique,
+    so a repeated one is an accidental copy, while id-less repeats are
+    usually legitimate (cards, list items, table rows).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    cuts = []
+    for group in groups:
+        spans = sorted((s, e) for p, s, e in group if p == path)
+        if len(spans) < 2 or not ID_ATTRIBUTE.search(data[spans[0][0]:spans[0][1]]):
+            continue
+        for start, end in spans[1:]:
+            if not any(start < e and s < end for s, e in cuts):
+                # Take the newline and indentation in front of the block with it
+                line_start = data.rfind(b"\n", 0, start)
+                cuts.append((line_start if not data[line_start + 1:start].strip() else start, end))
+    new = data
+    for start, end in sorted(cuts, reverse=True):
+        new = new[:start] + new[end:]
+    if dry_run:
+        old_text, new_text = data.decode("utf-8", "replace"), new.decode("utf-8", "replace")
+        print("".join(difflib.unified_diff(old_text.splitlines(keepends=True),
+                                           new_text.splitlines(keepends=True),
+                                           fromfile=f"a/{path}", tofile=f"b/{path}")), end="")
+    elif cuts:
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(new)
+        os.replace(tmp, path)
+    return len(cuts), len(data) - len(new)
+
+
+def _line(path, offset, cache={}):
+    if path not in cache:
+        with open(path, "rb") as f:
+            cache[path] = f.read()
+    return cache[path].count(b"\n", 0, offset) + 1
+
+
+def report(groups, cross_only=False):
+    for group in sorted(groups, key=lambda g: -(g[0][2] - g[0][1])):
+        files = {p for p, _, _ in group}
+        if cross_only and len(files) < 2:
+            continue
+        label = "shared fragment" if len(files) > 1 else "duplicate"
+        print(f"{label}: {group[0][2] - group[0][1]:,} bytes x {len(group)}")
+        for path, start, end in group:
+            print(f"    {path}:{_line(path, start)} bytes {start}-{end}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find repeated element-aligned blocks in and across HTML files")
+    parser.add_argument("paths", nargs="*", default=["*.html"], help="files or globs")
+    parser.add_argument("--exclude", nargs="*", default=[], help="basename globs to skip (e.g. '*.bak.*')")
+    parser.add_argument("--min-bytes", type=int, default=MIN_BYTES)
+    parser.add_argument("--cross", action="store_true", help="only report blocks shared between files")
+    parser.add_argument("--dedupe", action="store_true", help="remove in-file repeats, keeping the first")
+    parser.add_argument("--dry-run", action="store_true", help="with --dedupe, print a diff instead")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.paths for p in glob.glob(pattern)
+                    if not any(fnmatch.fnmatch(os.path.basename(p), e) for e in args.exclude)})
+    groups = find_duplicates(paths, args.min_bytes)
+    report(groups, args.cross)
+    if args.dedupe:
+        for path in paths:
+            removed, saved = dedupe(path, groups, args.dry_run)
+            if removed:
+                print(f"{path}: {removed} repeat(s), {saved:,} bytes {'would be ' if args.dry_run else ''}removed")
@@ -0,0 +1,139 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+
+EXTENSIONS = (".html", ".htm", ".css", ".md", ".js")
+SKIP_DIRS = {"node_modules", ".git", "dist"}
+CACHE_FILE = ".encoding_cache.json"
+
+BOMS = [
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+]
+
+
+def classify(data):
+    """Detect the encoding of `data` (bytes already in memory).
+
+    BOMs decide immediately; otherwise the strict UTF-8 validator makes one
+    C-speed pass over the buffer, and only bytes that are not UTF-8 are
+    checked against cp932 (Shift_JIS with Windows extensions). latin-1
+    accepts anything, so it is the last resort and marks a guess.
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    if data.isascii():
+        return "ascii"
+    for encoding in ("utf-8", "cp932"):
+        try:
+            data.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def read_text(path):
+    # Read a file once and decode it with the detected encoding
+    with open(path, "rb") as f:
+        data = f.read()
+    encoding = classify(data)
+    return data.decode(encoding), encoding
+
+
+def write_utf8_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def needs_conversion(encoding, assume_latin1=False):
+    return encoding not in ("ascii", "utf-8") and (encoding != "latin-1" or assume_latin1)
+
+
+def _scan_job(args):
+    path, fix, assume_latin1 = args
+    with open(path, "rb") as f:
+        data = f.read()
+    encoding = classify(data)
+    converted = False
+    if fix and needs_conversion(encoding, assume_latin1):
+        write_utf8_atomic(path, data.decode(encoding))
+        encoding, converted = ("ascii" if data.isascii() else "utf-8"), True
+    return path, encoding, converted
+
+
+def walk(root, extensions=EXTENSIONS):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            if name.endswith(extensions):
+                yield os.path.join(dirpath, name)
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def scan(root=".", fix=False, assume_latin1=False, workers=None, use_cache=True):
+    """Classify every text file under root; returns {path: encoding}.
+
+    Results are cached by (mtime, size) in CACHE_FILE, so later runs only
+    read files that changed. With `fix`, non-UTF-8 files are rewritten as
+    UTF-8 (latin-1 guesses only with `assume_latin1`).
+    """
+    cache_path = os.path.join(root, CACHE_FILE)
+    cache = {}
+    if use_cache:
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    results, jobs = {}, []
+    for path in walk(root):
+        hit = cache.get(path)
+        if hit and hit[:2] == _stamp(path) and not (fix and needs_conversion(hit[2], assume_latin1)):
+            results[path] = hit[2]
+        else:
+            jobs.append((path, fix, assume_latin1))
+
+    converted = []
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, encoding, was_converted in pool.map(_scan_job, jobs, chunksize=32):
+                results[path] = encoding
+                cache[path] = _stamp(path) + [encoding]
+                if was_converted:
+                    converted.append(path)
+
+    if use_cache:
+        cache = {p: v for p, v in cache.items() if p in results}
+        write_utf8_atomic(cache_path, json.dumps(cache))
+    print(f"Scanned {len(results)} file(s), read {len(jobs)}, converted {len(converted)}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report or normalize text file encodings to UTF-8")
+    parser.add_argument("root", nargs="?", default=".")
+    parser.add_argument("--fix", action="store_true", help="rewrite non-UTF-8 files as UTF-8")
+    parser.add_argument("--assume-latin1", action="store_true",
+                        help="also convert files that only decode as latin-1")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    results = scan(args.root, args.fix, args.assume_latin1, args.workers, not args.no_cache)
+    counts = {}
+    for path, encoding in sorted(results.items()):
+        counts[encoding] = counts.get(encoding, 0) + 1
+        if encoding not in ("ascii", "utf-8"):
+            print(f"{encoding:<10} {path}")
+    print(", ".join(f"{enc}: {n}" for enc, n in sorted(counts.items())))
@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import inspect
+import os
+import time
+from PIL import Image, ImageFilter
+from asset_encoder import encode_best
+import intermediate
+from profiling import stage
+from render_cache import ENABLED as CACHE_ENABLED, RenderCache
+import resample
+
+SOURCE = "merki_logo_transparent.png"
+
+# Every brand asset derived from the transparent master.
+# size: longest side in px, sharpen: UnsharpMask (radius, percent, threshold),
+# square: pad onto a transparent square canvas.
+# Outputs are written with the smallest pixel-identical PNG encoding
+# (asset_encoder.encode_best) unless a spec pins "compress_level".
+BRAND_ASSETS = [
+    # create_final_hd
+    {"name": "merki_logo_2048px.png", "size": 2048, "sharpen": (1, 120, 3)},
+    {"name": "merki_logo_4096px.png", "size": 4096, "sharpen": (1, 150, 3)},
+    # create_smooth_hd: Lanczos only, no sharpening (avoids the white edge halo)
+    {"name": "merki_logo_2048px_smooth.png", "size": 2048},
+    # create_correct_hd_logo
+    {"name": "merki_social_logo_hd_correct.png", "size": 2048},
+    {"name": "merki_social_logo_1024.png", "size": 1024},
+    # finalize_logo
+    {"name": "merki_social_logo_ultra_hd_final.png", "size": 2048},
+    # create_hd_logo
+    {"name": "merki_social_logo_hd.png", "size": 1024, "square": True},
+]
+
+
+def _fit(size, target):
+    width, height = size
+    scale = target / max(width, height)
+    return int(width * scale), int(height * scale)
+
+
+def _pad_square(img, target):
+    square_img = Image.new('RGBA', (target, target), (0, 0, 0, 0))
+    x_offset = (target - img.width) // 2
+    y_offset = (target - img.height) // 2
+    square_img.paste(img, (x_offset, y_offset), img)
+    return square_img
+
+
+def build_pyramid(img, outputs):
+    # Resize once per distinct size and sharpen once per distinct (size, sharpen),
+    # all from the single decoded source. Returns {name: (image, seconds)}.
+    levels, sharpened, built = {}, {}, {}
+    for spec in outputs:
+        size, sharpen = spec["size"], spec.get("sharpen")
+        start = time.perf_counter()
+        if size not in levels:
+            dims = _fit(img.size, size)
+            with stage("resize", pixels=dims[0] * dims[1], size=size):
+                levels[size] = resample.resize(img, dims)
+        out = levels[size]
+        if sharpen:
+            if (size, sharpen) not in sharpened:
+                radius, percent, threshold = sharpen
+                with stage("unsharp", pixels=out.width * out.height, size=size):
+                    sharpened[(size, sharpen)] = out.filter(
+                        ImageFilter.UnsharpMask(radius=radius, percent=percent, threshold=threshold))
+            out = sharpened[(size, sharpen)]
+        if spec.get("square") and out.width != out.height:
+            out = _pad_square(out, size)
+        built[spec["name"]] = (out, time.perf_counter() - start)
+    return built
+
+
+def _encode(img, spec, output_dir):
+    path = os.path.join(output_dir, spec["name"])
+    start = time.perf_counter()
+    with stage("encode", pixels=img.width * img.height, output=spec["name"]):
+        if "compress_level" in spec:
+            img.save(path, "PNG", compress_level=spec["compress_level"])
+        else:
+            # Already on export()'s pool: one thread per asset, no nested pool
+            encode_best(img, path, workers=1)
+    return path, time.perf_counter() - start
+
+
+def export(source=SOURCE, outputs=BRAND_ASSETS, output_dir=".", workers=None):
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Outputs whose source and spec are unchanged come straight from the render cache
+    cache = RenderCache() if CACHE_ENABLED else None
+    keys, cached, pending = {}, [], []
+    for spec in outputs:
+        path = os.path.join(output_dir, spec["name"])
+        if cache:
+            sources = [source, __file__, inspect.getsourcefile(encode_best), inspect.getsourcefile(resample)]
+            keys[spec["name"]] = cache.key("export_logo", sources, dict(spec, resample=resample.QUALITY))
+            if cache.get(keys[spec["name"]], [path]):
+                cached.append(spec["name"])
+                continue
+        pending.append(spec)
+
+    built, encoded = {}, {}
+    if pending:
+        with stage("decode") as s:
+            img = intermediate.load_image(source)
+            s["pixels"] = img.width * img.height
+        decode_time = time.perf_counter() - start
+        print(f"Decoded {source} {img.size[0]}x{img.size[1]} in {decode_time * 1000:.0f} ms")
+
+        built = build_pyramid(img, pending)
+
+        # Pillow releases the GIL while zlib-encoding, so threads encode in parallel
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(spec, pool.submit(_encode, built[spec["name"]][0], spec, output_dir))
+                       for spec in pending]
+            for spec, future in futures:
+                encoded[spec["name"]] = future.result()
+                if cache:
+                    cache.put(keys[spec["name"]], [encoded[spec["name"]][0]])
+    if cache:
+        cache.save()
+
+    print(f"{'output':<40} {'size':>11} {'build ms':>9} {'encode ms':>10} {'bytes':>11}")
+    paths = []
+    for spec in outputs:
+        name = spec["name"]
+        if name in cached:
+            path = os.path.join(output_dir, name)
+            print(f"{name:<40} {'(cached)':>11} {'-':>9} {'-':>10} {os.path.getsize(path):>11,}")
+        else:
+            path, encode_time = encoded[name]
+            out, build_time = built[name]
+            dims = f"{out.width}x{out.height}"
+            print(f"{name:<40} {dims:>11} {build_time * 1000:>9.0f} "
+                  f"{encode_time * 1000:>10.0f} {os.path.getsize(path):>11,}")
+        paths.append(path)
+    decodes = 1 if pending else 0
+    print(f"Total: {len(paths)} output(s), {len(cached)} cached, {decodes} decode, "
+          f"{time.perf_counter() - start:.2f} s")
+    return paths
+
+
+def select(names):
+    # Subset of BRAND_ASSETS by output name, keeping the table order
+    known = {spec["name"] for spec in BRAND_ASSETS}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Not in BRAND_ASSETS: {', '.join(unknown)}")
+    return [spec for spec in BRAND_ASSETS if spec["name"] in names]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every brand logo size from one decode")
+    parser.add_argument("--source", default=SOURCE)
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="export only these outputs")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    export(args.source, select(args.only) if args.only else BRAND_ASSETS,
+           args.output_dir, args.workers)
@@ -1,31 +1,14 @@
-from PIL import Image, ImageOps
+from export_logo import export, select
 
 def create_high_res_logo():
-    # 元のロゴを読み込む
-    input_path = "merki_logo_transparent.png"
-    output_path = "merki_social_logo_ultra_hd_final.png"
-    
-    img = Image.open(input_path).convert("RGBA")
-    
     # 元のサイズ: 1024x1024
     # 超高解像度: 2048x2048
-    target_size = 2048
-    
     # LANCZOSフィルタを使用して最高画質でリサイズ
     # これによりデザインは一切変わらず、解像度だけが上がります
-    img_hd = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
-    
-    # 「白枠」の懸念を解消するため、アルファチャンネルを微調整
-    # 透明な部分に白いノイズが残らないようにします
-    r, g, b, a = img_hd.split()
-    
-    # 完全に透明なピクセルの色情報をクリア（黒にする）
-    # これにより背景の透過がより綺麗になります
-    img_hd = Image.merge("RGBA", (r, g, b, a))
-    
-    # 保存（圧縮レベルを0にして劣化を防ぐ）
-    img_hd.save(output_path, "PNG", compress_level=0)
-    print(f"Created: {output_path} (Size: {target_size}x{target_size})")
+    # 「白枠」の懸念は keying.py の --softness と --decontaminate で透過前に解消します
+    # （不透明な元画像では --softness で縁を半透明にしないと白が残ります）
+    output_path, = export(outputs=select(["merki_social_logo_ultra_hd_final.png"]))
+    print(f"Created: {output_path}")
 
 if __name__ == "__main__":
     create_high_res_logo()
@@ -1,30 +1,30 @@
 from PIL import Image
+import numpy as np
+from keying import key_white
+import intermediate
+from profiling import stage
 
-def make_transparent(input_path, output_path):
+def make_transparent(input_path, output_path, threshold=200, softness=0, decontaminate=False):
     try:
-        img = Image.open(input_path).convert("RGBA")
-        datas = img.getdata()
+        with stage("decode") as s:
+            img = Image.open(input_path).convert("RGBA")
+            data = np.array(img)
+            s["pixels"] = img.width * img.height
 
-        newData = []
         # Get the color of the top-left pixel to assume as background
-        bg_color = datas[0]
+        bg_color = tuple(int(v) for v in data[0, 0])
         
         print(f"Top-left pixel color (assumed background): {bg_color}")
         
-        # Simple threshold check
-        threshold = 200 # treating high values (near white) as background
+        # Simple threshold check: treating high values (near white) as background.
+        # The purple is around (102, 126, 234) which has B=234 but R=102,
+        # so checking if ALL channels are > 200 is safe to target white.
+        with stage("key", pixels=img.width * img.height):
+            key_white(data, threshold=threshold, softness=softness, decontaminate=decontaminate)
 
-        for item in datas:
-            # Check if the pixel is white-ish (R, G, B all > threshold)
-            # Adjust threshold as needed. The purple is around (102, 126, 234) which has B=234 but R=102.
-            # So checking if ALL channels are > 200 is safe to target white.
-            if item[0] > 200 and item[1] > 200 and item[2] > 200:
-                newData.append((255, 255, 255, 0))
-            else:
-                newData.append(item)
-
-        img.putdata(newData)
-        img.save(output_path, "PNG")
+        with stage("encode", pixels=img.width * img.height):
+            # Raw copy for the downstream stages, PNG for the site
+            intermediate.publish(data, output_path)
         print(f"Saved transparent image to {output_path}")
 
     except Exception as e:
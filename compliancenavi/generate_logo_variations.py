@@ -1,59 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
+import argparse
+import csv
+import inspect
+import json
+import os
+import time
 import numpy as np
+from keying import key_white
+import intermediate
+from profiling import stage
+from render_cache import cached_render
 
-def generate_variations(input_path):
+# Base color (Original Purple: #764ba2 -> 118, 75, 162)
+# Variations: Lighter purples
+VARIATIONS = [
+    {"name": "logo_light1.png", "color": [138, 95, 182]}, # Slightly lighter
+    {"name": "logo_light2.png", "color": [158, 115, 202]}, # Lighter
+    {"name": "logo_light3.png", "color": [178, 135, 222]}  # Very light
+]
+
+# Threshold for "white" when keying the source background
+WHITE_THRESHOLD = 240
+
+# Cropped alpha of the source, set once per worker process
+_alpha = None
+
+def generate_variations(input_path, variations=VARIATIONS, output_dir=".", mode="palette", workers=1):
     print(f"Processing {input_path}...")
     try:
-        img = Image.open(input_path).convert("RGBA")
-        data = np.array(img)
-
-        # Base color (Original Purple: #764ba2 -> 118, 75, 162)
-        # Variations: Lighter purples
-        variations = [
-            {"name": "logo_light1.png", "color": [138, 95, 182]}, # Slightly lighter
-            {"name": "logo_light2.png", "color": [158, 115, 202]}, # Lighter
-            {"name": "logo_light3.png", "color": [178, 135, 222]}  # Very light
-        ]
-        
-        # Identify non-transparent pixels (assuming the logo is the only content)
-        # Note: This logic recolors the WHOLE non-transparent area. 
-        # If "large round part" is specific, we might need more complex masking, 
-        # but for now I will recolor the whole logo as per previous logic.
-        r, g, b, a = data.T
-        
-        # 1. Make white/near-white transparent first (same as before)
-        white_areas = (r > 240) & (g > 240) & (b > 240)
-        data[..., 3][white_areas.T] = 0
-        
-        # 2. Get mask for non-transparent pixels
-        non_transparent = data[..., 3] > 0
-
-        for var in variations:
-            # Copy data for this variation
-            var_data = data.copy()
-            target_color = var["color"]
-            
-            # Apply color
-            var_data[..., 0][non_transparent] = target_color[0]
-            var_data[..., 1][non_transparent] = target_color[1]
-            var_data[..., 2][non_transparent] = target_color[2]
-            
-            # Create image
-            new_img = Image.fromarray(var_data)
-            
-            # Crop
-            bbox = new_img.getbbox()
-            if bbox:
-                new_img = new_img.crop(bbox)
-            
-            # Save
-            output_filename = var["name"]
-            new_img.save(output_filename)
-            print(f"Saved {output_filename}")
-
+        # Skip the render entirely when the source and palette are unchanged
+        cached_render(
+            "generate_logo_variations",
+            [input_path, __file__, inspect.getsourcefile(key_white)],
+            {"variations": variations, "white_threshold": WHITE_THRESHOLD, "mode": mode},
+            [os.path.join(output_dir, var["name"]) for var in variations],
+            lambda: render_variations(input_path, variations, output_dir, mode, workers),
+        )
     except Exception as e:
         print(f"Error processing image: {e}")
 
+def prepare_source(input_path, white_threshold=WHITE_THRESHOLD):
+    # Key and crop the source once; every variant shares the resulting alpha
+    with stage("decode") as s:
+        # key_white() edits in place, so take a private copy of a mapped intermediate
+        data = intermediate.load_array(input_path, writable=True)
+        s["pixels"] = data.shape[0] * data.shape[1]
+
+    # 1. Make white/near-white transparent first (same as before)
+    with stage("key", pixels=data.shape[0] * data.shape[1]):
+        key_white(data, threshold=white_threshold)
+
+    # 2. Crop to the non-transparent area. Recolouring never changes alpha,
+    # so this box is the same for every variant.
+    alpha = data[..., 3]
+    bbox = Image.fromarray(alpha, "L").getbbox()
+    if bbox:
+        alpha = alpha[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+    return np.ascontiguousarray(alpha)
+
+def variant_palette(color):
+    # Entry i is (color, alpha=i): looking up the alpha channel recolours
+    # the WHOLE non-transparent area while keeping the anti-aliased edges.
+    palette = np.empty((256, 4), dtype=np.uint8)
+    palette[:, :3] = color
+    palette[:, 3] = np.arange(256)
+    return palette
+
+def render_variant(alpha, name, color, output_dir=".", mode="palette"):
+    palette = variant_palette(color)
+    height, width = alpha.shape
+    if mode == "palette":
+        # Zero-copy view of the shared alpha as an indexed image + RGBA palette
+        new_img = Image.frombuffer("L", (width, height), alpha, "raw", "L", 0, 1)
+        new_img.putpalette(palette.tobytes(), "RGBA")
+    else:
+        new_img = Image.fromarray(palette[alpha], "RGBA")
+    output_path = os.path.join(output_dir, name)
+    with stage("encode", pixels=width * height, variant=name):
+        new_img.save(output_path)
+    return output_path
+
+def _init_worker(alpha):
+    global _alpha
+    _alpha = alpha
+
+def _render_job(args):
+    name, color, output_dir, mode = args
+    return render_variant(_alpha, name, color, output_dir, mode)
+
+def render_variations(input_path, variations, output_dir=".", mode="palette", workers=1):
+    start = time.perf_counter()
+    alpha = prepare_source(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = [(var["name"], var["color"], output_dir, mode) for var in variations]
+    if workers > 1 and len(jobs) > 1:
+        # The alpha is shipped to each worker once, not once per variant
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(alpha,)) as pool:
+            for output_filename in pool.map(_render_job, jobs, chunksize=16):
+                print(f"Saved {output_filename}")
+    else:
+        _init_worker(alpha)
+        for job in jobs:
+            print(f"Saved {_render_job(job)}")
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs)} variant(s) in {elapsed:.2f} s ({len(jobs) / elapsed:.1f} variants/s)")
+
+def parse_color(value):
+    # "#rrggbb", "r,g,b" or an [r, g, b] list
+    if isinstance(value, (list, tuple)):
+        return [int(v) for v in value]
+    value = value.strip()
+    if value.startswith("#"):
+        return [int(value[i:i + 2], 16) for i in (1, 3, 5)]
+    return [int(v) for v in value.split(",")]
+
+def load_spec(path):
+    # Variant list from JSON ([{"name": ..., "color": ...}]) or CSV (name,color)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+    return [{"name": row["name"], "color": parse_color(row["color"])} for row in rows]
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recolour the logo into many variants")
     # Assuming 'logo.png' is the source file in the same directory
-    generate_variations("logo.png")
+    parser.add_argument("input", nargs="?", default="logo.png")
+    parser.add_argument("--spec", help="CSV or JSON list of variants (name, color)")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--mode", choices=["palette", "rgba"], default="palette",
+                        help="palette: indexed PNG with RGBA palette, rgba: truecolour PNG")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    variations = load_spec(args.spec) if args.spec else VARIATIONS
+    generate_variations(args.input, variations, args.output_dir, args.mode, args.workers)
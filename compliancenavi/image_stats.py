@@ -0,0 +1,212 @@
+from PIL import Image
+import argparse
+import contextlib
+import json
+import numpy as np
+import intermediate
+import png_stream
+
+# Rows analysed per pass; temporaries stay a few MB even on 8192px sources
+STRIP_ROWS = 128
+CHANNELS = "RGB"
+
+
+def iter_strips(source, strip_rows=STRIP_ROWS):
+    """Yield (top, (rows, w, 4) uint8 RGBA) strips of a path, Image or array.
+
+    Images are converted to RGBA one strip at a time, arrays (including
+    numpy.memmap raw intermediates) are only sliced, and 8-bit PNG paths are
+    decoded strip by strip (png_stream.read_strips), so no full-size copy or
+    float temporary is ever made. Other paths (interlaced or 16-bit PNGs,
+    other formats) are decoded whole on first access.
+    """
+    if isinstance(source, str):
+        if png_stream.streamable(source):
+            for top, strip in png_stream.read_strips(source, strip_rows):
+                yield top, np.asarray(strip.convert("RGBA"))
+            return
+        source = Image.open(source)
+    if isinstance(source, np.ndarray):
+        for top in range(0, source.shape[0], strip_rows):
+            yield top, np.asarray(source[top:top + strip_rows])
+        return
+    width, height = source.size
+    for top in range(0, height, strip_rows):
+        strip = source.crop((0, top, width, min(top + strip_rows, height)))
+        yield top, np.asarray(strip.convert("RGBA"))
+
+
+class _Accumulator:
+    # Running sums for histograms, range, moments and the gradient fit
+
+    def __init__(self):
+        self.hist = np.zeros((3, 256), dtype=np.int64)
+        self.cross = np.zeros((3, 3))
+        # Normal equations of colour = a + b*x + c*y over fully opaque pixels
+        self.ata = np.zeros((3, 3))
+        self.aty = np.zeros((3, 3))
+        self.yty = np.zeros(3)
+        self.fit_n = 0
+
+    def add(self, top, strip, min_alpha):
+        # Everything reduces to integer histograms and dense row/column sums
+        # over the strip; masked pixels are zeroed or binned away, never gathered
+        rows, width = strip.shape[:2]
+        alpha = strip[..., 3]
+        visible = (alpha >= min_alpha).view(np.uint8)
+        opaque = (alpha == 255).view(np.uint8)
+
+        # One bincount for all channels: bin c*256 + value, or 768 when masked
+        index = strip[..., :3].astype(np.int32)
+        index += np.arange(0, 768, 256, dtype=np.int32)
+        index[visible == 0] = 768
+        self.hist += np.bincount(index.ravel(), minlength=769)[:768].reshape(3, 256)
+        # Channel cross products; float64 dots are exact at these magnitudes
+        masked = [(strip[..., c] * visible).ravel().astype(np.float64) for c in range(3)]
+        for i in range(3):
+            for j in range(i + 1, 3):
+                self.cross[i, j] += masked[i] @ masked[j]
+
+        row_counts = opaque.sum(axis=1, dtype=np.int64)
+        if not row_counts.any():
+            return
+        cols = opaque.sum(axis=0, dtype=np.int64).astype(np.float64)
+        row_counts = row_counts.astype(np.float64)
+        xs = np.arange(width) + 0.5
+        ys = np.arange(top, top + rows) + 0.5
+        xy = ys @ (opaque.astype(np.float32) @ xs.astype(np.float32)).astype(np.float64)
+        self.ata += [[row_counts.sum(), cols @ xs, row_counts @ ys],
+                     [cols @ xs, cols @ (xs * xs), xy],
+                     [row_counts @ ys, xy, row_counts @ (ys * ys)]]
+        for c in range(3):
+            v = strip[..., c] * opaque
+            self.aty[:, c] += [v.sum(dtype=np.int64), v.sum(axis=0, dtype=np.int64) @ xs,
+                               v.sum(axis=1, dtype=np.int64) @ ys]
+            self.yty[c] += np.bincount(v.ravel(), minlength=256) @ (np.arange(256.0) ** 2)
+        self.fit_n += int(row_counts.sum())
+
+    def moments(self):
+        # (count, min, max, mean, covariance) of visible pixels
+        levels = np.arange(256.0)
+        n = int(self.hist[0].sum())
+        nonzero = [np.flatnonzero(h) for h in self.hist]
+        lo = [int(nz[0]) for nz in nonzero]
+        hi = [int(nz[-1]) for nz in nonzero]
+        mean = self.hist @ levels / n
+        outer = self.cross + self.cross.T
+        outer[np.diag_indices(3)] = self.hist @ (levels ** 2)
+        return n, lo, hi, mean, outer / n - np.outer(mean, mean)
+
+
+def fit_gradient(acc, width, height):
+    """Linear gradient (CSS angle, start/end colours) from the accumulated fit.
+
+    The per-channel planes colour = a + b*x + c*y are solved by least squares;
+    the gradient axis is the dominant direction of the (b, c) slopes, and the
+    start/end colours are the planes evaluated where gradient.py's CSS-style
+    projection puts t = 0 and t = 1.
+    """
+    coef = np.linalg.lstsq(acc.ata, acc.aty, rcond=None)[0]   # rows: a, b, c
+    slopes = coef[1:]                                           # (2, 3): d/dx, d/dy
+    u, _, _ = np.linalg.svd(slopes)
+    dx, dy = u[:, 0]
+    # Point the axis from the lighter end to the darker one
+    if (slopes.T @ [dx, dy]).sum() > 0:
+        dx, dy = -dx, -dy
+    angle = float(np.rad2deg(np.arctan2(dx, -dy)) % 360)
+
+    corners = [0.0, width * dx, height * dy, width * dx + height * dy]
+    p_min, p_max = min(corners), max(corners)
+    cx, cy = width / 2, height / 2
+    centre = coef[0] + coef[1] * cx + coef[2] * cy
+    rate = slopes.T @ [dx, dy]
+    p_centre = cx * dx + cy * dy
+    start = centre + rate * (p_min - p_centre)
+    end = centre + rate * (p_max - p_centre)
+
+    sse = acc.yty - 2 * (coef * acc.aty).sum(axis=0) + (coef * (acc.ata @ coef)).sum(axis=0)
+    rms = np.sqrt(np.maximum(sse, 0) / max(acc.fit_n, 1))
+    return {
+        "angle": round(angle, 2),
+        "start": [int(round(v)) for v in np.clip(start, 0, 255)],
+        "end": [int(round(v)) for v in np.clip(end, 0, 255)],
+        "rms_error": [round(float(v), 3) for v in rms],
+        "pixels": acc.fit_n,
+    }
+
+
+def analyze(source, min_alpha=1, strip_rows=STRIP_ROWS, histograms=True):
+    """Per-channel statistics of visible pixels plus a fitted linear gradient."""
+    if isinstance(source, str):
+        # A fresh raw intermediate is mapped instead of decoding the PNG
+        mapped = intermediate.attach(source)
+        name, source = source, source if mapped is None else mapped
+    else:
+        name = None
+    if isinstance(source, np.ndarray):
+        height, width = source.shape[:2]
+    else:
+        with Image.open(source) if isinstance(source, str) else contextlib.nullcontext(source) as img:
+            width, height = img.size
+
+    acc = _Accumulator()
+    for top, strip in iter_strips(source, strip_rows):
+        acc.add(top, strip, min_alpha)
+    if not acc.hist[0].any():
+        raise ValueError(f"No pixels with alpha >= {min_alpha} in {name or 'image'}")
+
+    n, lo, hi, mean, cov = acc.moments()
+    report = {
+        "source": name,
+        "size": [width, height],
+        "visible_pixels": n,
+        "channels": {
+            ch: {"min": lo[c], "max": hi[c], "mean": round(float(mean[c]), 3),
+                 "std": round(float(np.sqrt(max(cov[c, c], 0))), 3)}
+            for c, ch in enumerate(CHANNELS)
+        },
+        "covariance": [[round(float(v), 3) for v in row] for row in cov],
+        "gradient": fit_gradient(acc, width, height) if acc.fit_n >= 3 else None,
+    }
+    if histograms:
+        for c, ch in enumerate(CHANNELS):
+            report["channels"][ch]["histogram"] = acc.hist[c].tolist()
+    return report
+
+
+def load_gradient(path):
+    # (start, end, angle) from a saved report, or fitted from an image
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+        gradient = (report[0] if isinstance(report, list) else report)["gradient"]
+    else:
+        gradient = analyze(path, histograms=False)["gradient"]
+    return tuple(gradient["start"]), tuple(gradient["end"]), gradient["angle"]
+
+
+def print_summary(report):
+    print(f"{report['source']}: {report['size'][0]}x{report['size'][1]}, "
+          f"{report['visible_pixels']:,} visible pixels")
+    for ch, stats in report["channels"].items():
+        print(f"  {ch}: {stats['min']:>3}-{stats['max']:<3} mean {stats['mean']:>7.2f} std {stats['std']:>6.2f}")
+    gradient = report["gradient"]
+    if gradient:
+        print(f"  gradient: {tuple(gradient['start'])} -> {tuple(gradient['end'])} at "
+              f"{gradient['angle']}deg (rms {gradient['rms_error']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming colour statistics and gradient fit for images")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--min-alpha", type=int, default=1, help="alpha at which a pixel counts as visible")
+    parser.add_argument("--strip-rows", type=int, default=STRIP_ROWS)
+    parser.add_argument("--json", help="write the reports (with histograms) here")
+    args = parser.parse_args()
+
+    reports = [analyze(path, args.min_alpha, args.strip_rows) for path in args.inputs]
+    for report in reports:
+        print_summary(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports[0] if len(reports) == 1 else reports, f, indent=1)
@@ -0,0 +1,165 @@
+from PIL import Image
+import argparse
+import os
+import struct
+import tempfile
+import numpy as np
+
+# Raw RGBA copies of intermediate images (merki_logo_transparent.png,
+# logo.png), next to the PNG deliverables. A stage that writes an
+# intermediate publish()es both; downstream stages load through here and
+# map the raw pixels instead of inflating the PNG again. Readers share the
+# page cache, so every process attached to one file uses the same memory.
+RAW_DIR = os.environ.get("MERKI_INTERMEDIATE_DIR", ".intermediates")
+# MERKI_INTERMEDIATE=0 makes load_*() always decode the PNG
+ENABLED = os.environ.get("MERKI_INTERMEDIATE", "1") != "0"
+
+# magic, version, channels, width, height, PNG mtime_ns, PNG size; pixels start at 64
+_HEADER = struct.Struct("<8sHHIIqq")
+_MAGIC = b"MERKIRAW"
+_VERSION = 1
+DATA_OFFSET = 64
+
+
+def raw_path(png_path):
+    directory, name = os.path.split(png_path)
+    return os.path.join(directory, RAW_DIR, os.path.splitext(name)[0] + ".rgba")
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 0, -1
+    return st.st_mtime_ns, st.st_size
+
+
+def read_header(path):
+    # (width, height, channels, png_stamp) of a raw file, or None if it is not one
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(head) < _HEADER.size:
+        return None
+    magic, version, channels, width, height, mtime_ns, size = _HEADER.unpack(head)
+    if magic != _MAGIC or version != _VERSION:
+        return None
+    return width, height, channels, (mtime_ns, size)
+
+
+def write_raw(path, pixels, png_stamp=(0, -1)):
+    """Write an (h, w, 4) uint8 array or RGBA image as a raw intermediate."""
+    if isinstance(pixels, Image.Image):
+        pixels = np.asarray(pixels.convert("RGBA"))
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width, channels = pixels.shape
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, channels, width, height, *png_stamp).ljust(DATA_OFFSET, b"\0"))
+        f.write(memoryview(pixels).cast("B"))
+    os.replace(tmp, path)
+    return path
+
+
+def _set_png_stamp(path, png_stamp):
+    # Rewrite just the stamp fields once the PNG deliverable exists
+    with open(path, "r+b") as f:
+        head = bytearray(f.read(_HEADER.size))
+        fields = list(_HEADER.unpack(head))
+        fields[5:7] = png_stamp
+        f.seek(0)
+        f.write(_HEADER.pack(*fields))
+
+
+def publish(pixels, png_path, save=None):
+    """Write an intermediate: raw RGBA for later stages, then the PNG deliverable.
+
+    `save(img, png_path)` encodes the PNG (default: Image.save as PNG).
+    The raw copy records the PNG's stamp, so replacing the PNG by any other
+    means makes readers fall back to decoding it.
+    """
+    path = write_raw(raw_path(png_path), pixels)
+    img = pixels if isinstance(pixels, Image.Image) else Image.fromarray(pixels, "RGBA")
+    if save:
+        save(img, png_path)
+    else:
+        img.save(png_path, "PNG")
+    _set_png_stamp(path, _stamp(png_path))
+    return path
+
+
+def attach(png_path):
+    """Read-only (h, w, 4) memmap of the raw copy of `png_path`, or None if stale.
+
+    The copy is used only while the PNG still has the stamp recorded when
+    both were published (or the PNG is gone).
+    """
+    path = raw_path(png_path)
+    header = read_header(path) if ENABLED else None
+    if header is None:
+        return None
+    width, height, channels, png_stamp = header
+    current = _stamp(png_path)
+    if current != (0, -1) and current != png_stamp:
+        return None
+    return np.memmap(path, dtype=np.uint8, mode="r", offset=DATA_OFFSET, shape=(height, width, channels))
+
+
+def load_array(png_path, writable=False):
+    """(h, w, 4) uint8 RGBA pixels: the mapped raw copy when fresh, else decoded.
+
+    Pass writable=True to get a private array that may be modified in place.
+    """
+    mapped = attach(png_path)
+    if mapped is None:
+        return np.array(Image.open(png_path).convert("RGBA"))
+    return np.array(mapped) if writable else mapped
+
+
+def load_image(png_path):
+    """RGBA Image of `png_path`, sharing the mapped raw pixels when fresh.
+
+    The zero-copy image is read-only; Pillow copies it on the first
+    in-place edit.
+    """
+    mapped = attach(png_path)
+    if mapped is None:
+        return Image.open(png_path).convert("RGBA")
+    height, width = mapped.shape[:2]
+    return Image.frombuffer("RGBA", (width, height), mapped, "raw", "RGBA", 0, 1)
+
+
+def clean(root="."):
+    # Remove raw copies whose PNG is gone or has changed since publishing
+    removed = 0
+    for name in sorted(os.listdir(os.path.join(root, RAW_DIR))) if os.path.isdir(os.path.join(root, RAW_DIR)) else []:
+        path = os.path.join(root, RAW_DIR, name)
+        png = os.path.join(root, os.path.splitext(name)[0] + ".png")
+        header = read_header(path)
+        if header is None or _stamp(png) != header[3]:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clean raw RGBA intermediates")
+    parser.add_argument("command", choices=["list", "clean"])
+    parser.add_argument("--root", default=".")
+    args = parser.parse_args()
+
+    if args.command == "clean":
+        print(f"Removed {clean(args.root)} stale raw intermediate(s)")
+    else:
+        directory = os.path.join(args.root, RAW_DIR)
+        for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            header = read_header(os.path.join(directory, name))
+            png = os.path.join(args.root, os.path.splitext(name)[0] + ".png")
+            if header is None:
+                print(f"{name:<40} (not a raw intermediate)")
+                continue
+            fresh = "fresh" if _stamp(png) == header[3] else "stale"
+            print(f"{name:<40} {header[0]}x{header[1]}x{header[2]}  {fresh}")
@@ -0,0 +1,99 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+from PIL import Image
+import numpy as np
+from profiling import image_pixels, stage
+
+# Rows keyed per NumPy pass; bounds the float temporaries of the soft ramp
+CHUNK_ROWS = 256
+
+
+def key_white(data, threshold=200, softness=0, decontaminate=False, chunk_rows=CHUNK_ROWS):
+    """Make near-white pixels of an (h, w, 4) uint8 RGBA array transparent, in place.
+
+    A pixel is keyed when all of R, G and B are above `threshold`. With
+    `softness` > 0 the alpha ramps down linearly from `threshold` to
+    `threshold + softness` instead of cutting off hard. `decontaminate`
+    removes the white mixed into every semi-transparent pixel of the result
+    (already translucent in the source or made so by the ramp) and clears
+    the colour of fully transparent ones, so no white frame shows after
+    resizing or compositing on dark backgrounds. An opaque source keyed
+    with softness=0 has no translucent edge to unmix: use a ramp for it.
+    """
+    for top in range(0, data.shape[0], chunk_rows):
+        block = data[top:top + chunk_rows]
+        whiteness = block[..., :3].min(axis=2)
+
+        if softness <= 0:
+            block[..., 3][whiteness > threshold] = 0
+        else:
+            keep = (threshold + softness - whiteness.astype(np.float32)) / softness
+            np.clip(keep, 0, 1, out=keep)
+            block[..., 3] = block[..., 3] * keep + 0.5
+
+        if decontaminate:
+            # Observed = a * colour + (1 - a) * white  ->  solve for colour,
+            # with a the pixel's resulting alpha
+            alpha = block[..., 3]
+            edge = (alpha > 0) & (alpha < 255)
+            a = alpha[edge][:, None] / np.float32(255)
+            rgb = (block[..., :3][edge] - (1 - a) * 255) / a
+            block[..., :3][edge] = np.clip(rgb + 0.5, 0, 255)
+            block[..., :3][alpha == 0] = 0
+    return data
+
+
+def key_image(img, **options):
+    with stage("convert", pixels=image_pixels(img)):
+        data = np.array(img.convert("RGBA"))
+    with stage("key", pixels=image_pixels(data)):
+        key_white(data, **options)
+    return Image.fromarray(data, "RGBA")
+
+
+def key_file(input_path, output_path, **options):
+    keyed = key_image(Image.open(input_path), **options)
+    with stage("encode", pixels=image_pixels(keyed)):
+        keyed.save(output_path, "PNG")
+    return str(output_path)
+
+
+def _key_file_job(args):
+    input_path, output_path, options = args
+    return key_file(input_path, output_path, **options)
+
+
+def key_directory(src_dir, dst_dir, pattern="*.png", workers=None, **options):
+    # Key every matching image in src_dir into dst_dir on a process pool
+    src_dir, dst_dir = Path(src_dir), Path(dst_dir)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [(path, dst_dir / path.name, options) for path in sorted(src_dir.glob(pattern))]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for output_path in pool.map(_key_file_job, jobs):
+            print(f"Keyed {output_path}")
+    return len(jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Key white backgrounds to transparency")
+    parser.add_argument("input", help="image file or directory")
+    parser.add_argument("output", help="output file or directory")
+    parser.add_argument("--threshold", type=int, default=200)
+    parser.add_argument("--softness", type=int, default=0,
+                        help="width of the soft alpha ramp above the threshold")
+    parser.add_argument("--decontaminate", action="store_true",
+                        help="remove white fringe from semi-transparent pixels "
+                             "(opaque sources need --softness to get a translucent edge)")
+    parser.add_argument("--pattern", default="*.png", help="file pattern in directory mode")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    options = dict(threshold=args.threshold, softness=args.softness,
+                   decontaminate=args.decontaminate)
+    if Path(args.input).is_dir():
+        count = key_directory(args.input, args.output, args.pattern, args.workers, **options)
+        print(f"Keyed {count} file(s) into {args.output}")
+    else:
+        key_file(args.input, args.output, **options)
+        print(f"Saved transparent image to {args.output}")
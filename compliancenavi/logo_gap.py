@@ -0,0 +1,255 @@
+from PIL import Image
+import argparse
+import glob
+import json
+import math
+import re
+import sys
+import time
+import numpy as np
+from keying import key_white
+import intermediate
+
+# Angles follow ImageDraw.pieslice and SVG screen space: degrees clockwise
+# from 3 o'clock (12 o'clock is 270).
+LOGO_PATTERNS = ["*logo*.png"]
+# Fractions of the radius at which the gap is measured
+GAP_RADII = (0.35, 0.6, 0.85)
+# Polar samples per output pixel along arcs and radii
+SAMPLES_PER_PX = 4
+ARC = re.compile(r"M\s*([\d.]+)[ ,]([\d.]+)\s*L\s*([\d.]+)[ ,]([\d.]+)\s*"
+                 r"A\s*([\d.]+)[ ,]([\d.]+)\s+[\d.]+\s+([01])[ ,]([01])\s+([\d.]+)[ ,]([\d.]+)")
+
+
+def load_alpha(path, key_threshold=200):
+    # Alpha as float32 in [0, 1]; images without alpha are white-keyed first
+    mapped = intermediate.attach(path)
+    if mapped is not None:
+        return mapped[..., 3].astype(np.float32) / 255
+    img = Image.open(path)
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        return np.asarray(img.convert("RGBA").getchannel("A"), dtype=np.float32) / 255
+    data = np.array(img.convert("RGBA"))
+    key_white(data, threshold=key_threshold, softness=40)
+    return data[..., 3].astype(np.float32) / 255
+
+
+def polar(alpha, cx, cy, thetas, radii):
+    """Bilinear samples of `alpha` on a (len(thetas), len(radii)) polar grid."""
+    t = np.deg2rad(np.asarray(thetas, dtype=np.float32))[:, None]
+    r = np.asarray(radii, dtype=np.float32)[None, :]
+    # Pixel centres sit at +0.5, so shift into index space
+    x = cx - 0.5 + r * np.cos(t)
+    y = cy - 0.5 + r * np.sin(t)
+    h, w = alpha.shape
+    np.clip(x, 0, w - 1.001, out=x)
+    np.clip(y, 0, h - 1.001, out=y)
+    x0, y0 = x.astype(np.int32), y.astype(np.int32)
+    fx, fy = x - x0, y - y0
+    top = alpha[y0, x0] * (1 - fx) + alpha[y0, x0 + 1] * fx
+    bottom = alpha[y0 + 1, x0] * (1 - fx) + alpha[y0 + 1, x0 + 1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def _crossing(profile, axis_values, level):
+    # Interpolated position of the last sample >= level (per row), NaN if none
+    above = profile >= level
+    idx = np.where(above.any(axis=1), profile.shape[1] - 1 - np.argmax(above[:, ::-1], axis=1), -1)
+    valid = (idx >= 0) & (idx < profile.shape[1] - 1)
+    i = np.clip(idx, 0, profile.shape[1] - 2)
+    rows = np.arange(profile.shape[0])
+    a, b = profile[rows, i], profile[rows, i + 1]
+    frac = np.where(a != b, (a - level) / np.where(a != b, a - b, 1), 0)
+    step = axis_values[1] - axis_values[0]
+    return np.where(valid, axis_values[i] + frac * step, np.nan)
+
+
+def fit_circle(alpha):
+    """Centre, radius and edge anti-aliasing width of the disc in `alpha`.
+
+    Starts from the bounding box, finds the 50% alpha crossing along 360
+    rays, fits a circle to those edge points (algebraic least squares, which
+    ignores rays through the gap) and measures the 10%-90% ramp width.
+    """
+    rows = np.flatnonzero(alpha.max(axis=1) >= 0.5)
+    cols = np.flatnonzero(alpha.max(axis=0) >= 0.5)
+    if len(rows) < 8 or len(cols) < 8:
+        return None
+    cx, cy = (cols[0] + cols[-1] + 1) / 2, (rows[0] + rows[-1] + 1) / 2
+    r0 = (cols[-1] - cols[0] + rows[-1] - rows[0] + 2) / 4
+
+    thetas = np.arange(0, 360, 1.0)
+    radii = np.arange(r0 * 0.9, r0 * 1.1, 1 / SAMPLES_PER_PX, dtype=np.float32)
+    profile = polar(alpha, cx, cy, thetas, radii)
+    edge = _crossing(profile, radii, 0.5)
+    if np.isfinite(edge).sum() < 32:
+        return None
+    # Rays through a gap or notch end early; keep those near the bulk radius
+    ok = np.isfinite(edge) & (np.abs(edge - np.nanmedian(edge)) < r0 * 0.05)
+    t = np.deg2rad(thetas[ok])
+    px, py = cx + edge[ok] * np.cos(t), cy + edge[ok] * np.sin(t)
+    # x^2 + y^2 = 2ax + 2by + c  (Kasa fit)
+    design = np.column_stack([2 * px, 2 * py, np.ones_like(px)])
+    (a, b, c), *_ = np.linalg.lstsq(design, px * px + py * py, rcond=None)
+    radius = math.sqrt(c + a * a + b * b)
+    residual = float(np.sqrt(np.mean((np.hypot(px - a, py - b) - radius) ** 2)))
+
+    ramp = (_crossing(profile, radii, 0.1) - _crossing(profile, radii, 0.9))[ok]
+    ramp = ramp[np.isfinite(ramp)]
+    return {"centre": [float(a), float(b)], "radius": radius, "fit_rms_px": residual,
+            "edge_aa_px": float(np.median(ramp)) if len(ramp) else None}
+
+
+def _runs(mask):
+    # (start, length) of circular runs of True in a 1-D mask
+    if mask.all():
+        return [(0, len(mask))]
+    shift = int(np.argmin(mask))            # start scanning at a False sample
+    rolled = np.roll(mask, -shift).astype(np.int8)
+    edges = np.diff(np.concatenate([[0], rolled, [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return [((s + shift) % len(mask), e - s) for s, e in zip(starts, ends)]
+
+
+def measure_gap(alpha, circle, radii_fractions=GAP_RADII):
+    """Start/end angle of the widest transparent wedge at several radii."""
+    cx, cy = circle["centre"]
+    radius = circle["radius"]
+    n = int(2 * math.pi * radius * max(radii_fractions) * SAMPLES_PER_PX)
+    thetas = np.arange(n) * (360 / n)
+    radii = np.array(radii_fractions) * radius
+    profile = polar(alpha, cx, cy, thetas, radii).T           # (radii, thetas)
+    step = 360 / n
+
+    rings = []
+    for fraction, r, ring in zip(radii_fractions, radii, profile):
+        runs = _runs(ring < 0.5)
+        if not runs:
+            return None
+        start, length = max(runs, key=lambda run: run[1])
+        end = (start + length) % n
+
+        def edge(i, j):
+            # Sub-sample 50% crossing between sample i and its neighbour j
+            a, b = ring[i], ring[j]
+            return (0.5 - a) / (b - a) if a != b else 0.5
+
+        start_deg = ((start - 1) + edge((start - 1) % n, start)) * step % 360
+        end_deg = ((end - 1) + edge((end - 1) % n, end)) * step % 360
+        width_deg = (end_deg - start_deg) % 360
+        # 10%-90% ramp on each side of the gap, in pixels along the arc
+        ramp = [np.count_nonzero((ring[idx] > 0.1) & (ring[idx] < 0.9)) * step
+                for idx in (np.arange(start - 40, start + 1) % n, np.arange(end - 1, end + 40) % n)]
+        rings.append({
+            "radius_fraction": fraction,
+            "start": round(start_deg, 3), "end": round(end_deg, 3), "width_deg": round(width_deg, 3),
+            "width_px": round(math.radians(width_deg) * r, 2),
+            "aa_px": round(math.radians(float(np.mean(ramp))) * r, 2),
+        })
+    return rings
+
+
+def svg_gap(svg_path):
+    # Gap of the first "M c L p0 A ... p1 Z" wedge path in an SVG, as angles
+    with open(svg_path, encoding="utf-8") as f:
+        text = f.read()
+    m = ARC.search(text)
+    if m is None:
+        return None
+    view_box = re.search(r'viewBox="[\d.-]+ [\d.-]+ ([\d.]+) ([\d.]+)"', text)
+    extent = min(map(float, view_box.groups())) if view_box else 100.0
+    cx, cy, x0, y0, rx, _, _, sweep, x1, y1 = map(float, m.groups())
+    a0 = math.degrees(math.atan2(y0 - cy, x0 - cx)) % 360
+    a1 = math.degrees(math.atan2(y1 - cy, x1 - cx)) % 360
+    # sweep=1 draws clockwise (increasing screen angle) from p0 to p1, so
+    # the uncovered wedge runs from p1 on to p0
+    start, end = (a1, a0) if sweep else (a0, a1)
+    return {"start": round(start, 3), "end": round(end, 3), "width_deg": round((end - start) % 360, 3),
+            "radius_fraction": round(2 * rx / extent, 4)}
+
+
+def _angle_delta(a, b):
+    return (a - b + 180) % 360 - 180
+
+
+def analyze(path, svg=None):
+    start = time.perf_counter()
+    alpha = load_alpha(path)
+    decoded = time.perf_counter()
+    circle = fit_circle(alpha)
+    gap = measure_gap(alpha, circle) if circle else None
+    report = {"file": path, "size": list(alpha.shape[::-1])}
+    if circle:
+        report.update(centre=[round(v, 2) for v in circle["centre"]], radius=round(circle["radius"], 2),
+                      radius_fraction=round(circle["radius"] * 2 / min(alpha.shape), 4),
+                      fit_rms_px=round(circle["fit_rms_px"], 3),
+                      edge_aa_px=circle["edge_aa_px"] and round(circle["edge_aa_px"], 2))
+    report["gap"] = gap
+    if gap and svg:
+        mid = gap[len(gap) // 2]
+        report["vs_svg"] = {"start": round(_angle_delta(mid["start"], svg["start"]), 3),
+                            "end": round(_angle_delta(mid["end"], svg["end"]), 3)}
+    report["decode_ms"] = round((decoded - start) * 1000, 1)
+    report["analyze_ms"] = round((time.perf_counter() - decoded) * 1000, 1)
+    return report
+
+
+def print_report(report):
+    if not report["gap"]:
+        print(f"{report['file']}: no disc with a gap found ({report['analyze_ms']} ms)")
+        return
+    edge_aa = f"{report['edge_aa_px']}px" if report["edge_aa_px"] is not None else "n/a"
+    print(f"{report['file']}: centre {tuple(report['centre'])} radius {report['radius']} "
+          f"(edge AA {edge_aa}, fit rms {report['fit_rms_px']}px) "
+          f"in {report['analyze_ms']} ms + {report['decode_ms']} ms decode")
+    for ring in report["gap"]:
+        print(f"    r={ring['radius_fraction']:.2f}: gap {ring['start']:8.3f} -> {ring['end']:8.3f} deg "
+              f"({ring['width_deg']:.3f} deg, {ring['width_px']}px wide, AA {ring['aa_px']}px)")
+    if "vs_svg" in report:
+        print(f"    vs SVG arc: start {report['vs_svg']['start']:+.3f} deg, end {report['vs_svg']['end']:+.3f} deg")
+
+
+def regressions(report, reference, tolerance):
+    # Gap angles (mid radius) and size that moved by more than `tolerance`
+    if not report["gap"] or not reference["gap"]:
+        return ["gap missing"] if reference["gap"] else []
+    mid, ref = report["gap"][len(report["gap"]) // 2], reference["gap"][len(reference["gap"]) // 2]
+    problems = [f"{key} {mid[key]} vs {ref[key]}" for key in ("start", "end")
+                if abs(_angle_delta(mid[key], ref[key])) > tolerance]
+    if abs(report["radius_fraction"] - reference["radius_fraction"]) > 0.005:
+        problems.append(f"radius_fraction {report['radius_fraction']} vs {reference['radius_fraction']}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the pie gap of logo rasters in polar coordinates")
+    parser.add_argument("inputs", nargs="*", default=LOGO_PATTERNS, help="files or globs")
+    parser.add_argument("--svg", default="logo.svg", help="SVG whose wedge arc is reported alongside")
+    parser.add_argument("--reference", help="image whose gap the inputs must match (regression check)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="degrees allowed by --reference")
+    parser.add_argument("--json", help="write all reports here")
+    args = parser.parse_args()
+
+    try:
+        svg = svg_gap(args.svg)
+    except OSError:
+        svg = None
+    if svg:
+        print(f"{args.svg}: gap {svg['start']} -> {svg['end']} deg ({svg['width_deg']} deg)")
+    paths = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+    reports = [analyze(path, svg) for path in paths]
+    for report in reports:
+        print_report(report)
+
+    failed = False
+    if args.reference:
+        reference = analyze(args.reference)
+        for report in reports:
+            problems = regressions(report, reference, args.tolerance)
+            if problems:
+                failed = True
+                print(f"REGRESSION {report['file']}: {'; '.join(problems)}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"svg": svg, "reports": reports}, f, indent=1)
+    sys.exit(1 if failed else 0)
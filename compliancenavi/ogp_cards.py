@@ -0,0 +1,333 @@
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+import argparse
+import fnmatch
+import glob
+import inspect
+import os
+import re
+import sys
+import time
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+from asset_encoder import encode_best
+from encoding_scan import read_text
+from gradient import gradient_array
+import intermediate
+from profiling import profiled, stage
+from render_cache import ENABLED as CACHE_ENABLED, RenderCache
+import resample
+
+# Layout mirrors ogp_builder.html: brand gradient over the dark background,
+# 50px dot grid, logo + wordmark, headline and subtext in white.
+CARD_SIZE = (1200, 630)
+COLOR_START = (102, 126, 234)   # --primary-gradient in style.css
+COLOR_END = (118, 75, 162)
+DARK_BG = (15, 23, 42)
+GRADIENT_OPACITY = 0.95
+DOT_SPACING, DOT_ALPHA = 50, 0.08
+LOGO = "merki_logo_transparent.png"
+LOGO_HEIGHT = 85
+MARGIN = 90
+HEADLINE_SIZES = (64, 56, 48)
+SUBTEXT_SIZE = 30
+DEFAULT_HEADLINE = "期限管理は任せていい。"
+OUTPUT_DIR = "ogp"
+PALETTE_COLORS = 256
+
+# First existing font wins; pass --font/--bold-font for anything else
+FONT_CANDIDATES = [
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-{weight}.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-{weight}.ttc",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W{w}.ttc",
+    "C:/Windows/Fonts/YuGoth{yu}.ttc",
+    "C:/Windows/Fonts/meiryo.ttc",
+]
+
+
+def find_font(bold):
+    for pattern in FONT_CANDIDATES:
+        path = pattern.format(weight="Bold" if bold else "Regular", w=8 if bold else 4,
+                              yu="B" if bold else "M")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class _Meta(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta, self.title, self._in_title = {}, "", False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta" and attrs.get("content"):
+            key = attrs.get("property") or attrs.get("name")
+            if key:
+                self.meta.setdefault(key.lower(), attrs["content"].strip())
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+
+def page_card(path):
+    """Headline and subtext for a page from its og:/meta tags and <title>."""
+    parser = _Meta()
+    parser.feed(read_text(path)[0])
+    title = parser.meta.get("og:title") or parser.title.strip()
+    # "会社概要 | MERKI（メルキ）" -> "会社概要"; a bare brand name gets the tagline
+    headline = re.split(r"\s+[|\-–]\s+(?=MERKI|X Draft)", title)[0].strip()
+    if headline in ("", "MERKI", "X Draft"):
+        headline = DEFAULT_HEADLINE
+    headline = re.sub(r"^MERKI\s+[-–]\s+", "", headline)
+    subtext = parser.meta.get("og:description") or parser.meta.get("description") or ""
+    return {"headline": headline, "subtext": subtext}
+
+
+class GlyphCache:
+    """Rendered glyph masks per (font, size); text is drawn by pasting them."""
+
+    def __init__(self, font_path, size):
+        if font_path:
+            self.font = ImageFont.truetype(font_path, size)
+        else:
+            self.font = ImageFont.load_default(size)
+        self.glyphs = {}
+        ascent, descent = self.font.getmetrics()
+        self.line_height = ascent + descent
+
+    def glyph(self, ch):
+        if ch not in self.glyphs:
+            left, top, right, bottom = self.font.getbbox(ch, anchor="ls")
+            mask = None
+            if right > left and bottom > top:
+                mask = Image.new("L", (right - left, bottom - top), 0)
+                ImageDraw.Draw(mask).text((-left, -top), ch, font=self.font, fill=255, anchor="ls")
+            self.glyphs[ch] = (mask, left, top, self.font.getlength(ch))
+        return self.glyphs[ch]
+
+    def width(self, text):
+        return sum(self.glyph(ch)[3] for ch in text)
+
+    def draw(self, img, xy, text, fill):
+        # xy is the left end of the baseline
+        x, y = xy
+        for ch in text:
+            mask, left, top, advance = self.glyph(ch)
+            if mask is not None:
+                img.paste(fill, (round(x + left), round(y + top)), mask)
+            x += advance
+
+    def wrap(self, text, max_width, max_lines):
+        # Break anywhere in CJK text and at spaces in Latin; ellipsize the last line
+        tokens = re.findall(r"[A-Za-z0-9¥$%.,/'’&+-]+\s*|\s+|.", text)
+        lines, line = [], ""
+        for token in tokens:
+            if line and self.width(line + token.rstrip()) > max_width:
+                lines.append(line.rstrip())
+                line = token.lstrip()
+            else:
+                line += token
+        lines.append(line.rstrip())
+        if len(lines) > max_lines:
+            lines = lines[:max_lines]
+            while lines[-1] and self.width(lines[-1] + "…") > max_width:
+                lines[-1] = lines[-1][:-1]
+            lines[-1] += "…"
+        return lines
+
+
+_layers = {}
+
+
+def _fonts(font, bold_font):
+    return (font or find_font(False)), (bold_font or find_font(True) or font or find_font(False))
+
+
+# Unassigned code point: every font draws it with its .notdef box
+_NOTDEF = "\U0010ffff"
+
+
+def missing_glyphs(font_path, text, size=SUBTEXT_SIZE):
+    # Characters of `text` that the font would draw as .notdef boxes (tofu)
+    cache = glyphs(font_path, size)
+
+    def shape(ch):
+        mask, left, top, advance = cache.glyph(ch)
+        return mask.tobytes() if mask else None, left, top, advance
+
+    notdef = shape(_NOTDEF)
+    return sorted({ch for ch in text if not ch.isspace() and shape(ch) == notdef})
+
+
+def glyphs(font_path, size):
+    key = ("glyphs", font_path, size)
+    if key not in _layers:
+        _layers[key] = GlyphCache(font_path, size)
+    return _layers[key]
+
+
+def base_layer(bold_font, logo=LOGO):
+    """Background, dot grid, logo and wordmark: rendered once per process."""
+    key = ("base", bold_font, logo)
+    if key in _layers:
+        return _layers[key]
+    width, height = CARD_SIZE
+    gradient = gradient_array(CARD_SIZE, COLOR_START, COLOR_END, angle=135)[..., :3].astype(np.float32)
+    rgb = gradient * GRADIENT_OPACITY + np.array(DARK_BG, dtype=np.float32) * (1 - GRADIENT_OPACITY)
+    # radial-gradient(circle, rgba(255,255,255,.08) 1px, transparent 1px), 50px tiles
+    ys, xs = np.mgrid[0:height, 0:width]
+    dots = (np.hypot((xs + 0.5) % DOT_SPACING - 25, (ys + 10.5) % DOT_SPACING - 25) <= 1)[..., None]
+    rgb = np.where(dots, rgb + (255 - rgb) * DOT_ALPHA, rgb)
+    card = Image.fromarray((rgb + 0.5).astype(np.uint8), "RGB")
+
+    mark = intermediate.load_image(logo)
+    mark = mark.crop(mark.getchannel("A").getbbox())
+    mark = resample.resize(mark, (round(mark.width * LOGO_HEIGHT / mark.height), LOGO_HEIGHT))
+    top = 90
+    card.paste(mark, (MARGIN, top), mark)
+    wordmark = glyphs(bold_font, 64)
+    baseline = top + LOGO_HEIGHT // 2 + round(wordmark.font.getmetrics()[0] * 0.36)
+    wordmark.draw(card, (MARGIN + mark.width + 12, baseline), "MERKI", (255, 255, 255))
+    _layers[key] = card
+    return card
+
+
+@profiled("render_card")
+def render_card(card, output_path, font=None, bold_font=None, logo=LOGO, lossless=False):
+    font, bold_font = _fonts(font, bold_font)
+    img = base_layer(bold_font, logo).copy()
+    max_width = CARD_SIZE[0] - 2 * MARGIN
+
+    # Largest headline size that fits in two lines
+    for size in HEADLINE_SIZES:
+        headline = glyphs(bold_font, size)
+        lines = headline.wrap(card["headline"], max_width, 2)
+        if not lines[-1].endswith("…"):
+            break
+    y = 270 + headline.font.getmetrics()[0]
+    for line in lines:
+        headline.draw(img, (MARGIN, y), line, (255, 255, 255))
+        y += round(headline.line_height * 1.1)
+
+    if card["subtext"]:
+        subtext = glyphs(font, SUBTEXT_SIZE)
+        y += 20
+        for line in subtext.wrap(card["subtext"], max_width, 3):
+            subtext.draw(img, (MARGIN, y), line, (243, 243, 250))
+            y += round(subtext.line_height * 1.4)
+
+    if lossless:
+        with stage("encode", pixels=CARD_SIZE[0] * CARD_SIZE[1]):
+            report = encode_best(img, output_path)
+        return report["asset"], report["bytes"]
+    # The card is a narrow gradient plus white text: a 256-colour median-cut
+    # palette is visually exact and encodes ~10x faster than truecolor level 9
+    with stage("quantize", pixels=CARD_SIZE[0] * CARD_SIZE[1]):
+        indexed = img.quantize(PALETTE_COLORS, method=Image.Quantize.MEDIANCUT)
+    with stage("encode", pixels=CARD_SIZE[0] * CARD_SIZE[1]):
+        indexed.save(output_path, optimize=True)
+    return output_path, os.path.getsize(output_path)
+
+
+def _render_job(args):
+    name, card, output_path, font, bold_font, logo, lossless = args
+    start = time.perf_counter()
+    path, size = render_card(card, output_path, font, bold_font, logo, lossless)
+    return name, path, size, time.perf_counter() - start
+
+
+def build(pages, output_dir=OUTPUT_DIR, font=None, bold_font=None, logo=LOGO, workers=None,
+          lossless=False):
+    """Render ogp/<page>.png for every page whose card inputs changed.
+
+    Raises RuntimeError before rendering anything if the fonts lack glyphs
+    for the card text, so no tofu cards get cached or linked.
+    """
+    start = time.perf_counter()
+    font, bold_font = _fonts(font, bold_font)
+    cards = {page: page_card(page) for page in pages}
+    for path, text in ((bold_font, "MERKI…" + "".join(c["headline"] for c in cards.values())),
+                       (font, "…" + "".join(c["subtext"] for c in cards.values()))):
+        missing = missing_glyphs(path, text)
+        if missing:
+            raise RuntimeError(f"{path or 'Pillow default font'} has no glyphs for {''.join(missing[:20])!r}; "
+                               f"pass a CJK font with --font/--bold-font")
+    os.makedirs(output_dir, exist_ok=True)
+
+    cache = RenderCache() if CACHE_ENABLED else None
+    inputs = [__file__, logo, inspect.getsourcefile(encode_best),
+              inspect.getsourcefile(gradient_array), inspect.getsourcefile(resample)] + sorted({f for f in (font, bold_font) if f})
+    keys, jobs, cached = {}, [], []
+    for page in pages:
+        name = os.path.splitext(os.path.basename(page))[0]
+        card = cards[page]
+        output_path = os.path.join(output_dir, name + ".png")
+        if cache:
+            params = dict(card, name=name, size=CARD_SIZE, lossless=lossless, resample=resample.QUALITY)
+            keys[name] = cache.key("ogp_cards", inputs, params)
+            if cache.get(keys[name], [output_path]):
+                cached.append(name)
+                continue
+        jobs.append((name, card, output_path, font, bold_font, logo, lossless))
+
+    # Each worker renders the base layer once and reuses it for all its cards
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, path, size, seconds in pool.map(_render_job, jobs):
+            print(f"{os.path.basename(path):<36} {size:>9,} bytes {seconds * 1000:>7.0f} ms")
+            if cache:
+                cache.put(keys[name], [path])
+    if cache:
+        cache.save()
+    print(f"{len(pages)} card(s): {len(jobs)} rendered, {len(cached)} unchanged, "
+          f"{time.perf_counter() - start:.2f} s")
+
+
+def rewrite_og_image(page, output_dir=OUTPUT_DIR):
+    # Point an existing og:image at the page's own card, keeping its origin
+    text, encoding = read_text(page)
+    name = os.path.splitext(os.path.basename(page))[0]
+
+    def repl(m):
+        origin = re.match(r"https?://[^/]+/", m.group(2))
+        url = (origin.group(0) if origin else "") + f"{output_dir}/{name}.png"
+        return m.group(1) + url + m.group(3)
+
+    new = re.sub(r'(<meta[^>]*property="og:image"[^>]*content=")([^"]*)(")', repl, text)
+    if new != text:
+        with open(page, "w", encoding="utf-8" if encoding == "ascii" else encoding, newline="") as f:
+            f.write(new)
+        print(f"  og:image -> {output_dir}/{name}.png in {page}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render page-specific 1200x630 OGP cards")
+    parser.add_argument("--pages", default="*.html", help="glob of pages")
+    parser.add_argument("--exclude", nargs="*", default=["*.bak.*", "ogp_builder.html"],
+                        help="basename globs to skip")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--font", help="regular weight font (must cover Japanese)")
+    parser.add_argument("--bold-font", help="bold weight font")
+    parser.add_argument("--logo", default=LOGO)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--lossless", action="store_true",
+                        help="truecolor PNG via encode_best instead of a 256-colour palette")
+    parser.add_argument("--rewrite", action="store_true", help="point pages' og:image at their card")
+    args = parser.parse_args()
+
+    pages = sorted(p for p in glob.glob(args.pages)
+                   if not any(fnmatch.fnmatch(os.path.basename(p), e) for e in args.exclude))
+    try:
+        build(pages, args.output_dir, args.font, args.bold_font, args.logo, args.workers, args.lossless)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    if args.rewrite:
+        for page in pages:
+            rewrite_og_image(page, args.output_dir)
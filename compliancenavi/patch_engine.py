@@ -0,0 +1,202 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import difflib
+import fnmatch
+import json
+import os
+from encoding_scan import read_text
+
+EXTENSIONS = (".html", ".htm", ".css", ".js", ".md")
+SKIP_DIRS = {"node_modules", ".git", "dist"}
+
+
+class PatternMatcher:
+    """Aho-Corasick automaton: finds every occurrence of every pattern in one pass."""
+
+    def __init__(self, patterns):
+        self.patterns = list(dict.fromkeys(patterns))
+        self.goto, self.fail, self.out = [{}], [0], [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.out[state].append(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.out[child] += self.out[self.fail[child]]
+
+    def find_all(self, text):
+        # {pattern: [start offsets]} for every (possibly overlapping) match
+        hits = {pattern: [] for pattern in self.patterns}
+        goto, fail, out, patterns = self.goto, self.fail, self.out, self.patterns
+        root = goto[0]
+        state = 0
+        for i, ch in enumerate(text):
+            if state == 0 and ch not in root:
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in out[state]:
+                pattern = patterns[index]
+                hits[pattern].append(i - len(pattern) + 1)
+        return hits
+
+
+def load_rules(path):
+    """Rules file: JSON list of objects with
+    name, files (globs, `*` spans directories; default every file),
+    marker (string or list of alternatives), occurrence (0-based index among
+    marker matches, negative counts from the end), back_to (region starts at
+    the last occurrence of this string before the marker, or "line" for the
+    marker's line start; default the marker itself), until (region ends where
+    this anchor next appears, anchor kept; default end of file) and
+    content / content_file (path relative to the rules file).
+    """
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for rule in rules:
+        if isinstance(rule["marker"], str):
+            rule["marker"] = [rule["marker"]]
+        if "content_file" in rule:
+            content, _ = read_text(os.path.join(base, rule.pop("content_file")))
+            rule["content"] = content
+        rule.setdefault("files", ["*"])
+        rule.setdefault("occurrence", 0)
+    return rules
+
+
+def _patterns(rules):
+    out = []
+    for rule in rules:
+        out += rule["marker"]
+        if rule.get("back_to") not in (None, "line"):
+            out.append(rule["back_to"])
+        if rule.get("until"):
+            out.append(rule["until"])
+    return out
+
+
+def resolve(rule, hits, text):
+    # Region (start, end) a rule replaces in text, or a reason it does not apply
+    markers = sorted((pos, m) for m in rule["marker"] for pos in hits[m])
+    try:
+        marker_pos, marker = markers[rule["occurrence"]]
+    except IndexError:
+        return None, "marker not found"
+
+    start = marker_pos
+    back_to = rule.get("back_to")
+    if back_to == "line":
+        start = text.rfind("\n", 0, marker_pos) + 1
+    elif back_to:
+        before = [pos for pos in hits[back_to] if pos < marker_pos]
+        if not before:
+            return None, f"{back_to!r} not found before marker"
+        start = before[-1]
+
+    end = len(text)
+    if rule.get("until"):
+        after = [pos for pos in hits[rule["until"]] if pos >= marker_pos + len(marker)]
+        if not after:
+            return None, f"{rule['until']!r} not found after marker"
+        end = after[0]
+    return (start, end), None
+
+
+def patch_text(text, rules):
+    # Apply every rule to text from one multi-pattern scan. Returns (text, log).
+    if not rules:
+        return text, []
+    hits = PatternMatcher(_patterns(rules)).find_all(text)
+    regions, log = [], []
+    for rule in rules:
+        region, reason = resolve(rule, hits, text)
+        if region is None:
+            log.append(f"{rule['name']}: skipped ({reason})")
+        elif any(region[0] < end and start < region[1] for start, end, _ in regions):
+            log.append(f"{rule['name']}: skipped (overlaps another rule)")
+        else:
+            regions.append((region[0], region[1], rule))
+            log.append(f"{rule['name']}: applied at {region[0]}-{region[1]}")
+
+    # Splice back to front so earlier offsets stay valid
+    for start, end, rule in sorted(regions, key=lambda r: r[0], reverse=True):
+        text = text[:start] + rule["content"] + text[end:]
+    return text, log
+
+
+def _rules_for(rel_path, rules):
+    return [r for r in rules if any(fnmatch.fnmatch(rel_path, g) for g in r["files"])]
+
+
+def _patch_job(args):
+    path, rel_path, rules, dry_run = args
+    text, encoding = read_text(path)
+    new_text, log = patch_text(text, _rules_for(rel_path, rules))
+    diff = ""
+    if new_text != text:
+        if dry_run:
+            diff = "".join(difflib.unified_diff(
+                text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                fromfile=f"a/{rel_path}", tofile=f"b/{rel_path}"))
+        else:
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8" if encoding == "ascii" else encoding,
+                      newline="") as f:
+                f.write(new_text)
+            os.replace(tmp, path)
+    return rel_path, new_text != text, log, diff
+
+
+def walk(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if name.endswith(EXTENSIONS):
+                path = os.path.join(dirpath, name)
+                yield path, os.path.relpath(path, root).replace("\\", "/")
+
+
+def apply_rules(rules, root=".", dry_run=False, workers=None, only=None):
+    """Apply rules to every matching file under root in one pass per file."""
+    if only:
+        rules = [r for r in rules if r["name"] in only]
+    jobs = [(path, rel, rules, dry_run) for path, rel in walk(root) if _rules_for(rel, rules)]
+    changed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rel_path, was_changed, log, diff in pool.map(_patch_job, jobs, chunksize=8):
+            for line in log:
+                print(f"{rel_path}: {line}")
+            if diff:
+                print(diff, end="")
+            changed += was_changed
+    verb = "would change" if dry_run else "changed"
+    print(f"{len(jobs)} file(s) matched, {changed} {verb}")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply declarative marker/anchor patches to site files")
+    parser.add_argument("rules", help="JSON rules file")
+    parser.add_argument("--root", default=".")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="apply only these rules")
+    parser.add_argument("--dry-run", action="store_true", help="print a unified diff instead of writing")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    apply_rules(load_rules(args.rules), args.root, args.dry_run, args.workers, args.only)
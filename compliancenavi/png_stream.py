@@ -0,0 +1,442 @@
+from PIL import Image, ImageFilter
+import argparse
+import io
+import math
+import os
+import resource
+import struct
+import time
+import zlib
+import numpy as np
+from profiling import stage
+from render_cache import cached_render
+
+# PNG output one strip of rows at a time: each strip is filtered (per-row
+# adaptive choice, like libpng) and fed to one incremental zlib stream, and
+# IDAT chunks are written as the compressed bytes arrive. Memory is a few
+# strips whatever the image size, so print masters never exist whole.
+
+SOURCE = "merki_logo_transparent.png"
+
+# Print masters resampled from the transparent master, sharpened like the
+# 4096px export (export_logo.BRAND_ASSETS)
+PRINT_MASTERS = [
+    {"name": "merki_logo_8192px.png", "size": 8192, "sharpen": (1, 150, 3)},
+    {"name": "merki_logo_16384px.png", "size": 16384, "sharpen": (1, 150, 3)},
+]
+
+# Raw bytes per strip; rows per strip follow from the width
+STRIP_BYTES = 8 * 1024 * 1024
+# Compressed bytes buffered before an IDAT chunk is written
+IDAT_BYTES = 256 * 1024
+# zlib settings: RLE is the cheapest of asset_encoder.PNG_CANDIDATES and
+# wins on the flat areas of the logo
+COMPRESS_LEVEL = 6
+COMPRESS_TYPE = zlib.Z_RLE
+
+_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_COLOR_TYPES = {"L": (0, 1), "RGB": (2, 3), "LA": (4, 2), "RGBA": (6, 4)}
+FILTERS = ("none", "sub", "up", "average", "paeth", "adaptive")
+
+
+def strip_rows(width, channels=4, strip_bytes=STRIP_BYTES):
+    return max(1, strip_bytes // (width * channels))
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)))
+
+
+def filter_rows(rows, prev, bpp, method="adaptive"):
+    """PNG-filter a (n, stride) uint8 block; `prev` is the row above it.
+
+    Returns (n, 1 + stride) uint8 with the filter type byte first. The
+    adaptive method picks, per row, the filter with the smallest sum of
+    absolute signed residuals (the libpng heuristic). All filters are taken
+    against the raw previous row, so they vectorize over the whole block.
+    """
+    n, stride = rows.shape
+    up = np.empty_like(rows)
+    up[0], up[1:] = prev, rows[:-1]
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    up_left = np.zeros_like(rows)
+    up_left[:, bpp:] = up[:, :-bpp]
+
+    def residual(kind):
+        if kind == "none":
+            return rows
+        if kind == "sub":
+            return rows - left
+        if kind == "up":
+            return rows - up
+        if kind == "average":
+            return rows - ((left.astype(np.uint16) + up) >> 1).astype(np.uint8)
+        # Paeth: pa = |b - c|, pb = |a - c|, pc = |(b - c) + (a - c)|
+        p = up.astype(np.int16) - up_left
+        q = left.astype(np.int16) - up_left
+        pc = np.abs(p + q)
+        pa, pb = np.abs(p), np.abs(q)
+        predictor = np.where(pb <= pc, up, up_left)
+        np.copyto(predictor, left, where=(pa <= pb) & (pa <= pc))
+        return rows - predictor
+
+    out = np.empty((n, stride + 1), dtype=np.uint8)
+    if method != "adaptive":
+        out[:, 0] = FILTERS.index(method)
+        out[:, 1:] = residual(method)
+        return out
+    best = None
+    for code, kind in enumerate(FILTERS[:5]):
+        res = residual(kind)
+        # |signed residual| as bytes: abs(-128) wraps to 128 when viewed unsigned
+        score = np.abs(res.view(np.int8)).view(np.uint8).sum(axis=1, dtype=np.int64)
+        if best is None:
+            best, out[:, 0], out[:, 1:] = score, code, res
+            continue
+        better = score < best
+        if better.any():
+            best = np.where(better, score, best)
+            out[better, 0] = code
+            out[better, 1:] = res[better]
+    return out
+
+
+class PNGWriter:
+    """Incremental PNG encoder: write() strips of rows, top to bottom.
+
+    The file appears at `path` only after close() (written to a .tmp and
+    renamed), so readers never see a partial PNG.
+    """
+
+    def __init__(self, path, size, mode="RGBA", compress_level=COMPRESS_LEVEL, compress_type=COMPRESS_TYPE,
+                 filter="adaptive", dpi=None, idat_bytes=IDAT_BYTES):
+        if mode not in _COLOR_TYPES:
+            raise ValueError(f"Unsupported mode {mode!r} (supported: {', '.join(_COLOR_TYPES)})")
+        self.path, self.size, self.mode, self.filter = path, size, mode, filter
+        self.color_type, self.channels = _COLOR_TYPES[mode]
+        self.idat_bytes = idat_bytes
+        self.rows = 0
+        self.bytes = 0
+        self.filter_seconds = self.deflate_seconds = 0.0
+        self._prev = np.zeros(size[0] * self.channels, dtype=np.uint8)
+        self._pending = []
+        self._pending_bytes = 0
+        self._zlib = zlib.compressobj(compress_level, zlib.DEFLATED, 15, 9, compress_type)
+        self._tmp = path + ".tmp"
+        self._file = open(self._tmp, "wb")
+        self._start = time.perf_counter()
+        width, height = size
+        header = _SIGNATURE + _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, self.color_type, 0, 0, 0))
+        if dpi:
+            ppm = round(dpi / 0.0254)
+            header += _chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+        self._write(header)
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes += len(data)
+
+    def _flush_idat(self, force=False):
+        if self._pending_bytes and (force or self._pending_bytes >= self.idat_bytes):
+            self._write(_chunk(b"IDAT", b"".join(self._pending)))
+            self._pending, self._pending_bytes = [], 0
+
+    def _compressed(self, data):
+        if data:
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            self._flush_idat()
+
+    def write(self, strip):
+        """Append rows: an (n, width[, channels]) uint8 array or an Image."""
+        if isinstance(strip, Image.Image):
+            strip = np.asarray(strip.convert(self.mode))
+        width, height = self.size
+        rows = np.ascontiguousarray(strip, dtype=np.uint8).reshape(len(strip), -1)
+        if rows.shape[1] != width * self.channels:
+            raise ValueError(f"Strip is {rows.shape[1] // self.channels} px wide, expected {width}")
+        if self.rows + len(rows) > height:
+            raise ValueError(f"Too many rows: {self.rows + len(rows)} > {height}")
+        start = time.perf_counter()
+        with stage("filter", pixels=width * len(rows)):
+            filtered = filter_rows(rows, self._prev, self.channels, self.filter)
+        self._prev = rows[-1].copy()
+        middle = time.perf_counter()
+        with stage("deflate", pixels=width * len(rows)):
+            self._compressed(self._zlib.compress(filtered))
+        self.filter_seconds += middle - start
+        self.deflate_seconds += time.perf_counter() - middle
+        self.rows += len(rows)
+
+    def close(self):
+        if self._file is None:
+            return
+        if self.rows != self.size[1]:
+            self.abort()
+            raise ValueError(f"Only {self.rows} of {self.size[1]} rows were written")
+        self._compressed(self._zlib.flush())
+        self._flush_idat(force=True)
+        self._write(_chunk(b"IEND", b""))
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def report(self):
+        seconds = time.perf_counter() - self._start
+        pixels = self.size[0] * self.rows
+        return {"path": self.path, "size": list(self.size), "bytes": self.bytes, "seconds": round(seconds, 2),
+                "megapixels_per_s": round(pixels / 1e6 / seconds, 2) if seconds else None,
+                "filter_s": round(self.filter_seconds, 2), "deflate_s": round(self.deflate_seconds, 2),
+                "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def stream_png(path, size, strips, mode="RGBA", **options):
+    """Write the strips yielded by `strips` (top to bottom) as one PNG; returns PNGWriter.report()."""
+    with PNGWriter(path, size, mode, **options) as writer:
+        source_seconds = 0.0
+        it = iter(strips)
+        while True:
+            start = time.perf_counter()
+            strip = next(it, None)
+            source_seconds += time.perf_counter() - start
+            if strip is None:
+                break
+            writer.write(strip)
+    report = writer.report()
+    report["source_s"] = round(source_seconds, 2)
+    return report
+
+
+def print_report(report):
+    width, height = report["size"]
+    print(f"{report['path']}: {width}x{height}, {report['bytes']:,} bytes in {report['seconds']} s "
+          f"({report['megapixels_per_s']} MP/s; source {report['source_s']} s, filter {report['filter_s']} s, "
+          f"deflate {report['deflate_s']} s; peak RSS {report['peak_rss_mb']} MB)")
+
+
+# --- reading ---------------------------------------------------------------
+
+# Colour type -> (Pillow mode, bytes per pixel) for 8-bit images
+_READ_COLOR_TYPES = {0: ("L", 1), 2: ("RGB", 3), 3: ("P", 1), 4: ("LA", 2), 6: ("RGBA", 4)}
+# Ancillary chunks a strip needs to decode like the whole image
+_STRIP_CHUNKS = (b"PLTE", b"tRNS")
+
+
+def _read_chunks(f):
+    if f.read(8) != _SIGNATURE:
+        raise ValueError(f"{getattr(f, 'name', 'file')} is not a PNG")
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        length, kind = struct.unpack(">I4s", head)
+        data = f.read(length)
+        f.read(4)
+        yield kind, data
+        if kind == b"IEND":
+            return
+
+
+def _read_header(path):
+    # (width, height, bit depth, colour type, interlace) from IHDR
+    with open(path, "rb") as f:
+        kind, data = next(_read_chunks(f), (None, b""))
+    if kind != b"IHDR":
+        raise ValueError(f"{path} has no IHDR")
+    width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", data)
+    return width, height, depth, color_type, interlace
+
+
+def streamable(path):
+    """True if read_strips() can decode `path`: a non-interlaced 8-bit PNG."""
+    try:
+        _, _, depth, color_type, interlace = _read_header(path)
+    except (OSError, ValueError, struct.error):
+        return False
+    return depth == 8 and not interlace and color_type in _READ_COLOR_TYPES
+
+
+def read_strips(path, rows=None):
+    """Yield (top, Image) strips of a PNG without ever decoding all of it.
+
+    IDAT data is inflated incrementally; each strip's filtered rows are
+    wrapped, behind its unfiltered previous row, in a small stored-deflate
+    PNG that Pillow unfilters. Memory is about one strip; the pixels are
+    identical to a full decode. Requires streamable(path).
+    """
+    width, height, depth, color_type, interlace = _read_header(path)
+    if not streamable(path):
+        raise ValueError(f"{path}: only non-interlaced 8-bit PNGs can be read in strips")
+    mode, bpp = _READ_COLOR_TYPES[color_type]
+    stride = width * bpp
+    rows = rows or strip_rows(width, bpp)
+    strip_bytes = rows * (1 + stride)
+
+    with open(path, "rb") as f:
+        extra = b""
+        inflate = zlib.decompressobj()
+        prev, top, buf = bytes(stride), 0, bytearray()
+
+        def strip(raw):
+            nonlocal prev, top
+            n = len(raw) // (1 + stride)
+            ihdr = struct.pack(">IIBBBBB", width, n + 1, 8, color_type, 0, 0, 0)
+            data = (_SIGNATURE + _chunk(b"IHDR", ihdr) + extra
+                    + _chunk(b"IDAT", zlib.compress(b"\0" + prev + raw, 0)) + _chunk(b"IEND", b""))
+            img = Image.open(io.BytesIO(data))
+            img.load()
+            prev = img.tobytes()[-stride:]
+            out = img.crop((0, 1, width, n + 1))
+            top += n
+            return top - n, out
+
+        for kind, data in _read_chunks(f):
+            if kind in _STRIP_CHUNKS:
+                extra += _chunk(kind, data)
+            elif kind == b"IDAT":
+                while data:
+                    buf += inflate.decompress(data, strip_bytes)
+                    data = inflate.unconsumed_tail
+                    while len(buf) >= strip_bytes:
+                        yield strip(bytes(buf[:strip_bytes]))
+                        del buf[:strip_bytes]
+        buf += inflate.flush()
+        if buf:
+            yield strip(bytes(buf[:len(buf) - len(buf) % (1 + stride)]))
+    if top != height:
+        raise ValueError(f"{path}: image data ends after {top} of {height} rows")
+
+
+# --- strip sources ---------------------------------------------------------
+
+def svg_strips(svg_path, size, rows=None, padding=0.0, current_color=(0, 0, 0)):
+    import svg_raster
+    doc = svg_raster.load_svg(svg_path)
+    rows = rows or strip_rows(size[0])
+    for top in range(0, size[1], rows):
+        yield svg_raster.render_array(doc, size, (top, min(top + rows, size[1])), padding, current_color)
+
+
+def perfect_logo_strips(size, rows=None, renderer=None):
+    import create_perfect_logo
+    renderer = renderer or create_perfect_logo.DEFAULT_RENDERER
+    rows = rows or strip_rows(size)
+    for top in range(0, size, rows):
+        yield create_perfect_logo.render_band(size, top, min(top + rows, size), renderer=renderer)
+
+
+def _unsharp_halo(radius):
+    # Rows outside a strip that UnsharpMask's gaussian reads (Pillow extends
+    # the kernel to about 2.6 sigma; the margin is generous)
+    return math.ceil(radius * 3) + 2
+
+
+def resampled_strips(img, size, rows=None, sharpen=None):
+    """Strips of img.resize(size, LANCZOS) (then UnsharpMask `sharpen`), made
+    one band at a time from the source with resize(box=...).
+
+    Pillow reads neighbouring source rows outside the box, so bands match
+    the whole-image resize bit for bit when band edges fall on whole source
+    rows; rows and halo are rounded to that step when it fits in a strip
+    (otherwise alpha may differ by 1 from coefficient rounding). Sharpened
+    bands are computed with a halo and cropped back.
+    """
+    width, height = size
+    rows = rows or strip_rows(width)
+    halo = _unsharp_halo(sharpen[0]) if sharpen else 0
+    step = height // math.gcd(height, img.height)
+    if step <= rows:
+        rows, halo = rows // step * step, -(-halo // step) * step
+    scale = img.height / height
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        y0, y1 = max(0, top - halo), min(height, bottom + halo)
+        band = img.resize((width, y1 - y0), Image.Resampling.LANCZOS, box=(0, y0 * scale, img.width, y1 * scale))
+        if sharpen:
+            radius, percent, threshold = sharpen
+            with stage("unsharp", pixels=band.width * band.height):
+                band = band.filter(ImageFilter.UnsharpMask(radius=radius, percent=percent, threshold=threshold))
+        yield band.crop((0, top - y0, width, bottom - y0))
+
+
+def print_masters(source=SOURCE, masters=PRINT_MASTERS, output_dir=".", **options):
+    # Print-resolution exports of the transparent master, streamed strip by
+    # strip; `options` go to PNGWriter
+    import intermediate
+    reports = []
+    for spec in masters:
+        path = os.path.join(output_dir, spec["name"])
+
+        def run(spec=spec, path=path):
+            img = intermediate.load_image(source)
+            scale = spec["size"] / max(img.size)
+            size = (int(img.width * scale), int(img.height * scale))
+            report = stream_png(path, size, resampled_strips(img, size, sharpen=spec.get("sharpen")), **options)
+            print_report(report)
+            reports.append(report)
+
+        cached_render("print_masters", [source, __file__], dict(spec, **options), [path], run)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream large PNGs strip by strip")
+    parser.add_argument("--compress-level", type=int, default=COMPRESS_LEVEL)
+    parser.add_argument("--filter", choices=FILTERS, default="adaptive")
+    parser.add_argument("--dpi", type=int, default=None, help="store a pHYs resolution")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("masters", help=f"write {', '.join(m['name'] for m in PRINT_MASTERS)}")
+    p.add_argument("--source", default=SOURCE)
+    p.add_argument("--output-dir", default=".")
+    p = sub.add_parser("resample", help="resize an image to a print size")
+    p.add_argument("source")
+    p.add_argument("output")
+    p.add_argument("--size", type=int, required=True, help="longest side in px")
+    p.add_argument("--sharpen", type=float, nargs=3, metavar=("RADIUS", "PERCENT", "THRESHOLD"))
+    p = sub.add_parser("svg", help="rasterize an SVG at a print size")
+    p.add_argument("svg")
+    p.add_argument("output")
+    p.add_argument("--width", type=int, required=True)
+    p.add_argument("--padding", type=float, default=0.0)
+    p.add_argument("--color", default="#000000", help="value of currentColor")
+    p = sub.add_parser("perfect", help="create_perfect_logo at a print size")
+    p.add_argument("output")
+    p.add_argument("--size", type=int, required=True)
+    p.add_argument("--renderer", choices=("svg", "supersample"),
+                   help="default: create_perfect_logo's (supersample; svg mirrors the gap)")
+    args = parser.parse_args()
+
+    options = {"compress_level": args.compress_level, "filter": args.filter, "dpi": args.dpi}
+    if args.command == "masters":
+        print_masters(args.source, PRINT_MASTERS, args.output_dir, **options)
+    elif args.command == "resample":
+        img = Image.open(args.source).convert("RGBA")
+        scale = args.size / max(img.size)
+        size = (int(img.width * scale), int(img.height * scale))
+        sharpen = (args.sharpen[0], int(args.sharpen[1]), int(args.sharpen[2])) if args.sharpen else None
+        print_report(stream_png(args.output, size, resampled_strips(img, size, sharpen=sharpen), **options))
+    elif args.command == "svg":
+        import svg_raster
+        doc = svg_raster.load_svg(args.svg)
+        size = svg_raster.canvas_size(doc, args.width)
+        strips = svg_strips(args.svg, size, padding=args.padding, current_color=svg_raster.parse_color(args.color))
+        print_report(stream_png(args.output, size, strips, **options))
+    else:
+        print_report(stream_png(args.output, (args.size, args.size),
+                                perfect_logo_strips(args.size, renderer=args.renderer), **options))
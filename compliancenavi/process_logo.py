@@ -1,17 +1,21 @@
 from PIL import Image
 import numpy as np
+from keying import key_white
+import intermediate
+from profiling import stage
 
 def process_logo(input_path, output_path):
     print(f"Processing {input_path}...")
     try:
-        img = Image.open(input_path).convert("RGBA")
-        data = np.array(img)
+        with stage("decode") as s:
+            img = Image.open(input_path).convert("RGBA")
+            data = np.array(img)
+            s["pixels"] = img.width * img.height
 
         # 1. Make white background transparent
         # Threshold for "white" (e.g., > 240 in all channels)
-        r, g, b, a = data.T
-        white_areas = (r > 240) & (g > 240) & (b > 240)
-        data[..., 3][white_areas.T] = 0
+        with stage("key", pixels=img.width * img.height):
+            key_white(data, threshold=240)
         
         # 2. Recolor non-transparent pixels to Purple (#764ba2 -> 118, 75, 162)
         # Identify non-transparent pixels
@@ -36,7 +40,8 @@ def process_logo(input_path, output_path):
         else:
             print("Warning: Image seems fully transparent after processing.")
 
-        new_img.save(output_path)
+        with stage("encode", pixels=new_img.width * new_img.height):
+            intermediate.publish(new_img, output_path)
         print(f"Saved processed logo to {output_path}")
 
     except Exception as e:
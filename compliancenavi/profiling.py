@@ -0,0 +1,339 @@
+import argparse
+import atexit
+import collections
+import functools
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+# MERKI_PROFILE=trace.jsonl (JSON lines) or trace.json (Chrome trace) turns the
+# stage instrumentation on; it is off, and close to free, otherwise.
+TRACE_PATH = os.environ.get("MERKI_PROFILE")
+# MERKI_PROFILE_MEMORY=1 adds tracemalloc peaks (Python and NumPy buffers;
+# Pillow's own buffers only show up in the RSS columns)
+TRACE_MEMORY = os.environ.get("MERKI_PROFILE_MEMORY", "0") != "0"
+# Whole-process cProfile stats, one .prof file per process
+CPROFILE_PATH = os.environ.get("MERKI_PROFILE_CPROFILE")
+# Sampled stacks in folded format (flamegraph.pl, speedscope), prefixed by stage
+SAMPLE_PATH = os.environ.get("MERKI_PROFILE_SAMPLE")
+SAMPLE_INTERVAL_MS = float(os.environ.get("MERKI_PROFILE_INTERVAL", 5))
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_fd = None
+_chrome = False
+_stacks = {}          # thread id -> open stages, innermost last
+_profiler = None
+_sampler = None
+_samples = collections.Counter()
+
+
+def _rss():
+    # Current resident set size in bytes (Linux), else None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+def _maxrss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _emit(record):
+    line = json.dumps(record, separators=(",", ":"))
+    # One write per event on an O_APPEND descriptor, so pool workers can share the file
+    os.write(_fd, (line + (",\n" if _chrome else "\n")).encode())
+
+
+class _Stage:
+    __slots__ = ("name", "args", "parent", "start", "rss", "maxrss", "mem", "child_peak")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = _stacks.setdefault(threading.get_ident(), [])
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        if TRACE_MEMORY and tracemalloc.is_tracing():
+            # Nested stages reset the peak, so the parent keeps the larger one
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+            tracemalloc.reset_peak()
+            self.mem, self.child_peak = current, 0
+        else:
+            self.mem = None
+        self.rss, self.maxrss = _rss(), _maxrss()
+        self.start = time.perf_counter_ns()
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        _stacks[threading.get_ident()].pop()
+        dur_ms = (end - self.start) / 1e6
+        fields = dict(self.args)
+        pixels = fields.get("pixels")
+        if pixels and dur_ms > 0:
+            fields["mpix_s"] = round(pixels / dur_ms / 1e3, 2)
+        rss, maxrss = _rss(), _maxrss()
+        if rss is not None and self.rss is not None:
+            fields["rss_delta"] = rss - self.rss
+        if maxrss is not None and self.maxrss is not None:
+            fields["maxrss_growth"] = maxrss - self.maxrss
+        if self.mem is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            if self.parent:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+            fields["alloc_bytes"] = current - self.mem
+            fields["peak_bytes"] = peak - self.mem
+        if exc_type is not None:
+            fields["error"] = exc_type.__name__
+        if _chrome:
+            _emit({"name": self.name, "cat": "stage", "ph": "X", "ts": self.start // 1000,
+                   "dur": (end - self.start) // 1000, "pid": os.getpid(),
+                   "tid": threading.get_native_id(), "args": fields})
+        else:
+            _emit(dict({"stage": self.name, "parent": self.parent.name if self.parent else None,
+                        "ts_us": self.start // 1000, "dur_ms": round(dur_ms, 3),
+                        "pid": os.getpid(), "tid": threading.get_native_id()}, **fields))
+        return False
+
+
+class _NullStage:
+    # Shared do-nothing stage; fields written to it are discarded
+    __slots__ = ()
+    _args = {}
+
+    def __enter__(self):
+        return self._args
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL = _NullStage()
+
+
+def stage(name, pixels=None, **args):
+    """Time a pipeline stage: `with stage("resize", pixels=w * h): ...`.
+
+    The with-target is the event's field dict, so values only known at the
+    end (output bytes, final size) can be added inside the block. Records
+    duration, pixels/s, RSS change and, with MERKI_PROFILE_MEMORY=1,
+    tracemalloc allocation. When profiling is off this returns a shared
+    no-op context manager.
+    """
+    if _fd is None:
+        return _NULL
+    if pixels is not None:
+        args["pixels"] = pixels
+    return _Stage(name, args)
+
+
+def profiled(name=None):
+    """Decorator form of stage(); returns the function untouched when profiling is off."""
+    def decorate(func):
+        if _fd is None:
+            return func
+        label = name or func.__qualname__
+
+        # wraps() keeps the qualified name, so the wrapper still pickles for process pools
+        @functools.wraps(func)
+        def wrapper(*a, **kw):
+            with _Stage(label, {}):
+                return func(*a, **kw)
+        return wrapper
+    return decorate
+
+
+def image_pixels(img):
+    # Pixel count of a PIL image or numpy array, for stage(pixels=...)
+    if hasattr(img, "size") and isinstance(img.size, tuple):
+        return img.size[0] * img.size[1]
+    return int(img.shape[0]) * int(img.shape[1])
+
+
+def _sample_loop(stop):
+    me = threading.get_ident()
+    interval = SAMPLE_INTERVAL_MS / 1000
+    while not stop.wait(interval):
+        for tid, frame in sys._current_frames().items():
+            if tid == me:
+                continue
+            calls = []
+            while frame is not None:
+                code = frame.f_code
+                calls.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stages = [s.name for s in _stacks.get(tid, ())]
+            _samples[";".join([f"[{s}]" for s in stages] + calls[::-1])] += 1
+
+
+def _per_process(path):
+    # Pool workers write next to the main process's file
+    if multiprocessing.parent_process() is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def _start_profilers():
+    global _profiler, _sampler
+    if CPROFILE_PATH:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if SAMPLE_PATH:
+        stop = threading.Event()
+        thread = threading.Thread(target=_sample_loop, args=(stop,), daemon=True, name="merki-sampler")
+        thread.start()
+        _sampler = (stop, thread)
+
+
+def _shutdown():
+    global _profiler, _sampler
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_per_process(CPROFILE_PATH))
+        _profiler = None
+    if _sampler is not None:
+        stop, thread = _sampler
+        stop.set()
+        thread.join()
+        _sampler = None
+        with open(_per_process(SAMPLE_PATH), "w", encoding="utf-8") as f:
+            for stack, count in _samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _flush_on_worker_exit():
+    # Pool workers leave through os._exit, which skips atexit
+    from multiprocessing.util import Finalize
+    Finalize(None, _shutdown, exitpriority=100)
+
+
+def _after_fork(_token):
+    # Forked pool workers start their own profilers (the sampler thread does
+    # not survive the fork, the parent's cProfile hook does)
+    global _profiler, _sampler
+    if _profiler is not None:
+        _profiler.disable()
+    _profiler, _sampler = None, None
+    _samples.clear()
+    _stacks.clear()
+    _start_profilers()
+    _flush_on_worker_exit()
+
+
+class _ForkToken:
+    # multiprocessing.util.register_after_fork needs a weakref-able object
+    pass
+
+
+_FORK_TOKEN = _ForkToken()
+
+
+def enable(path, memory=False):
+    """Start writing stage events to `path` (.json: Chrome trace, else JSON lines)."""
+    global _fd, _chrome, TRACE_MEMORY
+    _chrome = path.endswith(".json")
+    _fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    # Chrome's array format allows the closing bracket to be left off
+    if _chrome and os.fstat(_fd).st_size == 0:
+        os.write(_fd, b"[\n")
+    TRACE_MEMORY = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+if TRACE_PATH:
+    enable(TRACE_PATH, TRACE_MEMORY)
+if CPROFILE_PATH or SAMPLE_PATH:
+    _start_profilers()
+    if multiprocessing.parent_process() is not None:
+        _flush_on_worker_exit()
+    else:
+        atexit.register(_shutdown)
+        # Runs in forked multiprocessing children after their finalizers are reset
+        multiprocessing.util.register_after_fork(_FORK_TOKEN, _after_fork)
+
+
+def load_events(path):
+    # Stage events from a JSON-lines or Chrome trace file, as JSON-lines records
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        events = json.loads(text.rstrip().rstrip(",").rstrip("]") + "]")
+        return [dict({"stage": e["name"], "dur_ms": e["dur"] / 1000, "pid": e["pid"]}, **e["args"])
+                for e in events if e.get("ph") == "X"]
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def summarize(events):
+    # Per-stage totals, slowest first
+    totals = {}
+    for e in events:
+        t = totals.setdefault(e["stage"], {"count": 0, "ms": 0.0, "max_ms": 0.0, "pixels": 0,
+                                           "rss": 0, "peak": 0})
+        t["count"] += 1
+        t["ms"] += e["dur_ms"]
+        t["max_ms"] = max(t["max_ms"], e["dur_ms"])
+        t["pixels"] += e.get("pixels") or 0
+        t["rss"] = max(t["rss"], e.get("maxrss_growth") or 0, e.get("rss_delta") or 0)
+        t["peak"] = max(t["peak"], e.get("peak_bytes") or 0)
+    return sorted(totals.items(), key=lambda item: -item[1]["ms"])
+
+
+def print_summary(events):
+    print(f"{'stage':<36} {'calls':>6} {'total ms':>10} {'max ms':>9} {'MP/s':>8} {'rss MB':>7} {'py MB':>7}")
+    for name, t in summarize(events):
+        rate = f"{t['pixels'] / t['ms'] / 1e3:.1f}" if t["pixels"] and t["ms"] else "-"
+        print(f"{name:<36} {t['count']:>6} {t['ms']:>10.1f} {t['max_ms']:>9.1f} {rate:>8} "
+              f"{t['rss'] / 1e6:>7.1f} {t['peak'] / 1e6:>7.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage profiling for the image scripts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="run a script with profiling switched on")
+    p.add_argument("--trace", default="profile.jsonl", help=".jsonl (JSON lines) or .json (Chrome trace)")
+    p.add_argument("--memory", action="store_true", help="also track tracemalloc allocations")
+    p.add_argument("--cprofile", help="write cProfile stats here (per process)")
+    p.add_argument("--sample", help="write folded sampled stacks here (per process)")
+    p.add_argument("--interval", type=float, default=SAMPLE_INTERVAL_MS, help="sampling interval in ms")
+    p.add_argument("script")
+    p.add_argument("args", nargs=argparse.REMAINDER)
+    p = sub.add_parser("summary", help="per-stage totals of a trace")
+    p.add_argument("trace")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        env = dict(os.environ, MERKI_PROFILE=args.trace, MERKI_PROFILE_MEMORY="1" if args.memory else "0",
+                   MERKI_PROFILE_INTERVAL=str(args.interval))
+        if args.cprofile:
+            env["MERKI_PROFILE_CPROFILE"] = args.cprofile
+        if args.sample:
+            env["MERKI_PROFILE_SAMPLE"] = args.sample
+        if os.path.exists(args.trace):
+            os.remove(args.trace)
+        code = subprocess.call([sys.executable, args.script] + args.args, env=env)
+        if os.path.exists(args.trace):
+            print_summary(load_events(args.trace))
+        sys.exit(code)
+    else:
+        print_summary(load_events(args.trace))
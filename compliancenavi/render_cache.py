@@ -0,0 +1,232 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+CACHE_DIR = os.environ.get("MERKI_RENDER_CACHE_DIR", ".render_cache")
+# Default byte budget for cached renders before LRU eviction kicks in
+MAX_BYTES = int(os.environ.get("MERKI_RENDER_CACHE_BYTES", 512 * 1024 * 1024))
+# MERKI_RENDER_CACHE=0 forces every render to run
+ENABLED = os.environ.get("MERKI_RENDER_CACHE", "1") != "0"
+# Object dirs missing from the index this long after they were written are
+# left over from a process that died between put() and save()
+ORPHAN_AGE = 3600
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized
+    fcntl = None
+
+
+def canonical_params(params):
+    # Stable JSON for parameter dicts: sorted keys, tuples as lists, no spaces
+    return json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _write_json_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class RenderCache:
+    """On-disk cache of rendered files keyed on input content and parameters."""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.index = self._load()
+        self._reset_changes()
+
+    def _load(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("entries", {})
+        index.setdefault("digests", {})
+        index.setdefault("stats", {"hits": 0, "misses": 0, "evictions": 0})
+        return index
+
+    def _reset_changes(self):
+        # What this process changed since loading; save() merges only these
+        self._changed, self._removed, self._digests = set(), set(), set()
+        self._clear_digests = False
+        self._base_stats = dict(self.index["stats"])
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.root, "index.lock"), "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def file_digest(self, path):
+        # Content hash, memoized on (mtime, size) so unchanged inputs are not re-read
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        memo = self.index["digests"].get(os.path.abspath(path))
+        if memo and memo[0] == stamp:
+            return memo[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.index["digests"][os.path.abspath(path)] = [stamp, h.hexdigest()]
+        self._digests.add(os.path.abspath(path))
+        return h.hexdigest()
+
+    def key(self, namespace, inputs, params):
+        h = hashlib.sha256(namespace.encode())
+        for path in inputs:
+            h.update(self.file_digest(path).encode())
+        h.update(canonical_params(params).encode())
+        return h.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, "objects", key[:2], key)
+
+    def get(self, key, outputs):
+        # Restore cached files to `outputs`; False on a miss
+        entry = self.index["entries"].get(key)
+        if entry is None or entry["files"] != [os.path.basename(p) for p in outputs]:
+            self.index["stats"]["misses"] += 1
+            return False
+        try:
+            for path in outputs:
+                shutil.copyfile(os.path.join(self._entry_dir(key), os.path.basename(path)), path)
+        except FileNotFoundError:
+            # Object removed behind the index (evicted by another process, or deleted)
+            del self.index["entries"][key]
+            self._removed.add(key)
+            self._changed.discard(key)
+            self.index["stats"]["misses"] += 1
+            return False
+        entry["used"] = time.time()
+        self._changed.add(key)
+        self.index["stats"]["hits"] += 1
+        return True
+
+    def put(self, key, outputs):
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        for path in outputs:
+            shutil.copyfile(path, os.path.join(entry_dir, os.path.basename(path)))
+        self.index["entries"][key] = {
+            "files": [os.path.basename(p) for p in outputs],
+            "bytes": sum(os.path.getsize(p) for p in outputs),
+            "used": time.time(),
+        }
+        self._changed.add(key)
+        self._removed.discard(key)
+        self.evict()
+
+    def evict(self, max_bytes=None):
+        # Drop least recently used entries until the cache fits the budget
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.index["entries"]
+        total = sum(e["bytes"] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["used"]):
+            if total <= budget:
+                break
+            total -= entries.pop(key)["bytes"]
+            self._removed.add(key)
+            self._changed.discard(key)
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            self.index["stats"]["evictions"] += 1
+
+    def clear(self):
+        self.evict(0)
+        self.index["digests"] = {}
+        self._clear_digests = True
+
+    def _sweep_orphans(self):
+        objects = os.path.join(self.root, "objects")
+        cutoff = time.time() - ORPHAN_AGE
+        for prefix in os.listdir(objects):
+            for key in os.listdir(os.path.join(objects, prefix)):
+                path = os.path.join(objects, prefix, key)
+                if key not in self.index["entries"] and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def save(self):
+        # Merge this process's changes into the index on disk under a lock,
+        # so concurrent builds (build_graph -j) keep each other's entries
+        with self._lock():
+            index = self._load()
+            for key in self._removed:
+                index["entries"].pop(key, None)
+            for key in self._changed:
+                index["entries"][key] = self.index["entries"][key]
+            if self._clear_digests:
+                index["digests"] = {}
+            for path in self._digests:
+                if path in self.index["digests"]:
+                    index["digests"][path] = self.index["digests"][path]
+            for name, value in self.index["stats"].items():
+                index["stats"][name] = index["stats"].get(name, 0) + value - self._base_stats.get(name, 0)
+            self.index = index
+            self._reset_changes()
+            # The merged index can be over budget even if each process was not
+            self.evict()
+            self._sweep_orphans()
+            _write_json_atomic(self.index_path, self.index)
+            self._reset_changes()
+
+    def stats(self):
+        entries = self.index["entries"].values()
+        return dict(self.index["stats"], entries=len(entries),
+                    bytes=sum(e["bytes"] for e in entries), max_bytes=self.max_bytes)
+
+
+def cached_render(namespace, inputs, params, outputs, render, cache=None):
+    """Run render() unless a cached result for these inputs and params exists.
+
+    `inputs` are file paths whose content feeds the render (include the
+    renderer's own source so code changes invalidate), `outputs` the files
+    render() writes. Returns True on a cache hit.
+    """
+    if not ENABLED:
+        render()
+        return False
+    cache = cache or RenderCache()
+    key = cache.key(namespace, inputs, params)
+    hit = cache.get(key, outputs)
+    if hit:
+        print(f"Render cache hit ({namespace}): {', '.join(outputs)}")
+    else:
+        render()
+        cache.put(key, outputs)
+    cache.save()
+    return hit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or trim the logo render cache")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    parser.add_argument("--max-bytes", type=int, default=None, help="budget for prune")
+    args = parser.parse_args()
+
+    cache = RenderCache()
+    if args.command == "prune":
+        cache.evict(args.max_bytes)
+    elif args.command == "clear":
+        cache.clear()
+    cache.save()
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    print(json.dumps(stats, indent=2))
+    if lookups:
+        print(f"Hit rate: {stats['hits'] / lookups:.1%}")
@@ -0,0 +1,205 @@
+from PIL import Image, ImageDraw
+import argparse
+import os
+import time
+import numpy as np
+
+# Resampling quality used by the scripts unless they ask for one:
+#   exact: a single LANCZOS pass (the historical output, pixel for pixel)
+#   high:  integer box reduce() down to >= 2x the target, then LANCZOS
+#   fast:  reduce() down to >= 1x the target (box only for exact factors)
+QUALITIES = ("exact", "high", "fast")
+QUALITY = os.environ.get("MERKI_RESAMPLE", "high")
+# Minimum remaining scale the final LANCZOS pass gets after reduce()/draft()
+REDUCING_GAP = {"exact": None, "high": 2.0, "fast": 1.0}
+_PREMULTIPLIED = {"RGBA": "RGBa", "LA": "La"}
+
+
+def _reduce_factor(src, dst, gap):
+    # Largest integer k with src / k >= dst * gap
+    return max(1, int(src / (dst * gap) + 1e-9))
+
+
+def plan(src_size, dst_size, quality=QUALITY, jpeg=False):
+    """Cheapest resampling chain from src_size to dst_size for a quality level.
+
+    Returns a list of steps: ("draft", (w, h)) JPEG DCT scaling requested at
+    decode time (only when `jpeg`), ("reduce", (kx, ky)) integer box
+    reduction, and ("lanczos", (w, h)). Upscales and "exact" are always a
+    single LANCZOS pass; there is no cheaper chain with the same result.
+    """
+    if quality not in QUALITIES:
+        raise ValueError(f"Unknown resample quality {quality!r}; use one of {', '.join(QUALITIES)}")
+    (sw, sh), (dw, dh) = src_size, dst_size
+    if (sw, sh) == (dw, dh):
+        return []
+    gap = REDUCING_GAP[quality]
+    if gap is None or dw > sw or dh > sh:
+        return [("lanczos", (dw, dh))]
+
+    steps = []
+    if jpeg:
+        # draft() picks the smallest 1/2, 1/4 or 1/8 scale that is still >= the request
+        scale = min(sw / (dw * gap), sh / (dh * gap))
+        if scale >= 2:
+            request = (int(np.ceil(dw * gap)), int(np.ceil(dh * gap)))
+            steps.append(("draft", request))
+            denom = 8 if scale >= 8 else 4 if scale >= 4 else 2
+            sw, sh = -(-sw // denom), -(-sh // denom)
+    if quality == "fast" and sw % dw == 0 and sh % dh == 0:
+        # Exact integer factor: a box reduce is the whole job
+        return steps + [("reduce", (sw // dw, sh // dh))]
+    kx, ky = _reduce_factor(sw, dw, gap), _reduce_factor(sh, dh, gap)
+    if kx > 1 or ky > 1:
+        steps.append(("reduce", (kx, ky)))
+    return steps + [("lanczos", (dw, dh))]
+
+
+def describe(steps):
+    return " -> ".join(f"{op}{'x'.join(map(str, arg))}" for op, arg in steps) or "none"
+
+
+def resize(img, size, quality=QUALITY):
+    """img.resize(size, LANCZOS) through the planned chain.
+
+    RGBA and LA images are premultiplied once for the whole chain, the
+    same way Image.resize() does it for a single pass.
+    """
+    steps = [s for s in plan(img.size, size, quality) if s[0] != "draft"]
+    if not steps:
+        return img
+    mode = img.mode
+    work = img.convert(_PREMULTIPLIED[mode]) if mode in _PREMULTIPLIED else img
+    for op, arg in steps:
+        if op == "reduce":
+            work = work.reduce(arg)
+        else:
+            work = work.resize(arg, Image.Resampling.LANCZOS)
+    return work.convert(mode) if mode in _PREMULTIPLIED else work
+
+
+def open_scaled(path, size, quality=QUALITY):
+    """Open `path` for resizing to `size`, letting JPEG decode at 1/2-1/8 scale.
+
+    The returned image is at least as large as the plan needs; pass it to
+    resize() for the remaining steps.
+    """
+    img = Image.open(path)
+    if img.format == "JPEG":
+        for op, arg in plan(img.size, size, quality, jpeg=True):
+            if op == "draft":
+                img.draft(img.mode, arg)
+    return img
+
+
+# --- quality metrics ------------------------------------------------------
+
+def _pixels(img):
+    # Premultiplied float planes, so colour under transparent pixels is ignored
+    if img.mode in _PREMULTIPLIED or img.mode in ("P", "PA"):
+        img = img.convert("RGBA").convert("RGBa")
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img, dtype=np.float64)
+
+
+def psnr(a, b):
+    mse = np.mean((_pixels(a) - _pixels(b)) ** 2)
+    return float("inf") if mse == 0 else float(10 * np.log10(255 ** 2 / mse))
+
+
+def _box_mean(x, win):
+    # Mean over every win x win window ('valid' region) via summed-area tables
+    s = np.cumsum(np.cumsum(np.pad(x, ((1, 0), (1, 0))), axis=0), axis=1)
+    return (s[win:, win:] - s[:-win, win:] - s[win:, :-win] + s[:-win, :-win]) / (win * win)
+
+
+def ssim_map(a, b, win=7):
+    # SSIM of every win x win window ('valid' region), averaged over channels
+    x, y = _pixels(a), _pixels(b)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    total = 0
+    for c in range(x.shape[2]):
+        xc, yc = x[..., c], y[..., c]
+        mx, my = _box_mean(xc, win), _box_mean(yc, win)
+        vx = _box_mean(xc * xc, win) - mx * mx
+        vy = _box_mean(yc * yc, win) - my * my
+        cov = _box_mean(xc * yc, win) - mx * my
+        total = total + ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+    return total / x.shape[2]
+
+
+def ssim(a, b, win=7):
+    # Mean SSIM over channels with a uniform 7x7 window (scikit-image's default)
+    return float(ssim_map(a, b, win).mean())
+
+
+# --- benchmark ------------------------------------------------------------
+
+def _supersampled_logo(size):
+    # Hard-edged RGBA mark like create_perfect_logo's 4x canvas
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    r = int(size * 0.46)
+    c = size // 2
+    ImageDraw.Draw(img).pieslice([c - r, c - r, c + r, c + r], start=-45, end=270, fill=(118, 75, 162, 255))
+    return img
+
+
+def benchmark_cases():
+    # (label, loader(quality) -> image, source size, target size, is_jpeg)
+    logo = _supersampled_logo(8192)
+    cases = [("perfect_logo 8192->2048 RGBA", lambda q: logo, logo.size, (2048, 2048), False)]
+    if os.path.exists("merki_logo_transparent.png"):
+        master = Image.open("merki_logo_transparent.png").convert("RGBA")
+        cases.append(("export 1024->4096 upscale", lambda q: master, master.size, (4096, 4096), False))
+        cases.append(("export 1024->512 RGBA", lambda q: master, master.size, (512, 512), False))
+    for name, width in (("paypal_cover.jpg", 320), ("paypal_hero.jpg", 480)):
+        if os.path.exists(name):
+            with Image.open(name) as probe:
+                src = probe.size
+            size = (width, round(src[1] * width / src[0]))
+            cases.append((f"{name} -> {width}w (decode+resize)",
+                          lambda q, name=name, size=size: open_scaled(name, size, q), src, size, True))
+    return cases
+
+
+def benchmark(qualities=QUALITIES, repeat=3):
+    print(f"{'case':<42} {'quality':<7} {'plan':<34} {'ms':>8} {'speedup':>8} {'PSNR dB':>8} {'SSIM':>7}")
+    rows = []
+    for label, load, src, size, jpeg in benchmark_cases():
+        reference, base_ms = None, None
+        for quality in qualities:
+            steps, best = plan(src, size, quality, jpeg), float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                out = resize(load(quality), size, quality)
+                out.load()
+                best = min(best, time.perf_counter() - start)
+            ms = best * 1000
+            if reference is None:
+                reference, base_ms = out, ms
+            score_psnr, score_ssim = psnr(reference, out), ssim(reference, out)
+            rows.append({"case": label, "quality": quality, "plan": describe(steps), "ms": round(ms, 1),
+                         "psnr": score_psnr, "ssim": score_ssim})
+            print(f"{label:<42} {quality:<7} {describe(steps):<34} {ms:>8.1f} {base_ms / ms:>7.2f}x "
+                  f"{score_psnr:>8.2f} {score_ssim:>7.4f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resampling planner: show plans or benchmark them")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("plan", help="print the chain for a resize")
+    p.add_argument("src", help="WxH")
+    p.add_argument("dst", help="WxH")
+    p.add_argument("--quality", choices=QUALITIES, default=QUALITY)
+    p.add_argument("--jpeg", action="store_true", help="source is a JPEG (allows draft decoding)")
+    p = sub.add_parser("bench", help="time and score each quality against exact LANCZOS")
+    p.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        src, dst = (tuple(int(v) for v in s.lower().split("x")) for s in (args.src, args.dst))
+        print(describe(plan(src, dst, args.quality, args.jpeg)))
+    else:
+        benchmark(repeat=args.repeat)
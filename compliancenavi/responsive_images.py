@@ -0,0 +1,228 @@
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import re
+from profiling import stage
+import resample
+
+# Width buckets for derivatives; widths at or above the source width are skipped
+# and the source width itself is always included.
+WIDTHS = [96, 192, 320, 480, 640, 960, 1280, 1920]
+OUTPUT_DIR = "responsive"
+WEBP_QUALITY = 82
+JPEG_QUALITY = 85
+
+# Displayed width per class, taken from style.css / index.html
+SIZES_BY_CLASS = {
+    "logo-img": "45px",
+    "step-image-large": "160px",
+    "auto-image": "100px",
+    "dashboard-screenshot-img": "(max-width: 768px) 100vw, 600px",
+}
+DEFAULT_SIZES = "100vw"
+
+RASTER_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+IMG_TAG = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+ATTRIBUTE = re.compile(r"""([\w:-]+)\s*=\s*("[^"]*"|'[^']*')""")
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+STYLE_PX = re.compile(r"(?<![\w-])(width|height)\s*:\s*(\d+(?:\.\d+)?)px")
+
+
+def _is_local_raster(ref):
+    return (not re.match(r"^(data:|https?:|//|#)", ref)
+            and ref.lower().split("?")[0].endswith(RASTER_EXTENSIONS))
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", errors="surrogateescape", newline="") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def derivative_paths(source_rel, width, has_alpha):
+    stem = os.path.splitext(source_rel)[0].replace("\\", "/")
+    fallback = ".png" if has_alpha else ".jpg"
+    return (f"{OUTPUT_DIR}/{stem}-{width}w.webp", f"{OUTPUT_DIR}/{stem}-{width}w{fallback}")
+
+
+def build_derivatives(root, source_rel, widths=WIDTHS):
+    # Resize one source into every width bucket as WebP + PNG/JPEG fallback
+    with stage("decode", source=source_rel) as s:
+        img = Image.open(os.path.join(root, source_rel))
+        img.load()
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        s["pixels"] = img.width * img.height
+    targets = sorted({w for w in widths if w < img.width} | {img.width})
+
+    outputs = []
+    for width in targets:
+        height = max(1, round(img.height * width / img.width))
+        with stage("resize", pixels=width * height):
+            resized = resample.resize(img, (width, height))
+        webp_rel, fallback_rel = derivative_paths(source_rel, width, has_alpha)
+        os.makedirs(os.path.dirname(os.path.join(root, webp_rel)), exist_ok=True)
+        with stage("encode:webp", pixels=width * height):
+            resized.save(os.path.join(root, webp_rel), "WEBP", quality=WEBP_QUALITY, method=4)
+        with stage("encode:fallback", pixels=width * height):
+            if has_alpha:
+                resized.save(os.path.join(root, fallback_rel), "PNG", optimize=True)
+            else:
+                resized.save(os.path.join(root, fallback_rel), "JPEG", quality=JPEG_QUALITY,
+                             optimize=True, progressive=True)
+        outputs.append([width, webp_rel, fallback_rel])
+    return {"size": list(img.size), "outputs": outputs}
+
+
+def _source_stamp(root, source_rel):
+    st = os.stat(os.path.join(root, source_rel))
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _build_job(args):
+    root, source_rel = args
+    return source_rel, build_derivatives(root, source_rel)
+
+
+def scan_references(root, pages, stylesheets):
+    # Map each referenced raster (relative to root) to the files referencing it
+    refs = {}
+    for path in pages + stylesheets:
+        with open(path, encoding="utf-8", errors="surrogateescape") as f:
+            text = f.read()
+        found = [m.group(2) for m in CSS_URL.finditer(text)]
+        if path in pages:
+            for tag in IMG_TAG.findall(text):
+                attrs = {k.lower(): v[1:-1] for k, v in ATTRIBUTE.findall(tag)}
+                found.append(attrs.get("src", ""))
+        for ref in found:
+            if not _is_local_raster(ref):
+                continue
+            source = os.path.normpath(os.path.join(os.path.dirname(path), ref.split("?")[0]))
+            source_rel = os.path.relpath(source, root).replace("\\", "/")
+            if os.path.isfile(source) and not source_rel.startswith(OUTPUT_DIR + "/"):
+                refs.setdefault(source_rel, set()).add(path)
+    return refs
+
+
+def sizes_for(attrs, natural_size):
+    style = dict((k, float(v)) for k, v in STYLE_PX.findall(attrs.get("style", "")))
+    if "width" in style:
+        return f"{round(style['width'])}px"
+    if "height" in style:
+        return f"{round(style['height'] * natural_size[0] / natural_size[1])}px"
+    for cls in attrs.get("class", "").split():
+        if cls in SIZES_BY_CLASS:
+            return SIZES_BY_CLASS[cls]
+    return DEFAULT_SIZES
+
+
+def rewrite_page(path, root, manifest):
+    # <img src> -> <picture> with a WebP source + srcset/sizes/width/height;
+    # CSS url() -> full-width WebP derivative. Returns (new_text, changes).
+    with open(path, encoding="utf-8", errors="surrogateescape") as f:
+        text = f.read()
+    page_dir = os.path.dirname(path)
+    changes = 0
+
+    def rel(target_rel):
+        return os.path.relpath(os.path.join(root, target_rel), page_dir).replace("\\", "/")
+
+    def entry_for(ref):
+        if not _is_local_raster(ref):
+            return None
+        source = os.path.normpath(os.path.join(page_dir, ref.split("?")[0]))
+        return manifest.get(os.path.relpath(source, root).replace("\\", "/"))
+
+    def img_tag(match):
+        nonlocal changes
+        tag = match.group(0)
+        attrs = {k.lower(): v[1:-1] for k, v in ATTRIBUTE.findall(tag)}
+        entry = entry_for(attrs.get("src", ""))
+        if entry is None or "srcset" in attrs:
+            return tag
+        outputs, (width, height) = entry["outputs"], entry["size"]
+        sizes = sizes_for(attrs, (width, height))
+        webp = ", ".join(f"{rel(webp_rel)} {w}w" for w, webp_rel, _ in outputs)
+        fallback = ", ".join(f"{rel(fallback_rel)} {w}w" for w, _, fallback_rel in outputs)
+        extra = f' srcset="{fallback}" sizes="{sizes}"'
+        if "width" not in attrs and "height" not in attrs:
+            extra += f' width="{width}" height="{height}"'
+        new_tag = re.sub(r"\s*/?>$", lambda end: extra + end.group(0), tag, count=1)
+        changes += 1
+        return (f'<picture><source type="image/webp" srcset="{webp}" sizes="{sizes}">'
+                f'{new_tag}</picture>')
+
+    def css_url(match):
+        nonlocal changes
+        entry = entry_for(match.group(2))
+        if entry is None:
+            return match.group(0)
+        changes += 1
+        return f"url({match.group(1)}{rel(entry['outputs'][-1][1])}{match.group(1)})"
+
+    if path.endswith(".html"):
+        text = IMG_TAG.sub(img_tag, text)
+    text = CSS_URL.sub(css_url, text)
+    return text, changes
+
+
+def build(root=".", page_pattern="*.html", css_pattern="*.css", exclude=("*.bak.*",),
+          workers=None, dry_run=False):
+    def collect(pattern):
+        paths = glob.glob(os.path.join(root, pattern), recursive=True)
+        return sorted(p for p in paths
+                      if not any(fnmatch.fnmatch(os.path.basename(p), e) for e in exclude))
+
+    pages, stylesheets = collect(page_pattern), collect(css_pattern)
+    refs = scan_references(root, pages, stylesheets)
+    manifest_path = os.path.join(root, OUTPUT_DIR, "manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    # Only sources whose mtime/size changed (or whose outputs vanished) are rebuilt
+    stale = [src for src in sorted(refs)
+             if manifest.get(src, {}).get("stamp") != _source_stamp(root, src)
+             or not all(os.path.exists(os.path.join(root, p))
+                        for _, *paths in manifest[src]["outputs"] for p in paths)]
+    print(f"{len(pages)} page(s), {len(refs)} referenced image(s), {len(stale)} to (re)build")
+    if dry_run:
+        for src in stale:
+            print(f"  would build {src} (used by {len(refs[src])} file(s))")
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source_rel, entry in pool.map(_build_job, [(root, src) for src in stale]):
+            entry["stamp"] = _source_stamp(root, source_rel)
+            manifest[source_rel] = entry
+            print(f"  built {source_rel}: {', '.join(str(w) for w, _, _ in entry['outputs'])}")
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+    referencing = sorted({path for paths in refs.values() for path in paths})
+    for path in referencing:
+        text, changes = rewrite_page(path, root, manifest)
+        if changes:
+            _write_atomic(path, text)
+            print(f"  rewrote {changes} reference(s) in {os.path.relpath(path, root)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate srcset derivatives for images used by the site")
+    parser.add_argument("--root", default=".")
+    parser.add_argument("--pages", default="*.html", help="glob of pages to scan (relative to root)")
+    parser.add_argument("--css", default="*.css", help="glob of stylesheets to scan")
+    parser.add_argument("--exclude", nargs="*", default=["*.bak.*"], help="basename globs to skip")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="list work without writing anything")
+    args = parser.parse_args()
+    build(args.root, args.pages, args.css, args.exclude, args.workers, args.dry_run)
@@ -1,19 +1,17 @@
-from PIL import Image
+from image_stats import analyze
 
-def sample_colors():
-    img = Image.open("merki_logo_transparent.png").convert("RGBA")
-    w, h = img.size
-    
-    # 左上 (おおよそ不透明な部分の端)
-    c1 = img.getpixel((w//4, h//4))
-    # 右下 (おおよそ不透明な部分の端)
-    c2 = img.getpixel((3*w//4, 3*h//4))
-    # 中央
-    c3 = img.getpixel((h//2, w//2))
-    
-    print(f"Top-Left sample: {c1}")
-    print(f"Bottom-Right sample: {c2}")
-    print(f"Center sample: {c3}")
+def sample_colors(path="merki_logo_transparent.png"):
+    # 3点の getpixel ではなく、不透明ピクセル全体から
+    # グラデーションの開始色・終了色・方向をフィットする
+    report = analyze(path, histograms=False)
+    gradient = report["gradient"]
+    mean = tuple(round(report["channels"][ch]["mean"]) for ch in "RGB")
+
+    print(f"Gradient start: {tuple(gradient['start'])}")
+    print(f"Gradient end: {tuple(gradient['end'])}")
+    print(f"Angle: {gradient['angle']}deg (CSS)")
+    print(f"Mean color: {mean}")
+    return gradient
 
 if __name__ == "__main__":
     sample_colors()
@@ -0,0 +1,343 @@
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, features
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from profiling import stage
+from render_cache import canonical_params
+import resample
+import responsive_images
+
+# Marketing screenshots: flat-looking UI captures stored as lossless truecolor
+SCREENSHOTS = [
+    "images/dashboard_home.png",
+    "images/dashboard_regulations.png",
+    "images/dashboard_subscription.png",
+    "images/dashboard_team.png",
+    "step1.png",
+    "step2.png",
+    "step3.png",
+]
+OUTPUT_DIR = "optimized"
+DECISIONS = "decisions.json"
+
+# Lossy candidates, tried at the source size and at the largest displayed size
+PALETTE_COLORS = [256, 128, 64, 32]
+WEBP_QUALITIES = [95, 90, 85, 80, 70]
+WEBP_METHOD = 6
+
+# A candidate must keep the mean SSIM against the original at or above
+# SSIM_FLOOR, and the worst TILE x TILE block at or above TILE_FLOOR: a
+# mean over a mostly empty capture hides one smeared label, the worst block
+# does not (the max-over-regions idea behind butteraugli).
+SSIM_FLOOR = 0.98
+TILE_FLOOR = 0.95
+TILE = 64
+
+# Pixels per CSS pixel the downscaled candidate has to cover
+DEVICE_PIXEL_RATIO = 2
+
+EXTENSIONS = {"png": ".png", "webp": ".webp"}
+CSS_LENGTH = re.compile(r"(?:\(max-width:\s*(\d+(?:\.\d+)?)px\)\s*)?(\d+(?:\.\d+)?)(px|vw)$")
+
+
+def display_width(sizes):
+    # Largest CSS width a `sizes` value can select, or None when unbounded
+    # ("(max-width: 768px) 100vw, 600px" -> 768, "100vw" -> None)
+    widest = 0
+    for entry in sizes.split(","):
+        match = CSS_LENGTH.match(entry.strip())
+        if match is None:
+            return None
+        max_width, value, unit = match.groups()
+        if unit == "px":
+            widest = max(widest, float(value))
+        elif max_width is None:
+            return None
+        else:
+            widest = max(widest, float(value) * float(max_width) / 100)
+    return round(widest)
+
+
+def display_widths(root, pages):
+    # Map each raster referenced by <img> in `pages` to its widest displayed
+    # CSS width (None if any use is unbounded)
+    widths = {}
+    for path in pages:
+        with open(path, encoding="utf-8", errors="surrogateescape") as f:
+            text = f.read()
+        for tag in responsive_images.IMG_TAG.findall(text):
+            attrs = {k.lower(): v[1:-1] for k, v in responsive_images.ATTRIBUTE.findall(tag)}
+            ref = attrs.get("src", "")
+            if not responsive_images._is_local_raster(ref):
+                continue
+            source = os.path.normpath(os.path.join(os.path.dirname(path), ref.split("?")[0]))
+            if not os.path.isfile(source):
+                continue
+            source_rel = os.path.relpath(source, root).replace("\\", "/")
+            with Image.open(source) as img:
+                width = display_width(responsive_images.sizes_for(attrs, img.size))
+            if width is None or widths.get(source_rel, 0) is None:
+                widths[source_rel] = None
+            else:
+                widths[source_rel] = max(width, widths.get(source_rel, 0))
+    return widths
+
+
+def target_size(size, css_width, dpr=DEVICE_PIXEL_RATIO):
+    # Size of the downscaled candidate, or None if the source is not larger
+    if css_width is None or css_width * dpr >= size[0]:
+        return None
+    width = round(css_width * dpr)
+    return width, max(1, round(size[1] * width / size[0]))
+
+
+def worst_tile(ssim_map, tile=TILE):
+    # Lowest mean SSIM over tile x tile blocks (the whole map if smaller)
+    h, w = ssim_map.shape
+    th, tw = min(tile, h), min(tile, w)
+    blocks = ssim_map[:h - h % th, :w - w % tw].reshape(h // th, th, w // tw, tw)
+    return float(blocks.mean(axis=(1, 3)).min())
+
+
+def candidates(formats=("png", "webp")):
+    # (format, options) pairs to try at each size, roughly smallest first so
+    # that once one passes the larger ones skip scoring; "colors" quantizes first
+    out = []
+    if "webp" in formats and features.check("webp"):
+        out += [("webp", {"quality": q, "method": WEBP_METHOD}) for q in sorted(WEBP_QUALITIES)]
+    if "png" in formats:
+        out += [("png", {"colors": n, "optimize": True}) for n in sorted(PALETTE_COLORS)]
+        out.append(("png", {"optimize": True}))
+    return out
+
+
+def encode(img, fmt, options):
+    # Encoded bytes of one candidate
+    if "colors" in options:
+        # Median cut for RGB; RGBA only quantizes with the octree
+        method = Image.Quantize.FASTOCTREE if img.mode == "RGBA" else Image.Quantize.MEDIANCUT
+        img = img.quantize(options["colors"], method=method, dither=Image.Dither.NONE)
+    buf = io.BytesIO()
+    img.save(buf, fmt.upper(), **{k: v for k, v in options.items() if k != "colors"})
+    return buf.getvalue()
+
+
+def _score(reference, data):
+    decoded = Image.open(io.BytesIO(data)).convert(reference.mode)
+    ssim_map = resample.ssim_map(reference, decoded)
+    return round(float(ssim_map.mean()), 5), round(worst_tile(ssim_map), 5)
+
+
+def _load(path):
+    img = Image.open(path)
+    img.load()
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+    return img.convert("RGBA" if has_alpha else "RGB")
+
+
+def evaluate(path, size=None, formats=("png", "webp"), floor=SSIM_FLOOR, tile_floor=TILE_FLOOR):
+    """Try every candidate for one screenshot and pick the smallest passing one.
+
+    `size` adds a downscaled round of candidates; those are scored against
+    the original resampled to that size. The original file itself is always
+    a candidate, so the result is never larger than the input.
+    Returns (decision, encoded bytes of the winner).
+    """
+    with open(path, "rb") as f:
+        original = f.read()
+    with stage("decode", source=path) as s:
+        img = _load(path)
+        s["pixels"] = img.width * img.height
+    ext = os.path.splitext(path)[1].lower()
+    best = {"format": ext.lstrip("."), "options": {}, "size": list(img.size),
+            "bytes": len(original), "ssim": 1.0, "worst_tile": 1.0}
+    best_data, tried = original, []
+
+    for target in ([tuple(size)] if size else []) + [img.size]:
+        if target == img.size:
+            reference = img
+        else:
+            with stage("resize", pixels=target[0] * target[1]):
+                reference = resample.resize(img, target, "exact")
+        for fmt, options in candidates(formats):
+            with stage(f"candidate:{fmt}", pixels=target[0] * target[1], options=options) as s:
+                data = encode(reference, fmt, options)
+                s["bytes"] = len(data)
+            if len(data) >= best["bytes"]:
+                # Cannot win; skip the SSIM pass
+                tried.append({"format": fmt, "options": options, "size": list(target), "bytes": len(data)})
+                continue
+            with stage("ssim", pixels=target[0] * target[1]):
+                score, tile_score = _score(reference, data)
+            result = {"format": fmt, "options": options, "size": list(target), "bytes": len(data),
+                      "ssim": score, "worst_tile": tile_score}
+            tried.append(result)
+            if score >= floor and tile_score >= tile_floor:
+                best, best_data = result, data
+
+    decision = dict(best, source_bytes=len(original), candidates=tried,
+                    kept=best_data is original)
+    return decision, best_data
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _code_version():
+    # Decisions depend on this module and the SSIM/resize code
+    h = hashlib.sha256()
+    for path in (__file__, resample.__file__):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def _decision_key(content_digest, params):
+    return content_digest + ":" + hashlib.sha256(canonical_params(params).encode()).hexdigest()[:16]
+
+
+def output_path(source_rel, fmt, output_dir):
+    # optimized/<source path with the winner's extension>; None output_dir = next to the source
+    stem = os.path.splitext(source_rel)[0]
+    return stem + EXTENSIONS[fmt] if output_dir is None else os.path.join(output_dir, stem + EXTENSIONS[fmt])
+
+
+def _write_bytes(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _evaluate_job(args):
+    start = time.perf_counter()
+    source_rel, path, size, formats, floor, tile_floor = args
+    decision, data = evaluate(path, size, formats, floor, tile_floor)
+    decision["seconds"] = round(time.perf_counter() - start, 2)
+    return source_rel, decision, data
+
+
+def optimize(inputs=SCREENSHOTS, root=".", output_dir=OUTPUT_DIR, page_pattern="*.html",
+             formats=("png", "webp"), floor=SSIM_FLOOR, tile_floor=TILE_FLOOR,
+             dpr=DEVICE_PIXEL_RATIO, workers=None):
+    """Write the smallest candidate above the SSIM floors for each input.
+
+    Decisions are stored in <root>/<OUTPUT_DIR>/decisions.json keyed by the
+    input's content hash and the parameters, so unchanged screenshots are not
+    re-scored. output_dir=None writes next to the source, replacing it when
+    the winner keeps its format; files that are themselves optimizer outputs
+    are skipped so repeated runs do not compound the loss.
+    """
+    pages = sorted(glob.glob(os.path.join(root, page_pattern)))
+    widths = display_widths(root, pages)
+    decisions_path = os.path.join(root, OUTPUT_DIR, DECISIONS)
+    try:
+        with open(decisions_path, encoding="utf-8") as f:
+            decisions = json.load(f)
+    except (OSError, ValueError):
+        decisions = {}
+    produced = {d["output_sha256"] for d in decisions.values() if d.get("output_sha256")}
+    version = _code_version()
+
+    reports, jobs, keys = [], [], {}
+    for source_rel in inputs:
+        path = os.path.join(root, source_rel)
+        with open(path, "rb") as f:
+            content_digest = _digest(f.read())
+        if content_digest in produced:
+            print(f"  skipping {source_rel}: already an optimizer output")
+            continue
+        with Image.open(path) as img:
+            size = target_size(img.size, widths.get(source_rel), dpr)
+        params = {"size": size, "formats": sorted(formats), "floor": floor, "tile_floor": tile_floor,
+                  "tile": TILE, "colors": PALETTE_COLORS, "webp": WEBP_QUALITIES, "code": version}
+        key = _decision_key(content_digest, params)
+        keys[source_rel] = key
+        decision = decisions.get(key)
+        if decision is None:
+            jobs.append((source_rel, path, size, tuple(formats), floor, tile_floor))
+            continue
+        # Cache hit: re-encode only the chosen candidate if its output is gone
+        out = output_path(source_rel, decision["format"], output_dir)
+        out_path = os.path.join(root, out)
+        if decision["kept"]:
+            if output_dir is not None and not os.path.exists(out_path):
+                with open(path, "rb") as f:
+                    _write_bytes(out_path, f.read())
+        elif not os.path.exists(out_path):
+            with stage("reencode", source=source_rel):
+                img = _load(path)
+                if list(img.size) != decision["size"]:
+                    img = resample.resize(img, tuple(decision["size"]), "exact")
+                _write_bytes(out_path, encode(img, decision["format"], decision["options"]))
+        reports.append(dict(decision, source=source_rel, output=out, cached=True))
+
+    print(f"{len(inputs)} screenshot(s), {len(jobs)} to evaluate")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source_rel, decision, data in pool.map(_evaluate_job, jobs):
+            out = output_path(source_rel, decision["format"], output_dir)
+            if output_dir is not None or not decision["kept"]:
+                _write_bytes(os.path.join(root, out), data)
+            decision["output_sha256"] = None if decision["kept"] else _digest(data)
+            decisions[keys[source_rel]] = decision
+            reports.append(dict(decision, source=source_rel, output=out, cached=False))
+
+    _write_bytes(decisions_path, json.dumps(decisions, indent=1).encode("utf-8"))
+    reports.sort(key=lambda r: inputs.index(r["source"]))
+    return reports
+
+
+def _describe(report):
+    if report["kept"]:
+        return "original"
+    options = report["options"]
+    detail = f"{options['colors']} colors" if "colors" in options else \
+        f"q{options['quality']}" if "quality" in options else "lossless"
+    return f"{report['format']} {detail} {report['size'][0]}x{report['size'][1]}"
+
+
+def print_report(reports):
+    print(f"{'source':<34} {'result':<26} {'before':>9} {'after':>9} {'saved':>6} "
+          f"{'ssim':>7} {'worst':>7} {'time s':>7}")
+    for r in reports:
+        saved = 1 - r["bytes"] / r["source_bytes"]
+        seconds = "cached" if r["cached"] else r["seconds"]
+        print(f"{r['source']:<34} {_describe(r):<26} {r['source_bytes']:>9,} {r['bytes']:>9,} {saved:>6.1%} "
+              f"{r['ssim']:>7.4f} {r['worst_tile']:>7.4f} {seconds:>7}")
+    before = sum(r["source_bytes"] for r in reports)
+    after = sum(r["bytes"] for r in reports)
+    print(f"Total: {before:,} -> {after:,} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lossy-compress site screenshots above an SSIM floor")
+    parser.add_argument("inputs", nargs="*", default=SCREENSHOTS, help="paths relative to --root")
+    parser.add_argument("--root", default=".")
+    parser.add_argument("--pages", default="*.html", help="glob of pages giving displayed sizes")
+    parser.add_argument("--formats", nargs="+", default=["png", "webp"], choices=sorted(EXTENSIONS))
+    parser.add_argument("--floor", type=float, default=SSIM_FLOOR, help="minimum mean SSIM")
+    parser.add_argument("--tile-floor", type=float, default=TILE_FLOOR,
+                        help=f"minimum SSIM of the worst {TILE}x{TILE} block")
+    parser.add_argument("--dpr", type=float, default=DEVICE_PIXEL_RATIO,
+                        help="device pixel ratio the downscaled candidate must cover")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--in-place", action="store_true",
+                        help="write next to the sources (replacing them when the format is kept)")
+    parser.add_argument("--report", help="write the decisions as JSON")
+    args = parser.parse_args()
+
+    reports = optimize(args.inputs, args.root, None if args.in_place else args.output_dir, args.pages,
+                       args.formats, args.floor, args.tile_floor, args.dpr, args.workers)
+    print_report(reports)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
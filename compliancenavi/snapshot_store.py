@@ -0,0 +1,268 @@
+from difflib import SequenceMatcher
+import argparse
+import errno
+import glob
+import hashlib
+import json
+import os
+import stat
+import struct
+import tempfile
+import time
+import zlib
+
+STORE_DIR = os.environ.get("MERKI_SNAPSHOT_DIR", ".snapshots")
+# A delta is kept only when it is smaller than this share of the full object
+DELTA_RATIO = 0.5
+# Longest base -> delta -> delta ... chain before a version is stored in full
+MAX_DELTA_DEPTH = 8
+FICLONE = 0x40049409
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def make_delta(base, data):
+    # Copy/insert ops against `base`, matched line by line (bytes.splitlines
+    # also works on binary files, just with fewer matches)
+    base_lines, lines = base.splitlines(keepends=True), data.splitlines(keepends=True)
+    base_offsets = [0]
+    for line in base_lines:
+        base_offsets.append(base_offsets[-1] + len(line))
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, base_lines, lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            start, end = base_offsets[i1], base_offsets[i2]
+            ops.append(b"C" + struct.pack(">II", start, end - start))
+        else:
+            chunk = b"".join(lines[j1:j2])
+            if chunk:
+                ops.append(b"I" + struct.pack(">I", len(chunk)) + chunk)
+    return zlib.compress(b"".join(ops), 9)
+
+
+def apply_delta(base, delta):
+    ops, out, pos = zlib.decompress(delta), [], 0
+    while pos < len(ops):
+        if ops[pos:pos + 1] == b"C":
+            start, length = struct.unpack_from(">II", ops, pos + 1)
+            out.append(base[start:start + length])
+            pos += 9
+        else:
+            (length,) = struct.unpack_from(">I", ops, pos + 1)
+            out.append(ops[pos + 5:pos + 5 + length])
+            pos += 5 + length
+    return b"".join(out)
+
+
+def _reflink(src, dest):
+    # Copy-on-write clone where the filesystem supports it (btrfs, xfs)
+    import fcntl
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+class SnapshotStore:
+    """Content-addressed snapshots of directory trees.
+
+    Every distinct file content is stored once under objects/ (raw, so it can
+    be hardlinked on restore) or, when a previous version of the same path
+    exists, as a zlib-compressed line delta under deltas/. Snapshots are
+    JSON manifests of path -> (digest, size, mtime, mode).
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        for sub in ("objects", "deltas", "snapshots"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _delta_path(self, digest):
+        return os.path.join(self.root, "deltas", digest[:2], digest)
+
+    def _manifest_path(self, name):
+        return os.path.join(self.root, "snapshots", name + ".json")
+
+    def has(self, digest):
+        return os.path.exists(self._object_path(digest)) or os.path.exists(self._delta_path(digest))
+
+    def names(self):
+        paths = glob.glob(os.path.join(self.root, "snapshots", "*.json"))
+        return sorted((os.path.splitext(os.path.basename(p))[0] for p in paths),
+                      key=lambda n: self.manifest(n)["created"])
+
+    def manifest(self, name):
+        with open(self._manifest_path(name), encoding="utf-8") as f:
+            return json.load(f)
+
+    def _delta_depth(self, digest):
+        path = self._delta_path(digest)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            return f.read(65)[64]
+
+    def read(self, digest):
+        # Object bytes, rebuilding delta chains and checking the result
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        with open(self._delta_path(digest), "rb") as f:
+            header, delta = f.read(65), f.read()
+        data = apply_delta(self.read(header[:64].decode()), delta)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Corrupt delta object {digest}")
+        return data
+
+    def put(self, data, digest, base=None):
+        # Store `data` once; as a delta against `base` when that is much smaller
+        if self.has(digest):
+            return 0
+        if base and base != digest and self.has(base):
+            depth = self._delta_depth(base) + 1
+            if depth <= MAX_DELTA_DEPTH:
+                delta = make_delta(self.read(base), data)
+                if len(delta) < len(data) * DELTA_RATIO:
+                    _write_atomic(self._delta_path(digest), base.encode() + bytes([depth]) + delta)
+                    return 65 + len(delta)
+        _write_atomic(self._object_path(digest), data)
+        os.chmod(self._object_path(digest), 0o444)
+        return len(data)
+
+    def create(self, name, source, parent=None):
+        """Snapshot `source` as `name`.
+
+        Files whose (size, mtime, inode) match `parent` (the latest snapshot
+        of the same source by default) reuse its digest without being read;
+        only changed files are hashed, and new contents are delta-encoded
+        against the parent's version of the same path.
+        """
+        start = time.perf_counter()
+        source = os.path.abspath(source)
+        if parent is None:
+            same_source = [n for n in self.names() if self.manifest(n)["source"] == source]
+            parent = same_source[-1] if same_source else None
+        previous = self.manifest(parent) if parent else {"source": None, "files": {}}
+        trust_stat = previous["source"] == source
+
+        files, hashed, stored = {}, 0, 0
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, source).replace("\\", "/")
+                st = os.stat(path)
+                stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+                old = previous["files"].get(rel)
+                if trust_stat and old and old["stamp"] == stamp:
+                    files[rel] = old
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                hashed += 1
+                stored += self.put(data, digest, old["digest"] if old else None)
+                files[rel] = {"digest": digest, "stamp": stamp, "mode": stat.S_IMODE(st.st_mode)}
+
+        manifest = {"name": name, "source": source, "parent": parent, "created": time.time(),
+                    "files": files}
+        _write_atomic(self._manifest_path(name), json.dumps(manifest, indent=1).encode())
+        logical = sum(entry["stamp"][0] for entry in files.values())
+        print(f"{name}: {len(files)} file(s), {hashed} hashed, {logical:,} bytes -> "
+              f"{stored:,} new bytes stored in {time.perf_counter() - start:.2f}s")
+        return manifest
+
+    def restore(self, name, dest, link="copy"):
+        """Materialize snapshot `name` under `dest`.
+
+        link="hardlink" links full objects straight out of the store (they are
+        read-only; edit the copies only via replace-on-save editors), "reflink"
+        clones them copy-on-write where supported; delta objects and
+        unsupported links fall back to a plain copy.
+        """
+        manifest = self.manifest(name)
+        counts = {"hardlink": 0, "reflink": 0, "copy": 0}
+        for rel, entry in manifest["files"].items():
+            path = os.path.join(dest, *rel.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.lexists(path):
+                os.remove(path)
+            obj = self._object_path(entry["digest"])
+            method = link if os.path.exists(obj) else "copy"
+            try:
+                if method == "hardlink":
+                    os.link(obj, path)
+                elif method == "reflink":
+                    _reflink(obj, path)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL,
+                                   errno.EPERM, errno.EMLINK):
+                    raise
+                method = "copy"
+            if method == "copy":
+                _write_atomic(path, self.read(entry["digest"]))
+            if method != "hardlink":
+                os.chmod(path, entry["mode"])
+                os.utime(path, ns=(entry["stamp"][1], entry["stamp"][1]))
+            counts[method] += 1
+        print(f"Restored {name} to {dest}: " + ", ".join(f"{n} {m}" for m, n in counts.items() if n))
+
+    def stats(self):
+        def tree_bytes(sub):
+            return sum(os.path.getsize(p) for p in glob.glob(os.path.join(self.root, sub, "*", "*")))
+        names = self.names()
+        logical = sum(e["stamp"][0] for n in names for e in self.manifest(n)["files"].values())
+        stored = tree_bytes("objects") + tree_bytes("deltas")
+        return {"snapshots": len(names), "logical_bytes": logical, "stored_bytes": stored,
+                "objects": len(glob.glob(os.path.join(self.root, "objects", "*", "*"))),
+                "deltas": len(glob.glob(os.path.join(self.root, "deltas", "*", "*")))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicated, incremental snapshots of directory trees")
+    parser.add_argument("--store", default=STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("create", help="snapshot a directory")
+    p.add_argument("name")
+    p.add_argument("source")
+    p.add_argument("--parent", help="snapshot to compare against (default: latest of the same source)")
+    p = sub.add_parser("import", help="snapshot existing backup directories, oldest first")
+    p.add_argument("sources", nargs="+", help="directories or globs, e.g. 'backups/*'")
+    p = sub.add_parser("restore", help="materialize a snapshot")
+    p.add_argument("name")
+    p.add_argument("dest")
+    p.add_argument("--link", choices=["copy", "hardlink", "reflink"], default="copy")
+    sub.add_parser("list", help="list snapshots")
+    sub.add_parser("stats", help="logical vs stored bytes")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store)
+    if args.command == "create":
+        store.create(args.name, args.source, args.parent)
+    elif args.command == "import":
+        # Each backup is delta-encoded against the one imported before it
+        sources = sorted({d for pattern in args.sources for d in glob.glob(pattern) if os.path.isdir(d)},
+                         key=lambda d: os.path.basename(d.rstrip("/")).replace("backup_", ""))
+        parent = None
+        for source in sources:
+            name = os.path.basename(source.rstrip("/"))
+            store.create(name, source, parent)
+            parent = name
+    elif args.command == "restore":
+        store.restore(args.name, args.dest, args.link)
+    elif args.command == "list":
+        for name in store.names():
+            manifest = store.manifest(name)
+            print(f"{name:<40} {len(manifest['files']):>5} file(s)  {manifest['source']}")
+    else:
+        stats = store.stats()
+        print(f"{stats['snapshots']} snapshot(s), {stats['objects']} object(s), {stats['deltas']} delta(s): "
+              f"{stats['logical_bytes']:,} logical -> {stats['stored_bytes']:,} stored bytes")
@@ -0,0 +1,639 @@
+from PIL import Image, ImageColor
+import argparse
+import inspect
+import math
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+from asset_encoder import encode_best
+from gradient import LUT_SIZE
+from profiling import stage
+from render_cache import cached_render
+
+# Rasterizer for the SVG subset of the brand marks: <path> (M/L/H/V/C/A/Z,
+# absolute and relative), <circle>, <rect rx>, solid and linearGradient
+# fills, and round-capped/joined strokes. Curves are flattened to within
+# FLATNESS pixels, then every pixel gets the exact area of the polygon over
+# it (signed-area accumulation per scanline), so one sample per pixel is
+# enough at any size.
+FLATNESS = 0.01
+# Output rows per pass; float temporaries stay a few tens of MB at 8192px
+CHUNK_ROWS = 256
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_SEPARATORS = " \t\r\n,"
+_INHERITED = {"fill", "fill-opacity", "fill-rule", "stroke", "stroke-opacity", "stroke-width",
+              "stroke-linecap", "stroke-linejoin"}
+_ARGS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "A": 7, "Z": 0}
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _style(el):
+    # Presentation attributes, overridden by style="a:b; c:d"
+    props = dict(el.attrib)
+    for item in el.get("style", "").split(";"):
+        if ":" in item:
+            key, value = item.split(":", 1)
+            props[key.strip()] = value.strip()
+    return props
+
+
+def _length(value, extent=1.0):
+    value = value.strip()
+    if value.endswith("%"):
+        return float(value[:-1]) / 100 * extent
+    return float(_NUMBER.match(value).group())
+
+
+def parse_color(value, opacity=1.0):
+    rgb = ImageColor.getrgb(value)[:3]
+    return rgb + (round(255 * float(opacity)),)
+
+
+# --- path data -------------------------------------------------------------
+
+def parse_path(d):
+    """Path data as absolute ("M", x, y), ("L", x, y), ("C", x1, y1, x2, y2, x, y),
+    ("A", rx, ry, rotation, large_arc, sweep, x, y) and ("Z",) commands."""
+    out, i, cmd = [], 0, None
+    cx = cy = sx = sy = 0.0
+
+    def skip(i):
+        while i < len(d) and d[i] in _SEPARATORS:
+            i += 1
+        return i
+
+    def number(i):
+        m = _NUMBER.match(d, skip(i))
+        if m is None:
+            raise ValueError(f"Expected a number at {i} in path {d!r}")
+        return float(m.group()), m.end()
+
+    def flag(i):
+        # Arc flags may be written without separators ("0 11 20,20")
+        i = skip(i)
+        if i >= len(d) or d[i] not in "01":
+            raise ValueError(f"Expected an arc flag at {i} in path {d!r}")
+        return int(d[i]), i + 1
+
+    while True:
+        i = skip(i)
+        if i >= len(d):
+            break
+        if d[i].isalpha():
+            cmd, i = d[i], i + 1
+            if cmd.upper() not in _ARGS:
+                raise ValueError(f"Unsupported path command {cmd!r} (supported: {''.join(_ARGS)})")
+        elif cmd is None:
+            raise ValueError(f"Path data must start with a command: {d!r}")
+        op, rel = cmd.upper(), cmd.islower()
+        args = []
+        for n in range(_ARGS[op]):
+            if op == "A" and n in (3, 4):
+                value, i = flag(i)
+            else:
+                value, i = number(i)
+            args.append(value)
+        ox, oy = (cx, cy) if rel else (0.0, 0.0)
+
+        if op == "M":
+            cx, cy = sx, sy = args[0] + ox, args[1] + oy
+            out.append(("M", cx, cy))
+            cmd = "l" if rel else "L"  # extra coordinate pairs are implicit lines
+        elif op in "LHV":
+            if op == "H":
+                cx = args[0] + ox
+            elif op == "V":
+                cy = args[0] + oy
+            else:
+                cx, cy = args[0] + ox, args[1] + oy
+            out.append(("L", cx, cy))
+        elif op == "C":
+            x1, y1, x2, y2, x, y = args
+            out.append(("C", x1 + ox, y1 + oy, x2 + ox, y2 + oy, x + ox, y + oy))
+            cx, cy = x + ox, y + oy
+        elif op == "A":
+            rx, ry, rot, large, sweep, x, y = args
+            out.append(("A", rx, ry, rot, large, sweep, x + ox, y + oy))
+            cx, cy = x + ox, y + oy
+        else:
+            out.append(("Z",))
+            cx, cy = sx, sy
+            cmd = None
+    return out
+
+
+def _circle_path(cx, cy, r):
+    return [("M", cx + r, cy), ("A", r, r, 0, 1, 1, cx - r, cy), ("A", r, r, 0, 1, 1, cx + r, cy), ("Z",)]
+
+
+def _rect_path(x, y, w, h, rx, ry):
+    rx, ry = min(rx, w / 2), min(ry, h / 2)
+    if rx <= 0 or ry <= 0:
+        return [("M", x, y), ("L", x + w, y), ("L", x + w, y + h), ("L", x, y + h), ("Z",)]
+    return [("M", x + rx, y), ("L", x + w - rx, y), ("A", rx, ry, 0, 0, 1, x + w, y + ry),
+            ("L", x + w, y + h - ry), ("A", rx, ry, 0, 0, 1, x + w - rx, y + h),
+            ("L", x + rx, y + h), ("A", rx, ry, 0, 0, 1, x, y + h - ry),
+            ("L", x, y + ry), ("A", rx, ry, 0, 0, 1, x + rx, y), ("Z",)]
+
+
+# --- document --------------------------------------------------------------
+
+def _paint(value, props, gradients):
+    if value is None or value == "none":
+        return None
+    if value == "currentColor":
+        return ("current",)
+    m = re.match(r"url\(\s*#([^)\s]+)\s*\)", value)
+    if m:
+        if m.group(1) not in gradients:
+            raise ValueError(f"Unknown paint server {value!r} (only linearGradient is supported)")
+        return ("gradient", gradients[m.group(1)])
+    return ("color", parse_color(value, props.get("fill-opacity", props.get("opacity", 1))))
+
+
+def _gradient(el):
+    stops = []
+    for stop in el:
+        if _local(stop.tag) != "stop":
+            continue
+        props = _style(stop)
+        offset = min(max(_length(props.get("offset", "0")), 0.0), 1.0)
+        offset = max([offset] + [s[0] for s in stops])  # offsets never decrease
+        stops.append((offset, parse_color(props.get("stop-color", "black"), props.get("stop-opacity", 1))))
+    user_space = el.get("gradientUnits") == "userSpaceOnUse"
+    if el.get("gradientTransform"):
+        raise ValueError(f"gradientTransform is not supported (gradient {el.get('id')!r})")
+    coords = [_length(el.get(name, default)) for name, default in
+              (("x1", "0%"), ("y1", "0%"), ("x2", "100%"), ("y2", "0%"))]
+    return {"stops": stops or [(0.0, (0, 0, 0, 0))], "user_space": user_space, "coords": coords}
+
+
+def load_svg(source):
+    """Parse an SVG file (or text) into {"viewbox": (x, y, w, h), "shapes": [...]}.
+
+    Each shape has "path" (parse_path commands in user units), "fill",
+    "fill_rule" and, when stroked, "stroke" and "stroke_width".
+    """
+    root = ET.fromstring(source) if source.lstrip().startswith("<") else ET.parse(source).getroot()
+    if root.get("viewBox"):
+        viewbox = tuple(float(v) for v in _NUMBER.findall(root.get("viewBox")))
+    else:
+        viewbox = (0.0, 0.0, _length(root.get("width", "100")), _length(root.get("height", "100")))
+    gradients = {el.get("id"): _gradient(el) for el in root.iter() if _local(el.tag) == "linearGradient"}
+
+    shapes = []
+
+    def walk(el, inherited):
+        tag = _local(el.tag)
+        if el.get("transform"):
+            raise ValueError(f"transform is not supported (<{tag}>)")
+        # Fill and stroke properties cascade from the enclosing elements
+        props = dict(inherited, **_style(el))
+        if tag in ("svg", "g"):
+            for child in el:
+                walk(child, {k: v for k, v in props.items() if k in _INHERITED})
+            return
+        if tag == "path":
+            path = parse_path(props.get("d", ""))
+        elif tag == "circle":
+            path = _circle_path(*(_length(props.get(k, "0")) for k in ("cx", "cy", "r")))
+        elif tag == "rect":
+            rx = props.get("rx", props.get("ry", "0"))
+            ry = props.get("ry", rx)
+            path = _rect_path(*(_length(props.get(k, "0")) for k in ("x", "y", "width", "height")),
+                              _length(rx), _length(ry))
+        else:
+            return
+        stroke = _paint(props.get("stroke"), {"opacity": props.get("stroke-opacity", 1)}, gradients)
+        if stroke and (props.get("stroke-linecap", "butt"), props.get("stroke-linejoin", "miter")) != ("round", "round"):
+            raise ValueError("Only round stroke-linecap/stroke-linejoin are supported")
+        shapes.append({"path": path, "fill": _paint(props.get("fill", "black"), props, gradients),
+                       "fill_rule": props.get("fill-rule", "nonzero"), "stroke": stroke,
+                       "stroke_width": _length(props.get("stroke-width", "1"))})
+
+    walk(root, {})
+    return {"viewbox": viewbox, "shapes": shapes}
+
+
+def viewport(viewbox, size, padding=0.0):
+    # (scale, tx, ty) mapping user units to pixels: preserveAspectRatio
+    # xMidYMid meet inside a `padding` (fraction of the size) margin
+    vx, vy, vw, vh = viewbox
+    width, height = size
+    scale = min(width * (1 - 2 * padding) / vw, height * (1 - 2 * padding) / vh)
+    return scale, (width - vw * scale) / 2 - vx * scale, (height - vh * scale) / 2 - vy * scale
+
+
+# --- flattening ------------------------------------------------------------
+
+def _arc_points(x0, y0, rx, ry, rot, large, sweep, x1, y1, tol):
+    # Endpoint to centre parameterization (SVG 1.1 implementation notes F.6.5)
+    if (x0, y0) == (x1, y1):
+        return []
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return [(x1, y1)]
+    phi = math.radians(rot)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (x0 - x1) / 2, (y0 - y1) / 2
+    px, py = cos_phi * dx + sin_phi * dy, -sin_phi * dx + cos_phi * dy
+    grow = px * px / (rx * rx) + py * py / (ry * ry)
+    if grow > 1:
+        rx, ry = rx * math.sqrt(grow), ry * math.sqrt(grow)
+    num = rx * rx * ry * ry - rx * rx * py * py - ry * ry * px * px
+    factor = math.sqrt(max(0.0, num / (rx * rx * py * py + ry * ry * px * px)))
+    if large == sweep:
+        factor = -factor
+    cpx, cpy = factor * rx * py / ry, -factor * ry * px / rx
+    cx = cos_phi * cpx - sin_phi * cpy + (x0 + x1) / 2
+    cy = sin_phi * cpx + cos_phi * cpy + (y0 + y1) / 2
+    theta0 = math.atan2((py - cpy) / ry, (px - cpx) / rx)
+    delta = math.atan2((-py - cpy) / ry, (-px - cpx) / rx) - theta0
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+
+    # Chord sagitta r(1 - cos(step/2)) <= tol
+    r = max(rx, ry)
+    step = 2 * math.acos(max(-1.0, 1 - tol / r)) if r > tol else math.pi / 2
+    n = max(1, math.ceil(abs(delta) / step))
+    ts = theta0 + delta * np.arange(1, n + 1) / n
+    xs = cx + rx * np.cos(ts) * cos_phi - ry * np.sin(ts) * sin_phi
+    ys = cy + rx * np.cos(ts) * sin_phi + ry * np.sin(ts) * cos_phi
+    xs[-1], ys[-1] = x1, y1
+    return list(zip(xs.tolist(), ys.tolist()))
+
+
+def _cubic_points(p0, p1, p2, p3, tol):
+    # Uniform subdivision; the chord error is at most max|B''| / (8 n^2)
+    p0, p1, p2, p3 = (np.array(p, dtype=np.float64) for p in (p0, p1, p2, p3))
+    dd = 6 * max(np.hypot(*(p0 - 2 * p1 + p2)), np.hypot(*(p1 - 2 * p2 + p3)))
+    n = max(1, math.ceil(math.sqrt(dd / (8 * tol))))
+    t = (np.arange(1, n + 1) / n)[:, None]
+    pts = (1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t * t * p2 + t ** 3 * p3
+    return [tuple(p) for p in pts.tolist()]
+
+
+def flatten(path, transform, tol=FLATNESS):
+    """Polylines in pixel coordinates, one per subpath: (points, closed)."""
+    scale, tx, ty = transform
+    polylines, points, closed = [], [], False
+    x = y = 0.0
+    for cmd in path:
+        op = cmd[0]
+        if op == "M":
+            if len(points) > 1:
+                polylines.append((points, closed))
+            x, y = cmd[1] * scale + tx, cmd[2] * scale + ty
+            points, closed = [(x, y)], False
+            continue
+        if not points:
+            points = [(x, y)]
+        if op == "L":
+            x, y = cmd[1] * scale + tx, cmd[2] * scale + ty
+            points.append((x, y))
+        elif op == "C":
+            c = [(cmd[i] * scale + tx, cmd[i + 1] * scale + ty) for i in (1, 3, 5)]
+            points.extend(_cubic_points((x, y), *c, tol))
+            x, y = c[2]
+        elif op == "A":
+            nx, ny = cmd[6] * scale + tx, cmd[7] * scale + ty
+            points.extend(_arc_points(x, y, cmd[1] * scale, cmd[2] * scale, cmd[3], cmd[4], cmd[5], nx, ny, tol))
+            x, y = nx, ny
+        else:
+            closed = True
+            x, y = points[0]
+            polylines.append((points, closed))
+            points = []
+    if len(points) > 1:
+        polylines.append((points, closed))
+    return polylines
+
+
+def _ring(points):
+    # Closed ring as edges; every subpath is closed for filling
+    pts = np.asarray(points, dtype=np.float64)
+    return np.concatenate([pts, np.roll(pts, -1, axis=0)], axis=1)
+
+
+def _oriented(ring):
+    # Make the ring clockwise on screen so overlapping stroke pieces add up
+    area = np.sum(ring[:, 0] * ring[:, 3] - ring[:, 2] * ring[:, 1])
+    return ring if area >= 0 else ring[::-1][:, [2, 3, 0, 1]]
+
+
+def stroke_edges(polylines, width, tol=FLATNESS):
+    # Round-joined, round-capped stroke as a union of segment quads and
+    # vertex discs, all wound the same way (rasterized with nonzero)
+    r = width / 2
+    disc = _arc_points(r, 0, r, r, 0, 1, 1, -r, 0, tol) + _arc_points(-r, 0, r, r, 0, 1, 1, r, 0, tol)
+    disc = np.array(disc)
+    rings = []
+    for points, closed in polylines:
+        pts = points + [points[0]] if closed else points
+        for (x0, y0), (x1, y1) in zip(pts, pts[1:]):
+            length = math.hypot(x1 - x0, y1 - y0)
+            if length == 0:
+                continue
+            nx, ny = -(y1 - y0) / length * r, (x1 - x0) / length * r
+            rings.append(_oriented(_ring([(x0 + nx, y0 + ny), (x1 + nx, y1 + ny),
+                                          (x1 - nx, y1 - ny), (x0 - nx, y0 - ny)])))
+        for x, y in pts:
+            rings.append(_oriented(_ring(disc + (x, y))))
+    return np.concatenate(rings) if rings else np.zeros((0, 4))
+
+
+def fill_edges(polylines):
+    rings = [_ring(points) for points, _ in polylines if len(points) > 2]
+    return np.concatenate(rings) if rings else np.zeros((0, 4))
+
+
+def _clip_x(edges, width):
+    # Split edges where they cross x=0 / x=width and clamp the outside parts
+    # onto the border: a vertical edge at the border covers exactly what the
+    # outside part would have, so in-canvas coverage is unchanged
+    out = []
+    for x0, y0, x1, y1 in edges.tolist():
+        ts = [0.0, 1.0]
+        if x0 != x1:
+            ts += [t for t in ((0 - x0) / (x1 - x0), (width - x0) / (x1 - x0)) if 0 < t < 1]
+        ts.sort()
+        for t0, t1 in zip(ts, ts[1:]):
+            ax, ay = x0 + (x1 - x0) * t0, y0 + (y1 - y0) * t0
+            bx, by = x0 + (x1 - x0) * t1, y0 + (y1 - y0) * t1
+            out.append((min(max(ax, 0.0), width), ay, min(max(bx, 0.0), width), by))
+    return np.array(out, dtype=np.float64).reshape(-1, 4)
+
+
+# --- coverage --------------------------------------------------------------
+
+def _band_edges(edges, rows):
+    # Non-horizontal edges that reach into rows [y0, y1)
+    if not len(edges):
+        return edges
+    ymin, ymax = np.minimum(edges[:, 1], edges[:, 3]), np.maximum(edges[:, 1], edges[:, 3])
+    return edges[(ymax > rows[0]) & (ymin < rows[1]) & (ymin != ymax)]
+
+
+def coverage(edges, width, rows, fill_rule="nonzero", columns=None):
+    """Exact per-pixel area coverage of the polygon `edges` for rows [y0, y1).
+
+    Each edge adds its signed area to the cells it crosses and the coverage
+    change to the cell after; a running sum along each row turns that into
+    the winding-weighted area of every pixel. `columns=(x0, x1)` returns just
+    those columns; no edge may lie left of x0.
+    """
+    y0, y1 = rows
+    x0, x1 = columns or (0, width)
+    acc = np.zeros((y1 - y0, width + 2), dtype=np.float64)
+    for ax, ay, bx, by in _band_edges(edges, rows).tolist():
+        direction = 1.0
+        if ay > by:
+            ax, ay, bx, by, direction = bx, by, ax, ay, -1.0
+        dxdy = (bx - ax) / (by - ay)
+        top = max(math.floor(ay), y0)
+        x = ax + dxdy * (max(top, ay) - ay)
+        for y in range(top, min(math.ceil(by), y1)):
+            row = acc[y - y0]
+            dy = min(y + 1, by) - max(y, ay)
+            xnext = x + dxdy * dy
+            d = dy * direction
+            left, right = (x, xnext) if x < xnext else (xnext, x)
+            left_floor = math.floor(left)
+            li, ri = int(left_floor), int(math.ceil(right))
+            if ri <= li + 1:
+                # Stays inside one pixel column: trapezoid split at its mean x
+                xm = 0.5 * (x + xnext) - left_floor
+                row[li] += d - d * xm
+                row[li + 1] += d * xm
+            else:
+                s = 1.0 / (right - left)
+                lf = left - left_floor
+                a0 = 0.5 * s * (1 - lf) ** 2
+                rf = right - ri + 1
+                am = 0.5 * s * rf * rf
+                row[li] += d * a0
+                if ri == li + 2:
+                    row[li + 1] += d * (1 - a0 - am)
+                else:
+                    a1 = s * (1.5 - lf)
+                    row[li + 1] += d * (a1 - a0)
+                    row[li + 2:ri - 1] += d * s
+                    a2 = a1 + (ri - li - 3) * s
+                    row[ri - 1] += d * (1 - a2 - am)
+                row[ri] += d * am
+            x = xnext
+    winding = np.cumsum(acc[:, x0:x1], axis=1)
+    if fill_rule == "evenodd":
+        return np.abs(np.mod(winding + 1, 2) - 1).astype(np.float32)
+    return np.minimum(np.abs(winding), 1).astype(np.float32)
+
+
+# --- painting --------------------------------------------------------------
+
+def _bbox(polylines):
+    pts = np.concatenate([np.asarray(p) for p, _ in polylines])
+    return pts.min(axis=0), pts.max(axis=0)
+
+
+def _resolve(paint, current_color):
+    # Straight RGBA uint8 colour, or a LUT_SIZE-entry table for a gradient
+    if paint[0] == "current":
+        paint = current_color if isinstance(current_color, tuple) and current_color[0] == "gradient" \
+            else ("color", tuple(current_color) + (255,) * (4 - len(current_color)))
+    if paint[0] == "color":
+        return paint, np.array(paint[1], dtype=np.uint8)
+    stops = paint[1]["stops"]
+    steps = np.linspace(0, 1, LUT_SIZE)
+    colors = np.array([c for _, c in stops], dtype=np.float64)
+    lut = np.stack([np.interp(steps, [o for o, _ in stops], colors[:, c]) for c in range(4)], axis=-1)
+    return paint, (lut + 0.5).astype(np.uint8)
+
+
+def _paint_rows(paint, lut, rows, columns, transform, bbox):
+    # (rows, columns, 4) uint8 straight RGBA, or (4,) for a solid colour
+    if paint[0] == "color":
+        return lut
+    grad = paint[1]
+    x1, y1, x2, y2 = grad["coords"]
+    xs = np.arange(*columns, dtype=np.float32) + 0.5
+    ys = np.arange(*rows, dtype=np.float32) + 0.5
+    if grad["user_space"]:
+        scale, tx, ty = transform
+        x1, y1, x2, y2 = x1 * scale + tx, y1 * scale + ty, x2 * scale + tx, y2 * scale + ty
+    else:
+        # objectBoundingBox: gradient vector in the shape's unit box
+        (bx, by), (bx1, by1) = bbox
+        xs = (xs - np.float32(bx)) / np.float32(max(bx1 - bx, 1e-9))
+        ys = (ys - np.float32(by)) / np.float32(max(by1 - by, 1e-9))
+    vx, vy = x2 - x1, y2 - y1
+    norm = (vx * vx + vy * vy or 1.0) / (LUT_SIZE - 1)
+    t = (xs[None, :] - np.float32(x1)) * np.float32(vx / norm) + ((ys - np.float32(y1)) * np.float32(vy / norm))[:, None]
+    np.clip(t, 0, LUT_SIZE - 1, out=t)
+    t += np.float32(0.5)
+    return lut[t.astype(np.uint16)]
+
+
+def _composite(acc, paint, cov, empty=False):
+    # Straight-alpha src-over of `paint` with coverage `cov` onto a float
+    # RGBA view (alpha 0-1); onto an `empty` (still transparent) region it
+    # is a plain copy
+    a_src = cov * (paint[..., 3] * np.float32(1 / 255))
+    if empty:
+        acc[..., :3] = paint[..., :3]
+        acc[..., 3] = a_src
+        return
+    a_out = a_src + acc[..., 3] * (1 - a_src)
+    weight = np.divide(a_src, a_out, out=np.zeros_like(a_out), where=a_out > 0)
+    acc[..., :3] += (paint[..., :3] - acc[..., :3]) * weight[..., None]
+    acc[..., 3] = a_out
+
+
+def _layers(doc, size, padding, current_color):
+    # (edges, fill rule, paint, colour/LUT, bbox) per fill and stroke, in paint order
+    width = size[0]
+    transform = viewport(doc["viewbox"], size, padding)
+    layers = []
+    for shape in doc["shapes"]:
+        polylines = flatten(shape["path"], transform)
+        if not polylines:
+            continue
+        bbox = _bbox(polylines)
+        if shape["fill"]:
+            layers.append((_clip_x(fill_edges(polylines), width), shape["fill_rule"],
+                           *_resolve(shape["fill"], current_color), bbox))
+        if shape["stroke"]:
+            edges = stroke_edges(polylines, shape["stroke_width"] * transform[0])
+            layers.append((_clip_x(edges, width), "nonzero", *_resolve(shape["stroke"], current_color), bbox))
+    return transform, layers
+
+
+def _bands(layers, width, rows):
+    # (top, bottom, [(layer, columns, coverage)]) per CHUNK_ROWS band
+    y0, y1 = rows
+    for top in range(y0, y1, CHUNK_ROWS):
+        bottom = min(top + CHUNK_ROWS, y1)
+        covered = []
+        for layer in layers:
+            edges = _band_edges(layer[0], (top, bottom))
+            if not len(edges):
+                continue
+            # Coverage is zero outside the columns the band's edges span
+            left = int(np.floor(min(edges[:, 0].min(), edges[:, 2].min())))
+            right = min(width, int(np.floor(max(edges[:, 0].max(), edges[:, 2].max()))) + 1)
+            with stage("coverage", pixels=(right - left) * (bottom - top)):
+                covered.append((layer, (left, right), coverage(edges, width, (top, bottom), layer[1], (left, right))))
+        yield top, bottom, covered
+
+
+def render_array(doc, size, rows=None, padding=0.0, current_color=(0, 0, 0)):
+    """Render a load_svg() document as an (h, w, 4) uint8 RGBA array.
+
+    `rows=(y0, y1)` renders only that slice of the canvas; slices stitch
+    exactly. `current_color` is an RGB(A) tuple or a ("gradient", spec) paint.
+    """
+    width, height = size
+    rows = rows or (0, height)
+    with stage("flatten"):
+        transform, layers = _layers(doc, size, padding, current_color)
+
+    out = np.zeros((rows[1] - rows[0], width, 4), dtype=np.uint8)
+    for top, bottom, covered in _bands(layers, width, rows):
+        if not covered:
+            continue
+        left, right = min(c[1][0] for c in covered), max(c[1][1] for c in covered)
+        acc = np.zeros((bottom - top, right - left, 4), dtype=np.float32)
+        with stage("paint", pixels=(right - left) * (bottom - top)):
+            for i, ((_, _, paint, lut, bbox), (x0, x1), cov) in enumerate(covered):
+                color = _paint_rows(paint, lut, (top, bottom), (x0, x1), transform, bbox)
+                _composite(acc[:, x0 - left:x1 - left], color, cov, i == 0)
+            acc[..., 3] *= 255
+            acc += 0.5
+            block = acc.astype(np.uint8)
+            # Fully transparent pixels are black whatever grazed them
+            px = block.view("<u4")
+            px *= px >= 1 << 24
+        out[top - rows[0]:bottom - rows[0], left:right] = block
+    return out
+
+
+def render_alpha(doc, size, rows=None, padding=0.0):
+    """Just the (h, w) uint8 alpha of render_array(), without painting."""
+    width, height = size
+    rows = rows or (0, height)
+    with stage("flatten"):
+        _, layers = _layers(doc, size, padding, (0, 0, 0))
+
+    out = np.zeros((rows[1] - rows[0], width), dtype=np.uint8)
+    for top, bottom, covered in _bands(layers, width, rows):
+        if not covered:
+            continue
+        left, right = min(c[1][0] for c in covered), max(c[1][1] for c in covered)
+        alpha = np.zeros((bottom - top, right - left), dtype=np.float32)
+        for (_, _, paint, lut, _), (x0, x1), cov in covered:
+            # A gradient paint counts with its least opaque stop
+            a_src = cov * np.float32(lut[..., 3].min() / 255)
+            view = alpha[:, x0 - left:x1 - left]
+            view += a_src * (1 - view)
+        alpha *= 255
+        alpha += 0.5
+        out[top - rows[0]:bottom - rows[0], left:right] = alpha
+    return out
+
+
+def canvas_size(doc, width, height=None):
+    vw, vh = doc["viewbox"][2:]
+    return width, height or round(width * vh / vw)
+
+
+def render(svg_path, width, height=None, padding=0.0, current_color=(0, 0, 0)):
+    doc = load_svg(svg_path)
+    size = canvas_size(doc, width, height)
+    return Image.fromarray(render_array(doc, size, padding=padding, current_color=current_color), "RGBA")
+
+
+def gradient_paint(start, end, angle=135):
+    # currentColor as a CSS-style `angle` gradient across the shape's box
+    # (corner to corner for 135deg on a square, like the raster scripts)
+    theta = math.radians(angle)
+    dx, dy = math.sin(theta), -math.cos(theta)
+    half = (abs(dx) + abs(dy)) / 2
+    coords = [0.5 - dx * half, 0.5 - dy * half, 0.5 + dx * half, 0.5 + dy * half]
+    stops = [(0.0, tuple(start) + (255,) * (4 - len(start))), (1.0, tuple(end) + (255,) * (4 - len(end)))]
+    return ("gradient", {"stops": stops, "user_space": False, "coords": coords})
+
+
+def export(svg_path, output_path, width, height=None, padding=0.0, current_color=(0, 0, 0)):
+    def run():
+        img = render(svg_path, width, height, padding, current_color)
+        with stage("encode", pixels=img.width * img.height):
+            encode_best(img, output_path)
+        print(f"Rendered {svg_path} at {img.width}x{img.height}: {output_path}")
+
+    sources = [svg_path, __file__, inspect.getsourcefile(encode_best)]
+    params = {"width": width, "height": height, "padding": padding, "current_color": current_color,
+              "flatness": FLATNESS}
+    cached_render("svg_raster", sources, params, [output_path], run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render an SVG brand mark to PNG at any size")
+    parser.add_argument("svg")
+    parser.add_argument("output")
+    parser.add_argument("--width", type=int, default=2048)
+    parser.add_argument("--height", type=int, default=None, help="default: from the viewBox aspect ratio")
+    parser.add_argument("--padding", type=float, default=0.0, help="margin on each side, as a fraction of the size")
+    parser.add_argument("--color", default="#000000", help="value of currentColor")
+    parser.add_argument("--gradient", nargs=2, metavar=("FROM", "TO"),
+                        help="paint currentColor with a 135deg gradient instead")
+    args = parser.parse_args()
+    if args.gradient:
+        color = gradient_paint(*(parse_color(c) for c in args.gradient))
+    else:
+        color = parse_color(args.color)
+    export(args.svg, args.output, args.width, args.height, args.padding, color)